@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from types import TupleType
+from collections import OrderedDict
 import math
 import itertools, operator
 
@@ -10,7 +11,7 @@ _EPSILON = 1e-15
 _ONE_EPSILON = 1 - _EPSILON
 _MINUS_ONE_EPSILON = -1 + _EPSILON
 
-__all__ =  ["Location", "sortLocations"]
+__all__ =  ["Location", "FrozenLocation", "frozenLocation", "sortLocations"]
 
 def numberToString(value):
     # return a nicely formatted string of this value
@@ -573,6 +574,324 @@ class Location(dict):
             new[dim] = (self.get(dim,0)+offset)*scale
         return new
 
+# sorted axis name tuples are shared between frozen locations,
+# both tables keep the most recently used entries, most recent last
+_axisTuples = OrderedDict()
+_maxAxisTuples = 256
+_frozenLocations = OrderedDict()
+_maxFrozenLocations = 4096
+_unset = object()
+
+def _internAxes(names):
+    shared = _axisTuples.pop(names, names)
+    _axisTuples[names] = shared
+    if len(_axisTuples) > _maxAxisTuples:
+        _axisTuples.popitem(last=False)
+    return shared
+
+def _combine(a, b, operation):
+    # combine two coordinates, either of which may be an (x, y) tuple
+    if type(a) != tuple and type(b) != tuple:
+        return operation(a, b)
+    if type(a) == tuple: ax, ay = a
+    else: ax = ay = a
+    if type(b) == tuple: bx, by = b
+    else: bx = by = b
+    x = operation(ax, bx)
+    y = operation(ay, by)
+    if x == y:
+        return x
+    return x, y
+
+class FrozenLocation(object):
+    """
+    Immutable and hashable counterpart of Location.
+    The sorted coordinates and the hash are computed once,
+    arithmetic returns new FrozenLocation objects.
+    ::
+
+        >>> l = FrozenLocation(pop=1, snap=-100)
+        >>> l
+        <FrozenLocation pop:1, snap:-100 >
+        >>> l.asTuple()
+        (('pop', 1), ('snap', -100))
+        >>> l + Location(pop=1) == FrozenLocation(pop=2, snap=-100)
+        True
+        >>> l - FrozenLocation(crackle=1)
+        <FrozenLocation crackle:-1, pop:1, snap:-100 >
+        >>> l * (1, 0)
+        <FrozenLocation pop:(1.000,0.000), snap:(-100.000,0.000) >
+        >>> FrozenLocation(pop=1, snap=0).isOnAxis()
+        'pop'
+        >>> l == Location(pop=1, snap=-100)
+        True
+        >>> {l: 1}[FrozenLocation(Location(snap=-100, pop=1))]
+        1
+    """
+
+    __slots__ = ('_values', '_items', '_axes', '_hash', '_onAxis', '_expanded')
+
+    def __init__(self, location=None, **kwargs):
+        if location is None:
+            values = kwargs
+        elif isinstance(location, FrozenLocation):
+            values = location._values
+        else:
+            values = location
+        values = dict(values)
+        if location is not None and kwargs:
+            values.update(kwargs)
+        self._set(values)
+
+    def _set(self, values):
+        # values is a dict owned by this location,
+        # the sorted items, axes and hash are computed when first needed
+        self._values = values
+        self._items = None
+        self._axes = None
+        self._hash = None
+        self._onAxis = _unset
+        self._expanded = None
+
+    def _new(self, values):
+        new = object.__new__(self.__class__)
+        new._set(values)
+        return new
+
+    def _getItems(self):
+        if self._items is None:
+            self._items = tuple(sorted(self._values.iteritems()))
+        return self._items
+
+    def _getAxes(self):
+        if self._axes is None:
+            self._axes = _internAxes(tuple([name for name, value in self._getItems()]))
+        return self._axes
+
+    def __repr__(self):
+        return "<%s %s >" % (self.__class__.__name__, Location.asString.im_func(self))
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(self._getItems())
+        return self._hash
+
+    def __eq__(self, other):
+        if isinstance(other, FrozenLocation):
+            return self._values == other._values
+        if isinstance(other, dict):
+            return self._values == other
+        return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(self._getAxes())
+
+    def __contains__(self, name):
+        return name in self._values
+
+    def __getitem__(self, name):
+        return self._values[name]
+
+    def has_key(self, name):
+        return name in self._values
+
+    def get(self, name, default=None):
+        return self._values.get(name, default)
+
+    def keys(self):
+        return list(self._getAxes())
+
+    def values(self):
+        return [value for name, value in self._getItems()]
+
+    def items(self):
+        return list(self._getItems())
+
+    def asTuple(self):
+        return self._getItems()
+
+    def asDict(self):
+        return dict(self._values)
+
+    def asLocation(self):
+        return Location(self._values)
+
+    def copy(self):
+        return self
+
+    def expanded(self, axisNames):
+        """
+        Return a location with zero values for all axes in axisNames that aren’t filled in,
+        the frozen counterpart of Location.expand.
+        ::
+
+            >>> FrozenLocation(pop=1).expanded(['snap', 'crackle'])
+            <FrozenLocation crackle:0, pop:1, snap:0 >
+        """
+        axisNames = tuple(axisNames)
+        if self._expanded is None:
+            self._expanded = {}
+        new = self._expanded.get(axisNames)
+        if new is None:
+            values = self._values
+            missing = [name for name in axisNames if name not in values]
+            if missing:
+                values = dict(values)
+                values.update(dict.fromkeys(missing, 0))
+                new = self._new(values)
+            else:
+                new = self
+            self._expanded[axisNames] = new
+        return new
+
+    def strip(self):
+        return self._new(dict([(k, v) for k, v in self._values.iteritems() if v > _EPSILON or v < -_EPSILON]))
+
+    def common(self, other):
+        newSelf = None
+        newOther = None
+        for dim, sd in self._values.iteritems():
+            od = other.get(dim, None)
+            if od is None:
+                continue
+            if -_EPSILON < sd < _EPSILON and -_EPSILON < od < _EPSILON:
+                continue
+            if newSelf is None:
+                newSelf = {}
+                newOther = {}
+            newSelf[dim] = sd
+            newOther[dim] = od
+        if newSelf is None:
+            return None, None
+        return self._new(newSelf), self._new(newOther)
+
+    def isOrigin(self):
+        for value in self._values.itervalues():
+            if value < -_EPSILON or value > _EPSILON:
+                return False
+        return True
+
+    def isOnAxis(self):
+        if self._onAxis is _unset:
+            dims = [k for k, v in self._values.iteritems() if v > _EPSILON or v < -_EPSILON]
+            if len(dims) > 1:
+                self._onAxis = False
+            elif len(dims) == 1:
+                self._onAxis = dims[0]
+            else:
+                self._onAxis = None
+        return self._onAxis
+
+    def isAmbivalent(self, dim=None):
+        if dim is not None:
+            return type(self._values.get(dim)) == TupleType
+        for value in self._values.itervalues():
+            if type(value) == TupleType:
+                return True
+        return False
+
+    def split(self):
+        x = {}
+        y = {}
+        for dim, val in self._values.iteritems():
+            if type(val) == TupleType:
+                x[dim] = val[0]
+                y[dim] = val[1]
+            else:
+                x[dim] = y[dim] = val
+        return self._new(x), self._new(y)
+
+    def getActiveAxes(self):
+        return [k for k, v in self._getItems() if v != 0]
+
+    def asString(self, strict=False):
+        return Location.asString.im_func(self)
+
+    def distance(self, other=None):
+        return Location.distance.im_func(self, other)
+
+    # math operators
+    def __add__(self, other):
+        new = dict(self._values)
+        if isinstance(other, FrozenLocation):
+            other = other._values
+        for key, value in other.iteritems():
+            if key in new:
+                current = new[key]
+                if type(current) != tuple and type(value) != tuple:
+                    new[key] = current + value
+                else:
+                    new[key] = _combine(current, value, operator.add)
+            else:
+                new[key] = value
+        return self._new(new)
+
+    def __sub__(self, other):
+        new = dict(self._values)
+        if isinstance(other, FrozenLocation):
+            other = other._values
+        for key, value in other.iteritems():
+            if key in new:
+                current = new[key]
+                if type(current) != tuple and type(value) != tuple:
+                    new[key] = current - value
+                else:
+                    new[key] = _combine(current, value, operator.sub)
+            elif type(value) == tuple:
+                new[key] = (-value[0], -value[1])
+            else:
+                new[key] = -value
+        return self._new(new)
+
+    def __mul__(self, factor):
+        new = {}
+        if isinstance(factor, tuple):
+            for key, value in self._values.iteritems():
+                if type(value) == tuple:
+                    new[key] = factor[0] * value[0], factor[1] * value[1]
+                else:
+                    new[key] = factor[0] * value, factor[1] * value
+        else:
+            for key, value in self._values.iteritems():
+                if type(value) == tuple:
+                    new[key] = factor * value[0], factor * value[1]
+                else:
+                    new[key] = factor * value
+        return self._new(new)
+
+    __rmul__ = __mul__
+
+    def __div__(self, factor):
+        if factor == 0:
+            raise ZeroDivisionError
+        if isinstance(factor, tuple):
+            if factor[0] == 0 or factor[1] == 0:
+                raise ZeroDivisionError
+            return self * (1.0/factor[0]) + self * (1.0/factor[1])
+        return self * (1.0/factor)
+
+def frozenLocation(locationTuple):
+    """
+    Return the shared FrozenLocation for a location tuple, such as the keys of a Mutator.
+    ::
+
+        >>> frozenLocation((('pop', 1),)) is frozenLocation((('pop', 1),))
+        True
+    """
+    location = _frozenLocations.pop(locationTuple, None)
+    if location is None:
+        location = FrozenLocation(locationTuple)
+    _frozenLocations[locationTuple] = location
+    if len(_frozenLocations) > _maxFrozenLocations:
+        _frozenLocations.popitem(last=False)
+    return location
+
 def sortLocations(locations):
     """ Sort the locations by ranking:
             1.  all on-axis points
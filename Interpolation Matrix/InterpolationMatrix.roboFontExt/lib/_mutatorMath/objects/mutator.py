@@ -1,40 +1,134 @@
 # -*- coding: utf-8 -*-
 
 from _mutatorMath.objects.error import MutatorError
-from _mutatorMath.objects.location import Location, sortLocations, biasFromLocations
+from _mutatorMath.objects.location import Location, FrozenLocation, frozenLocation, sortLocations, biasFromLocations
 
-__all__ = ['Mutator', 'buildMutator']
+from collections import OrderedDict
+from bisect import bisect_left, bisect_right
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = ['Mutator', 'buildMutator', 'clearMutatorCache']
 
 _EPSILON = 1e-15
 
-def buildMutator(items):
+def _expand(aLocation, axisNames):
+    # expand a Location in place, or get the expanded copy of a FrozenLocation
+    if isinstance(aLocation, FrozenLocation):
+        return aLocation.expanded(axisNames)
+    aLocation.expand(axisNames)
+    return aLocation
+
+# location topologies of recently built mutators, most recent last
+_mutatorTopologies = OrderedDict()
+_maxMutatorTopologies = 64
+
+def buildMutator(items, useCache=True):
     """
         Build a mutator with the (location, obj) pairs in items.
         Determine the bias based on the given locations.
+        *   useCache:
+            *   True: reuse the location topology (bias, neutral, delta order,
+                off-axis corrections and compiled factor plan) of a previous mutator
+                built on the same master locations, only the deltas are recomputed.
     """
+    key = None
+    if useCache:
+        key = tuple([loc.asTuple() for loc, obj in items])
+        topology = _mutatorTopologies.pop(key, None)
+        if topology is not None:
+            _mutatorTopologies[key] = topology
+            return Location(topology.bias), topology.build([obj for loc, obj in items])
     m = Mutator()
     bias = biasFromLocations([loc for loc, obj in items])
     m.setBias(bias)
     n = None
+    neutralIndex = None
     ofx = []
     onx = []
-    for loc, obj in items:
+    for index, (loc, obj) in enumerate(items):
         if (loc-bias).isOrigin():
             n = obj
+            neutralIndex = index
     m.setNeutral(n)
-    for loc, obj in items:
-        lb = loc-bias
+    for index, (loc, obj) in enumerate(items):
+        # mutable, so that delta keys include the axes expanded while punching
+        lb = Location(loc)-bias
         if lb.isOrigin(): continue
         if lb.isOnAxis():
-            onx.append((lb, obj-n))
+            onx.append((lb, obj-n, index))
         else:
-            ofx.append((lb, obj-n))
-    for loc, obj in onx:
+            ofx.append((lb, obj-n, index))
+    recipe = []
+    for loc, obj, index in onx:
         m.addDelta(loc, obj, punch=False,  axisOnly=True)
-    for loc, obj in ofx:
-        m.addDelta(loc, obj, punch=True,  axisOnly=True)
+        recipe.append((loc.asTuple(), index, None))
+    for loc, obj, index in ofx:
+        # same as addDelta(loc, obj, punch=True), keeping the factors;
+        # zero factors too, math objects with undefined values aren't linear
+        r, factors = m.getInstance(loc, axisOnly=True, getFactors=True)
+        corrections = [(deltaKey, f) for deltaKey, (f, mathItem, deltaName) in zip(m.keys(), factors)]
+        m.addDelta(loc, obj-r, punch=False,  axisOnly=True)
+        recipe.append((loc.asTuple(), index, tuple(corrections)))
+    if key is not None:
+        m.compile()
+        _mutatorTopologies[key] = MutatorTopology(bias, neutralIndex, recipe, m)
+        while len(_mutatorTopologies) > _maxMutatorTopologies:
+            _mutatorTopologies.popitem(last=False)
     return bias, m
 
+def clearMutatorCache():
+    _mutatorTopologies.clear()
+
+
+class MutatorTopology(object):
+
+    """
+        Location dependent part of a mutator built by buildMutator,
+        able to build an equivalent compiled mutator for other objects at the same locations.
+    """
+
+    def __init__(self, bias, neutralIndex, recipe, mutator):
+        self.bias = Location(bias)
+        self.neutralIndex = neutralIndex
+        self.recipe = recipe
+        axisNames, limitsIndex, breakpoints, deltas = mutator._plan
+        self.axisNames = axisNames
+        self.limitsIndex = limitsIndex
+        self.breakpoints = breakpoints
+        self.deltas = [(deltaKey, deltaLocation, deltaAxis) for deltaKey, (deltaLocation, deltaAxis, mathItem, deltaName) in zip(mutator.keys(), deltas)]
+        self.axes = mutator._axes
+
+    def build(self, objects):
+        n = objects[self.neutralIndex]
+        m = Mutator()
+        m.setBias(Location(self.bias))
+        m.setNeutral(n)
+        for deltaKey, index, corrections in self.recipe:
+            delta = objects[index]-n
+            if corrections is not None:
+                # as getInstance
+                r = None
+                for otherKey, f in corrections:
+                    if r is None:
+                        r = f * m[otherKey][0]
+                    else:
+                        r += f * m[otherKey][0]
+                if r is None:
+                    r = 0 * n
+                delta = delta-r
+            m[deltaKey] = delta, None
+        m._axes = dict([(name, list(axisPoints)) for name, axisPoints in self.axes.items()])
+        deltas = []
+        for deltaKey, deltaLocation, deltaAxis in self.deltas:
+            mathItem, deltaName = m[deltaKey]
+            deltas.append((deltaLocation, deltaAxis, mathItem, deltaName))
+        m._plan = self.axisNames, self.limitsIndex, self.breakpoints, deltas
+        return m
+
 
 class Mutator(dict):
 
@@ -59,6 +153,7 @@ class Mutator(dict):
         self._tags = {}
         self._neutral = neutral
         self._bias = Location()
+        self._plan = None
 
     def setBias(self, bias):
         self._bias = bias
@@ -84,6 +179,7 @@ class Mutator(dict):
                 *   True: add the difference with the instance value at that location and the delta
                 *   False: just add the delta.
         """
+        self._plan = None
         if punch:
             r = self.getInstance(location, axisOnly=axisOnly)
             if r is not None:
@@ -111,7 +207,7 @@ class Mutator(dict):
             Return a dictionary with all on-axis locations.
         """
         for l, (value, deltaName) in self.items():
-            location = Location(l)
+            location = frozenLocation(l)
             name = location.isOnAxis()
             if name is not None and name is not False:
                 if not self._axes.has_key(name):
@@ -126,7 +222,7 @@ class Mutator(dict):
         """
         offAxis = {}
         for l, (value, deltaName) in self.items():
-            location = Location(l)
+            location = frozenLocation(l)
             name = location.isOnAxis()
             if name is None or name is False:
                 offAxis[l] = 1
@@ -148,9 +244,92 @@ class Mutator(dict):
         """
         l = []
         for locationTuple in self.keys():
-            l.append(Location(locationTuple))
+            l.append(frozenLocation(locationTuple))
         return l
 
+    #
+    #   compiled factor plan
+    #
+
+    def compile(self):
+        """
+            Freeze the current deltas and precompute everything getFactors needs
+            that doesn't depend on the instance location:
+            axis names, delta locations, on-axis breakpoints and an index of limit values.
+            Adding a delta discards the plan.
+        """
+        self._collectAxisPoints()
+        axisNames = list(self.getAxisNames())
+        limitsIndex = buildLimitsIndex(self._allLocations())
+        breakpoints = {}
+        for axisName, axisPoints in self._axes.items():
+            values = dict.fromkeys([frozenLocation(value)[axisName] for value in axisPoints], None)
+            values[0] = None
+            values = values.keys()
+            values.sort()
+            breakpoints[axisName] = values
+        deltas = []
+        for deltaLocationTuple, (mathItem, deltaName) in self.items():
+            deltaLocation = frozenLocation(deltaLocationTuple).expanded(axisNames)
+            deltaAxis = deltaLocation.isOnAxis()
+            deltas.append((deltaLocation, deltaAxis, mathItem, deltaName))
+        self._plan = axisNames, limitsIndex, breakpoints, deltas
+        return self
+
+    def isCompiled(self):
+        return self._plan is not None
+
+    def _getCompiledFactors(self, aLocation, axisOnly=False):
+        """
+            Same as getFactors, evaluated straight from the compiled plan.
+        """
+        axisNames, limitsIndex, breakpoints, deltas = self._plan
+        aLocation = _expand(aLocation, axisNames)
+        limits = None
+        factors = []
+        for deltaLocation, deltaAxis, mathItem, deltaName in deltas:
+            if deltaAxis is None:
+                factor = 1
+            elif deltaAxis:
+                factor = _onAxisFactor(aLocation[deltaAxis], deltaLocation[deltaAxis], breakpoints[deltaAxis])
+            elif not axisOnly:
+                if limits is None:
+                    limits = getIndexedLimits(limitsIndex, aLocation)
+                factor = self._calcOffAxisFactor(aLocation, deltaLocation, limits)
+            else:
+                factor = 0
+            factors.append((factor, mathItem, deltaName))
+        return factors
+
+    def _getCompiledAnisotropicFactors(self, locX, locY, axisOnly=False):
+        """
+            Same as getAnisotropicFactors, evaluated straight from the compiled plan.
+        """
+        axisNames, limitsIndex, breakpoints, deltas = self._plan
+        locX = _expand(locX, axisNames)
+        locY = _expand(locY, axisNames)
+        limitsX = limitsY = None
+        factors = []
+        for deltaLocation, deltaAxis, mathItem, deltaName in deltas:
+            if deltaAxis is None:
+                factorX = factorY = 1
+            elif deltaAxis:
+                factorX = _onAxisFactor(locX[deltaAxis], deltaLocation[deltaAxis], breakpoints[deltaAxis])
+                if locX[deltaAxis] == locY[deltaAxis]:
+                    factorY = factorX
+                else:
+                    factorY = _onAxisFactor(locY[deltaAxis], deltaLocation[deltaAxis], breakpoints[deltaAxis])
+            elif not axisOnly:
+                if limitsX is None:
+                    limitsX = getIndexedLimits(limitsIndex, locX)
+                    limitsY = getIndexedLimits(limitsIndex, locY)
+                factorX = self._calcOffAxisFactor(locX, deltaLocation, limitsX)
+                factorY = self._calcOffAxisFactor(locY, deltaLocation, limitsY)
+            else:
+                factorX = factorY = 0
+            factors.append((factorX, factorY, mathItem, deltaName))
+        return factors
+
     #
     #   get instances
     #
@@ -164,7 +343,8 @@ class Mutator(dict):
             *   getFactors:
                 *   True: return a list of the calculated factors.
         """
-        self._collectAxisPoints()
+        if self._plan is None:
+            self._collectAxisPoints()
         factors = self.getFactors(aLocation, axisOnly)
         total = None
         for f, item, name in factors:
@@ -186,24 +366,138 @@ class Mutator(dict):
             instanceObject = self.getInstance(aLocation-self._bias)
         else:
             locX, locY = aLocation.split()
-            instanceObject = self.getInstance(locX-self._bias)*(1,0)+self.getInstance(locY-self._bias)*(0,1)
+            instanceObject = self.getAnisotropicInstance(locX-self._bias, locY-self._bias)
         return instanceObject+self._neutral
 
+    def getAnisotropicInstance(self, locX, locY, axisOnly=False):
+        """ Calculate the delta at an ambivalent location, split in locX and locY:
+            x values as at locX, y values as at locY.
+            The factors of both halves come from a single traversal of the deltas
+            and every math item is multiplied once, by its (factorX, factorY) pair,
+            which math objects apply to the x and y values of their points in one pass.
+        """
+        if self._plan is None:
+            self._collectAxisPoints()
+        total = None
+        for factorX, factorY, item, name in self.getAnisotropicFactors(locX, locY, axisOnly):
+            if total is None:
+                total = item * (factorX, factorY)
+            else:
+                total += item * (factorX, factorY)
+        if total is None:
+            total = 0 * self._neutral
+        return total
+
+    def getFactorMatrix(self, locations):
+        """
+            Return the factors of all deltas at all locations (bias applied),
+            as a (locations x deltas) numpy array, in the order of the compiled plan.
+            The mutator is compiled if it wasn't already.
+        """
+        if self._plan is None:
+            self.compile()
+        factors = numpy.empty((len(locations), len(self._plan[3])))
+        for i, aLocation in enumerate(locations):
+            factors[i] = [f for f, mathItem, deltaName in self.getFactors(aLocation-self._bias)]
+        return factors
+
+    def makeInstances(self, locations, toArray=None, fromArray=None):
+        """
+            Calculate instances for a list of locations at once.
+            *   toArray: turns a math object into a numpy array,
+                defaults to the object's asArray() method.
+            *   fromArray: turns an array back into an instance,
+                defaults to the neutral's fromArray() method.
+            The deltas are stacked once and all instances are obtained with
+            a single (locations x deltas) . (deltas x values) product.
+            Ambivalent locations apply their x and y factors to the first and second
+            column of (n, 2) shaped arrays. Without numpy, or with objects that can't be
+            converted to arrays, falls back on makeInstance for each location.
+        """
+        neutral = self._neutral
+        if toArray is None and hasattr(neutral, 'asArray'):
+            toArray = lambda obj: obj.asArray()
+        if fromArray is None and hasattr(neutral, 'fromArray'):
+            fromArray = neutral.fromArray
+        if numpy is None or toArray is None or fromArray is None:
+            return [self.makeInstance(aLocation) for aLocation in locations]
+        if self._plan is None:
+            self.compile()
+        deltas = self._plan[3]
+        neutralArray = numpy.asarray(toArray(neutral), dtype=numpy.float64)
+        shape = neutralArray.shape
+        stacked = numpy.empty((len(deltas), neutralArray.size))
+        for i, (deltaLocation, deltaAxis, mathItem, deltaName) in enumerate(deltas):
+            stacked[i] = numpy.asarray(toArray(mathItem), dtype=numpy.float64).ravel()
+        rows = []
+        factorRows = []
+        for aLocation in locations:
+            if aLocation.isAmbivalent():
+                if len(shape) != 2 or shape[1] != 2:
+                    raise MutatorError("Ambivalent locations need (n, 2) shaped arrays.", aLocation)
+                locX, locY = aLocation.split()
+                factors = self.getAnisotropicFactors(locX-self._bias, locY-self._bias)
+                rows.append((len(factorRows), len(factorRows)+1))
+                factorRows.append([factorX for factorX, factorY, mathItem, deltaName in factors])
+                factorRows.append([factorY for factorX, factorY, mathItem, deltaName in factors])
+            else:
+                rows.append((len(factorRows), None))
+                factorRows.append([f for f, mathItem, deltaName in self.getFactors(aLocation-self._bias)])
+        values = numpy.dot(numpy.array(factorRows, dtype=numpy.float64).reshape((len(factorRows), len(deltas))), stacked)
+        instances = []
+        for xRow, yRow in rows:
+            value = values[xRow].reshape(shape)
+            if yRow is not None:
+                value[:,1] = values[yRow].reshape(shape)[:,1]
+            instances.append(fromArray(value+neutralArray))
+        return instances
+
     def getFactors(self, aLocation, axisOnly=False):
         """
             Return a list of all factors and math items at aLocation.
             factor, mathItem, deltaName
         """
+        if self._plan is not None:
+            return self._getCompiledFactors(aLocation, axisOnly)
         deltas = []
-        aLocation.expand(self.getAxisNames())
+        axisNames = self.getAxisNames()
+        aLocation = _expand(aLocation, axisNames)
         limits = getLimits(self._allLocations(), aLocation)
         for deltaLocationTuple, (mathItem, deltaName) in self.items():
-            deltaLocation = Location(deltaLocationTuple)
-            deltaLocation.expand( self.getAxisNames())
+            deltaLocation = frozenLocation(deltaLocationTuple).expanded(axisNames)
             factor = self._accumulateFactors(aLocation, deltaLocation, limits, axisOnly)
             deltas.append((factor, mathItem, deltaName))
         return deltas
 
+    def getAnisotropicFactors(self, locX, locY, axisOnly=False):
+        """
+            Return a list of the factors at both halves of an ambivalent location
+            and the math items, in a single traversal of the deltas.
+            factorX, factorY, mathItem, deltaName
+            On-axis deltas of axes where both halves agree get their factor computed once.
+        """
+        if self._plan is not None:
+            return self._getCompiledAnisotropicFactors(locX, locY, axisOnly)
+        deltas = []
+        axisNames = self.getAxisNames()
+        locX = _expand(locX, axisNames)
+        locY = _expand(locY, axisNames)
+        allLocations = self._allLocations()
+        limitsX = getLimits(allLocations, locX)
+        limitsY = None
+        for deltaLocationTuple, (mathItem, deltaName) in self.items():
+            deltaLocation = frozenLocation(deltaLocationTuple).expanded(axisNames)
+            deltaAxis = deltaLocation.isOnAxis()
+            factorX = self._accumulateFactors(locX, deltaLocation, limitsX, axisOnly)
+            if deltaAxis is None or (deltaAxis and locX[deltaAxis] == locY[deltaAxis]) or (deltaAxis is False and axisOnly):
+                factorY = factorX
+            else:
+                if limitsY is None:
+                    limitsY = getLimits(allLocations, locY)
+                factorY = self._accumulateFactors(locY, deltaLocation, limitsY, axisOnly)
+            deltas.append((factorX, factorY, mathItem, deltaName))
+        return deltas
+
     #
     #   calculate
     #
@@ -248,53 +542,12 @@ class Mutator(dict):
         else:
             f = aLocation[deltaAxis]
             v = deltaLocation[deltaAxis]
-        i = []
         iv = {}
         for value in deltasOnSameAxis:
-            iv[Location(value)[deltaAxis]]=1
+            iv[frozenLocation(value)[deltaAxis]]=1
         i = iv.keys()
         i.sort()
-        r = 0
-        B, M, A = [], [], []
-        mA, mB, mM = None, None, None
-        for value in i:
-            if value < f: B.append(value)
-            elif value > f: A.append(value)
-            else: M.append(value)
-        if len(B) > 0:
-            mB = max(B)
-            B.sort()
-        if len(A) > 0:
-            mA = min(A)
-            A.sort()
-        if len(M) > 0:
-            mM = min(M)
-            M.sort()
-        if mM is not None:
-            if ((f-_EPSILON <  v) and (f+_EPSILON > v)) or f==v: r = 1
-            else: r = 0
-        elif mB is not None and mA is not None:
-            if v < mB or v > mA: r = 0
-            else:
-                if v == mA:
-                    r = float(f-mB)/(mA-mB)
-                else:
-                    r = float(f-mA)/(mB-mA)
-        elif mB is None and mA is not None:
-            if v==A[1]:
-                r = float(f-A[0])/(A[1]-A[0])
-            elif v == A[0]:
-                r = float(f-A[1])/(A[0]-A[1])
-            else:
-                r = 0
-        elif  mB is not None and mA is None:
-            if v == B[-2]:
-                r = float(f-B[-1])/(B[-2]-B[-1])
-            elif v == mB:
-                r = float(f-B[-2])/(B[-1]-B[-2])
-            else:
-                r = 0
-        return r
+        return _onAxisFactor(f, v, i)
 
     def _calcOffAxisFactor(self, aLocation, deltaLocation, limits):
         """
@@ -339,6 +592,147 @@ class Mutator(dict):
             f *= i
         return f
 
+def _onAxisFactor(f, v, breakpoints):
+    """
+        On-axis factor for a delta at v when the instance is at f,
+        breakpoints being the sorted on-axis values of that axis, origin included.
+        Mirrors Mutator._calcOnAxisFactor, with the breakpoints around f found by bisection.
+    """
+    n = len(breakpoints)
+    if n == 1:
+        return f * v
+    lo = bisect_left(breakpoints, f)
+    hi = bisect_right(breakpoints, f)
+    if hi > lo:
+        if ((f-_EPSILON <  v) and (f+_EPSILON > v)) or f==v: return 1
+        return 0
+    elif lo > 0 and hi < n:
+        mB = breakpoints[lo-1]
+        mA = breakpoints[hi]
+        if v < mB or v > mA: return 0
+        if v == mA:
+            return float(f-mB)/(mA-mB)
+        return float(f-mA)/(mB-mA)
+    elif hi < n:
+        a0, a1 = breakpoints[hi], breakpoints[hi+1]
+        if v == a1:
+            return float(f-a0)/(a1-a0)
+        elif v == a0:
+            return float(f-a1)/(a0-a1)
+        return 0
+    elif lo > 0:
+        b2, b1 = breakpoints[lo-2], breakpoints[lo-1]
+        if v == b2:
+            return float(f-b1)/(b2-b1)
+        elif v == b1:
+            return float(f-b2)/(b1-b2)
+        return 0
+    return 0
+
+def _bisectPredicate(values, predicate):
+    # index of the first value for which a monotone predicate holds
+    lo, hi = 0, len(values)
+    while lo < hi:
+        mid = (lo+hi)//2
+        if predicate(values[mid]):
+            hi = mid
+        else:
+            lo = mid+1
+    return lo
+
+def _distinct(values):
+    result = []
+    for value in sorted(values):
+        if not result or result[-1] != value:
+            result.append(value)
+    return result
+
+def buildLimitsIndex(locations):
+    """
+        Index the locations given to getLimits once:
+        for each axis, the sorted distinct values of the locations that have it,
+        with and without the values that are zero.
+
+        >>> index = buildLimitsIndex([Location(pop=1), Location(pop=0, snap=2), Location(pop=3, snap=1)])
+        >>> index['pop']
+        ([1, 3], [0, 1, 3])
+    """
+    nonZero = {}
+    allValues = {}
+    for l in locations:
+        for name, value in l.items():
+            allValues.setdefault(name, []).append(value)
+            if not (-_EPSILON < value < _EPSILON):
+                nonZero.setdefault(name, []).append(value)
+    index = {}
+    for name, values in allValues.items():
+        index[name] = _distinct(nonZero.get(name, [])), _distinct(values)
+    return index
+
+def getIndexedLimits(index, current):
+    """
+        Same limits as getLimits(locations, current), from the index of these locations,
+        found by bisection on each axis. When the current location sits on a value,
+        the middle limit is that value rather than getLimits’ list of locations.
+
+        >>> locations = [Location(pop=0), Location(pop=1)]
+        >>> getIndexedLimits(buildLimitsIndex(locations), Location(pop=0.5))
+        {'pop': (0, None, 1)}
+        >>> getIndexedLimits(buildLimitsIndex(locations), Location(pop=2))
+        {'pop': (0, 1, None)}
+    """
+    limits = {}
+    for name, (nonZero, allValues) in index.items():
+        f = current.get(name, None)
+        if f is None:
+            continue
+        if -_EPSILON < f < _EPSILON:
+            values = nonZero
+        else:
+            values = allValues
+        if not values:
+            continue
+        # values[:lo] are below f, values[hi:] are above f, others are equal
+        lo = _bisectPredicate(values, lambda value: not (f > value + _EPSILON))
+        hi = _bisectPredicate(values, lambda value: f < value - _EPSILON)
+        less = values[max(0, lo-2):lo]
+        more = values[hi:hi+2]
+        equal = None
+        if hi > lo:
+            equal = values[lo]
+        # the origin always takes part, on the side given by the sign of f
+        zero = bisect_left(values, 0)
+        hasZero = zero < len(values) and values[zero] == 0
+        if f > 0:
+            less = _distinct(less+[0])[-2:]
+            lessCount = lo + (not (hasZero and zero < lo))
+            moreCount = len(values)-hi
+        elif f < 0:
+            more = _distinct(more+[0])[:2]
+            moreCount = len(values)-hi + (not (hasZero and zero >= hi))
+            lessCount = lo
+        else:
+            if equal is None:
+                equal = 0
+            lessCount = lo
+            moreCount = len(values)-hi
+        if not lessCount and moreCount:
+            if equal is not None:
+                limits[name] = (None, equal, None)
+            elif moreCount > 1:
+                limits[name] = (None, more[0], more[1])
+        elif lessCount and not moreCount:
+            if equal is not None:
+                limits[name] = (None, equal, None)
+            elif lessCount > 1:
+                limits[name] = (less[-2], less[-1], None)
+        else:
+            if equal is not None:
+                limits[name] = (None, equal, None)
+            else:
+                limits[name] = (less[-1] if lessCount else None, None, more[0] if moreCount else None)
+    return limits
+
 def getLimits(locations, current, sortResults=True, verbose=False):
     """
         Find the projections for each delta in the list of locations, relative to the current location.
@@ -562,6 +956,109 @@ if __name__ == "__main__":
         4.5
         """
 
+    def test_compiled():
+        """ A compiled mutator returns the same instances.
+
+        >>> items = [
+        ...    (Location(pop=1, snap=1), 1),
+        ...    (Location(pop=3, snap=1), 3),
+        ...    (Location(pop=1, snap=2), 4),
+        ...    (Location(pop=3, snap=2), 6),
+        ...    (Location(pop=2, snap=3), 7),
+        ... ]
+        >>> bias, mb = buildMutator(items)
+        >>> bias, mc = buildMutator(items)
+        >>> mc.compile().isCompiled()
+        True
+        >>> locations = [Location(pop=p, snap=s) for p in (0, 1, 1.5, 3, 4) for s in (0.5, 1, 2.5, 3)]
+        >>> [mb.makeInstance(l) for l in locations] == [mc.makeInstance(l) for l in locations]
+        True
+        >>> mc.addDelta(Location(pop=5), 10)
+        >>> mc.isCompiled()
+        False
+        """
+
+    def test_cachedBuilder():
+        """ Mutators built on the same locations share their topology.
+
+        >>> locations = [Location(pop=1, snap=1), Location(pop=3, snap=1), Location(pop=1, snap=2), Location(pop=3, snap=2)]
+        >>> bias, ma = buildMutator(zip(locations, [1, 3, 4, 6]), useCache=False)
+        >>> bias, mb = buildMutator(zip(locations, [2, 3, 4, 6]))
+        >>> bias, mc = buildMutator(zip(locations, [1, 3, 4, 6]))
+        >>> mc.isCompiled()
+        True
+        >>> tests = [Location(pop=p, snap=s) for p in (0, 2, 3.5) for s in (1, 1.5, 3)]
+        >>> [ma.makeInstance(l) for l in tests] == [mc.makeInstance(l) for l in tests]
+        True
+        >>> mb.makeInstance(Location(pop=1, snap=1))
+        2
+        """
+
+    def test_cachedMathInfo():
+        """ Cached topologies give the same instances for math objects that aren’t linear,
+        such as MathInfo objects with attributes undefined in some masters.
+
+        >>> from fontMath.mathInfo import MathInfo
+        >>> class Info(object):
+        ...     guidelines = []
+        ...     def __init__(self, **kwargs):
+        ...         self.__dict__.update(kwargs)
+        >>> locations = [Location(pop=p, snap=s) for s in (0, 1) for p in (0, 1, 2)]
+        >>> infos = [MathInfo(Info(ascender=700)) for l in locations]
+        >>> infos[2] = MathInfo(Info(ascender=700, postscriptSlantAngle=0))
+        >>> infos[5] = MathInfo(Info(ascender=700, postscriptSlantAngle=-12))
+        >>> clearMutatorCache()
+        >>> bias, ma = buildMutator(zip(locations, infos))
+        >>> bias, mb = buildMutator(zip(locations, infos))
+        >>> test = Location(pop=2.5, snap=.5)
+        >>> ma.makeInstance(test).postscriptSlantAngle == mb.makeInstance(test).postscriptSlantAngle
+        True
+        >>> ma.makeInstance(test).__dict__ == mb.makeInstance(test).__dict__
+        True
+        """
+
+    def test_makeInstances():
+        """ Batch instances match makeInstance.
+
+        >>> items = [
+        ...    (Location(pop=1, snap=1), 1),
+        ...    (Location(pop=3, snap=1), 3),
+        ...    (Location(pop=1, snap=2), 4),
+        ...    (Location(pop=3, snap=2), 6),
+        ... ]
+        >>> bias, mb = buildMutator(items)
+        >>> locations = [Location(pop=p, snap=s) for p in (0, 1, 2.5) for s in (1, 1.5, 3)]
+        >>> [mb.makeInstance(l) for l in locations] == mb.makeInstances(locations)
+        True
+        >>> mb.makeInstances(locations, toArray=lambda v: [v], fromArray=lambda a: float(a[0])) == [float(mb.makeInstance(l)) for l in locations]
+        True
+        >>> mb.getFactorMatrix(locations).shape
+        (9, 4)
+        """
+
+    def test_anisotropicFactors():
+        """ The factors of both halves of an ambivalent location, from one traversal.
+
+        >>> items = [
+        ...    (Location(pop=1, snap=1), 1),
+        ...    (Location(pop=3, snap=1), 3),
+        ...    (Location(pop=1, snap=2), 4),
+        ...    (Location(pop=3, snap=2), 6),
+        ...    (Location(pop=2, snap=3), 7),
+        ... ]
+        >>> bias, ma = buildMutator(items, useCache=False)
+        >>> bias, mc = buildMutator(items)
+        >>> locX, locY = (Location(pop=(1.5, 2.5), snap=2.5)-bias).split()
+        >>> for m in [ma, mc]:
+        ...     factors = m.getAnisotropicFactors(locX, locY)
+        ...     [(fx, item) for fx, fy, item, name in factors] == [(f, item) for f, item, name in m.getFactors(locX)]
+        ...     [(fy, item) for fx, fy, item, name in factors] == [(f, item) for f, item, name in m.getFactors(locY)]
+        True
+        True
+        True
+        True
+        """
+
 
     def _test():
         import doctest
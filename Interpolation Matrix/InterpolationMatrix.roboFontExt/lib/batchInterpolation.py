@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+
+'''
+Batch interpolation
+Interpolation of font wide data (kerning, font info) for many instances at once, with NumPy.
+
+Master data is aligned once into a dense (masters x values) matrix: each master is a row,
+so that a single mutator of rows gives all instances with one (locations x deltas) . (deltas x values)
+product (see Mutator.makeInstances), instead of dict arithmetic for every delta and every instance.
+Without NumPy, interpolators fall back on mutators of fontMath’s MathKerning and MathInfo objects.
+'''
+
+from _mutatorMath.objects.location import Location
+from _mutatorMath.objects.mutator import buildMutator
+from fontMath.mathFunctions import add, sub, mul, factorAngle
+from fontMath.mathInfo import MathInfo
+from fontMath.mathKerning import MathKerning
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# names of font info attributes, to find those that can be batched
+try:
+    from fontTools.ufoLib import fontInfoAttributesVersion3 as infoAttributes
+except ImportError:
+    try:
+        from ufoLib import fontInfoAttributesVersion3 as infoAttributes
+    except ImportError:
+        try:
+            from robofab.ufoLib import fontInfoAttributesVersion2 as infoAttributes
+        except ImportError:
+            infoAttributes = []
+
+def _identity(value):
+    return value
+
+def roundHalfAway(values):
+    """
+    Round an array as python 2’s round() does: halves away from zero.
+
+    >>> roundHalfAway(numpy.array([-2.5, -1.5, -0.4, 0.5, 1.5, 2.49])).tolist()
+    [-3.0, -2.0, 0.0, 1.0, 2.0, 2.0]
+    """
+    floor = numpy.floor(values)
+    fraction = values - floor
+    return numpy.where((fraction > .5) | ((fraction == .5) & (values > 0)), floor + 1, floor)
+
+class KerningInterpolator(object):
+    """
+    Interpolate the kerning of masters, a list of (Location, kerning dict), for many locations at once.
+
+        interpolator = KerningInterpolator([(location, font.kerning) for location, font in masters])
+        kernings = interpolator.makeInstances(locations)
+
+    Pairs of all masters are aligned in one sorted pair index, with a (masters x pairs) value matrix;
+    a pair missing from a master counts as 0, as with MathKerning objects built without groups.
+    Instances come out as kerning dicts, rounded unless roundValues is False, zero pairs pruned.
+    """
+
+    def __init__(self, masters):
+        pairs = set()
+        for location, kerning in masters:
+            pairs.update(kerning.keys())
+        self.pairs = sorted(pairs)
+        if numpy is None:
+            bias, self.mutator = buildMutator([(Location(location), MathKerning(kerning)) for location, kerning in masters])
+            return
+        pairIndex = dict([(pair, index) for index, pair in enumerate(self.pairs)])
+        self.values = numpy.zeros((len(masters), len(self.pairs)))
+        for masterIndex, (location, kerning) in enumerate(masters):
+            for pair, value in kerning.items():
+                self.values[masterIndex, pairIndex[pair]] = value
+        bias, self.mutator = buildMutator([(Location(location), row) for (location, kerning), row in zip(masters, self.values)])
+
+    def getValues(self, locations):
+        """
+        Return the interpolated (locations x pairs) value matrix.
+        """
+        rowLocations = []
+        for location in locations:
+            location = Location(location)
+            if location.isAmbivalent():
+                # MathKerning only follows the horizontal part of anisotropic locations
+                location = location.split()[0]
+            rowLocations.append(location)
+        if not rowLocations:
+            return numpy.zeros((0, len(self.pairs)))
+        return numpy.array(self.mutator.makeInstances(rowLocations, toArray=_identity, fromArray=_identity)).reshape(len(rowLocations), len(self.pairs))
+
+    def makeInstances(self, locations, roundValues=True):
+        if numpy is None:
+            instances = []
+            for location in locations:
+                instance = self.mutator.makeInstance(Location(location))
+                if roundValues:
+                    instance.round()
+                instances.append(dict([(pair, value) for pair, value in instance.items() if value]))
+            return instances
+        values = self.getValues(locations)
+        if roundValues:
+            values = roundHalfAway(values)
+        pairs = self.pairs
+        instances = []
+        for row in values:
+            indices = numpy.flatnonzero(row)
+            rowValues = row[indices]
+            if roundValues:
+                rowValues = rowValues.astype(int)
+            instances.append(dict(zip([pairs[index] for index in indices], rowValues.tolist())))
+        return instances
+
+    def makeInstance(self, location, roundValues=True):
+        return self.makeInstances([location], roundValues)[0]
+
+# angles don’t interpolate as plain numbers
+_angleAttributes = ['italicAngle', 'postscriptSlantAngle']
+
+def _isNumber(value):
+    return isinstance(value, (int, long, float)) and not isinstance(value, bool)
+
+def _isNumberList(value):
+    return isinstance(value, (list, tuple)) and all([_isNumber(item) for item in value])
+
+class _Angles(object):
+    """
+    Angles of font info, defined in all masters, with MathInfo’s arithmetic for them.
+    """
+
+    def __init__(self, angles):
+        self.angles = angles
+
+    def __add__(self, other):
+        return _Angles([add(a, b) for a, b in zip(self.angles, other.angles)])
+
+    def __sub__(self, other):
+        return _Angles([sub(a, b) for a, b in zip(self.angles, other.angles)])
+
+    def __mul__(self, factor):
+        if not isinstance(factor, tuple):
+            factor = (factor, factor)
+        return _Angles([factorAngle(angle, factor, mul) for angle in self.angles])
+
+    __rmul__ = __mul__
+
+class _WeightClassInfo(object):
+    # info object with a weight class only, for MathInfo to name the postscript weight
+    guidelines = []
+
+    def __init__(self, weightClass):
+        self.openTypeOS2WeightClass = weightClass
+
+def _postscriptWeightName(weightClass):
+    return (MathInfo(_WeightClassInfo(weightClass)) * 1).postscriptWeightName
+
+def _hasValues(info):
+    return any([value is not None and value != [] for value in vars(info).values()])
+
+class InfoInterpolator(object):
+    """
+    Interpolate the font info of masters, a list of (Location, info object), for many locations at once,
+    with the same results as a mutator of MathInfo objects.
+
+        interpolator = InfoInterpolator([(location, font.info) for location, font in masters])
+        infos = interpolator.makeInstances(locations)
+
+    Numbers and number lists defined in all masters (vertical metrics, blue zones…) are columns of one
+    (masters x values) array. As with MathInfo, deltas are accumulated one after the other, for all
+    locations and columns at once, so that values are exactly the same. Angles defined in all masters
+    are interpolated with fontMath’s angle math, and whatever is left (guidelines, attributes undefined
+    in some masters) by MathInfo objects reduced to it; anisotropic locations by MathInfo entirely.
+    Instances are MathInfo objects, rounded on demand, to be extracted as usual.
+    """
+
+    def __init__(self, masters):
+        self.locations = [Location(location) for location, info in masters]
+        self.masterInfos = [MathInfo(info) for location, info in masters]
+        self.columns = []
+        self.angleAttributes = []
+        self.mathInfoMutator = None
+        if numpy is None:
+            return
+        for attr in infoAttributes:
+            values = [getattr(info, attr, None) for info in self.masterInfos]
+            if attr in _angleAttributes:
+                if all([_isNumber(value) for value in values]):
+                    self.angleAttributes.append(attr)
+            elif all([_isNumber(value) for value in values]):
+                self.columns.append((attr, None))
+            elif all([_isNumberList(value) for value in values]) and len(set([len(value) for value in values])) == 1:
+                self.columns.extend([(attr, item) for item in range(len(values[0]))])
+        rows = []
+        for info in self.masterInfos:
+            rows.append([getattr(info, attr) if item is None else getattr(info, attr)[item] for attr, item in self.columns])
+        rows = numpy.array(rows, dtype=numpy.float64).reshape(len(masters), len(self.columns))
+        bias, self.mutator = buildMutator(zip(self.locations, rows))
+        if not self.mutator.isCompiled():
+            self.mutator.compile()
+        self.angleMutator = None
+        if self.angleAttributes:
+            angles = [_Angles([getattr(info, attr) for attr in self.angleAttributes]) for info in self.masterInfos]
+            bias, self.angleMutator = buildMutator(zip(self.locations, angles))
+        otherInfos = []
+        for info in self.masterInfos:
+            info = info.copy()
+            for attr, item in self.columns:
+                setattr(info, attr, None)
+            for attr in self.angleAttributes:
+                setattr(info, attr, None)
+            otherInfos.append(info)
+        self.otherMutator = None
+        # as a mutator’s instances, arithmetic defines all attributes
+        self.blankInfo = otherInfos[0] + otherInfos[0]
+        if any([_hasValues(info) for info in otherInfos]):
+            bias, self.otherMutator = buildMutator(zip(self.locations, otherInfos))
+
+    def _getMathInfoMutator(self):
+        if self.mathInfoMutator is None:
+            bias, self.mathInfoMutator = buildMutator(zip(self.locations, self.masterInfos))
+        return self.mathInfoMutator
+
+    def _getValues(self, factors):
+        # same operations as Mutator.makeInstance, in the same order, on all locations at once
+        deltas = self.mutator._plan[3]
+        neutral = self.mutator.getNeutral()
+        total = numpy.zeros((len(factors), 1)) * neutral
+        for deltaIndex, (deltaLocation, deltaAxis, mathItem, deltaName) in enumerate(deltas):
+            value = factors[:, deltaIndex:deltaIndex+1] * mathItem
+            total = value if deltaIndex == 0 else total + value
+        return total + neutral
+
+    def _getInstance(self, mutator, location, factors):
+        # same as mutator.makeInstance(location), with the factors of self.mutator when the deltas match:
+        # mutators of the same locations have the same deltas in the same order
+        if [delta[0] for delta in mutator._plan[3]] != [delta[0] for delta in self.mutator._plan[3]]:
+            return mutator.makeInstance(location)
+        neutral = mutator.getNeutral()
+        total = None
+        for factor, (deltaLocation, deltaAxis, mathItem, deltaName) in zip(factors, mutator._plan[3]):
+            value = factor * mathItem
+            total = value if total is None else total + value
+        if total is None:
+            total = 0 * neutral
+        return total + neutral
+
+    def getValues(self, locations):
+        """
+        Return the interpolated (locations x columns) array, locations not being anisotropic.
+        """
+        return self._getValues(self.mutator.getFactorMatrix([Location(location) for location in locations]))
+
+    def makeInstances(self, locations, roundValues=False):
+        """
+        Return a MathInfo for each location, rounded as by MathInfo.round() if roundValues is True.
+
+        >>> from defcon import Font
+        >>> locations = [Location(weight=w, width=d) for d in (0, 1) for w in (0, 1, 2)]
+        >>> infos = [Font().info for location in locations]
+        >>> for index, info in enumerate(infos):
+        ...     info.ascender, info.openTypeOS2WeightClass = 700 + index * 10, 100 + index * 150
+        >>> infos[2].postscriptSlantAngle, infos[5].postscriptSlantAngle = 0, -12
+        >>> bias, mutator = buildMutator([(location, MathInfo(info)) for location, info in zip(locations, infos)], useCache=False)
+        >>> tests = [Location(weight=2.5, width=.5), Location(weight=-1, width=1.5), Location(weight=(1, 2), width=0)]
+        >>> expected = [mutator.makeInstance(location) for location in tests]
+        >>> instances = InfoInterpolator(zip(locations, infos)).makeInstances(tests)
+        >>> [instance.__dict__ for instance in instances] == [instance.__dict__ for instance in expected]
+        True
+        >>> [instance.postscriptSlantAngle for instance in instances]
+        [-180.0, -180.0, 0.0]
+        """
+        locations = [Location(location) for location in locations]
+        instances = [None] * len(locations)
+        if numpy is not None:
+            batched = [index for index, location in enumerate(locations) if not location.isAmbivalent()]
+            factors = self.mutator.getFactorMatrix([locations[index] for index in batched])
+            values = self._getValues(factors).tolist()
+            factors = factors.tolist()
+            # rounding names the postscript weight again, after the rounded weight class
+            weightNames = None
+            if ('openTypeOS2WeightClass', None) in self.columns and not roundValues:
+                weightNames = {}
+            for index, rowFactors, rowValues in zip(batched, factors, values):
+                location = locations[index]
+                if self.otherMutator is not None:
+                    instance = self._getInstance(self.otherMutator, location, rowFactors)
+                else:
+                    instance = self.blankInfo.copy()
+                lists = {}
+                for (attr, item), value in zip(self.columns, rowValues):
+                    if item is None:
+                        setattr(instance, attr, value)
+                    else:
+                        lists.setdefault(attr, []).append(value)
+                for attr, value in lists.items():
+                    setattr(instance, attr, value)
+                if self.angleMutator is not None:
+                    angles = self._getInstance(self.angleMutator, location, rowFactors)
+                    for attr, angle in zip(self.angleAttributes, angles.angles):
+                        setattr(instance, attr, angle)
+                if weightNames is not None:
+                    weightClass = instance.openTypeOS2WeightClass
+                    if weightClass not in weightNames:
+                        weightNames[weightClass] = _postscriptWeightName(weightClass)
+                    instance.postscriptWeightName = weightNames[weightClass]
+                instances[index] = instance
+        for index, location in enumerate(locations):
+            if instances[index] is None:
+                instances[index] = self._getMathInfoMutator().makeInstance(location)
+        if roundValues:
+            instances = [instance.round() for instance in instances]
+        return instances
+
+    def makeInstance(self, location, roundValues=False):
+        return self.makeInstances([location], roundValues)[0]
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+
+'''
+Compatibility
+Bulk interpolation compatibility analysis of master fonts.
+
+Each glyph of each master is reduced once to a structural signature:
+
+    (point types per contour, component base glyph names, anchor names)
+
+the structure key of glyphArrays, and two glyphs are compatible if their signatures are equal, so comparing masters is a matter
+of comparing signatures. Signatures of different masters are independent from each other
+and can be computed in parallel processes when masters are UFO files.
+
+Signatures of saved glyphs are kept in a persistent index per UFO (see SignatureIndex),
+so that only glyphs edited since the last analysis are examined again.
+'''
+
+from multiprocessing import Pool
+from hashlib import md5
+import json
+import os
+import sys
+
+try:
+    from fontTools.ufoLib import UFOReader
+except ImportError:
+    from ufoLib import UFOReader
+
+from glyphArrays import GlyphStructurePen, glyphStructureKey, penStructureKey
+
+INDEX_VERSION = 2
+
+glyphSignature = glyphStructureKey
+
+def _signatureFromJSON(signature):
+    contours, components, anchors = signature
+    return tuple([tuple(contour) for contour in contours]), tuple(components), tuple(anchors)
+
+def getCacheFolder():
+    if sys.platform == 'darwin':
+        base = os.path.join(os.path.expanduser('~'), 'Library', 'Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'InterpolationMatrix', 'signatures')
+
+class _GlyphRecord(object):
+    # glyph attributes set by glifLib when reading a glyph
+
+    def __init__(self):
+        self.anchors = []
+
+class SignatureIndex(object):
+    """
+    Persistent index of the glyph signatures of a UFO on disk, saved as JSON in a cache folder
+    (one file per UFO path). Entries are stamped with their glif file’s modification time & size;
+    glyphs whose file is unchanged aren’t read again.
+
+        index = SignatureIndex(ufoPath)
+        signatures = index.getSignatures()
+        index.save()
+    """
+
+    def __init__(self, path, cacheFolder=None):
+        self.path = os.path.abspath(path)
+        if cacheFolder is None:
+            cacheFolder = getCacheFolder()
+        key = self.path.encode('utf-8') if isinstance(self.path, unicode) else self.path
+        self.indexPath = os.path.join(cacheFolder, '%s.json' % (md5(key).hexdigest()))
+        self.counters = dict.fromkeys(['reused', 'read', 'live'], 0)
+        self.entries = self._load()
+        self._glyphSet = None
+        self._glyphsFolder = None
+        self._changed = False
+
+    def _load(self):
+        try:
+            f = open(self.indexPath, 'r')
+            try:
+                data = json.load(f)
+            finally:
+                f.close()
+        except (IOError, ValueError):
+            return {}
+        if data.get('version') != INDEX_VERSION or data.get('path') != self.path:
+            return {}
+        return data.get('glyphs', {})
+
+    def save(self):
+        """
+        Write the index if it changed, dropping glyphs that are gone from the UFO.
+        """
+        if not self._changed:
+            return
+        contents = self.getGlyphSet().contents
+        glyphs = dict([(glyphName, entry) for glyphName, entry in self.entries.items() if glyphName in contents])
+        folder = os.path.dirname(self.indexPath)
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        tempPath = self.indexPath + '.tmp'
+        f = open(tempPath, 'w')
+        try:
+            json.dump(dict(version=INDEX_VERSION, path=self.path, glyphs=glyphs), f)
+        finally:
+            f.close()
+        os.rename(tempPath, self.indexPath)
+        self._changed = False
+
+    def getGlyphSet(self):
+        if self._glyphSet is None:
+            self._glyphSet = UFOReader(self.path).getGlyphSet()
+            self._glyphsFolder = os.path.join(self.path, self._glyphSet.dirName)
+        return self._glyphSet
+
+    def hasGlyph(self, glyphName):
+        return glyphName in self.getGlyphSet().contents
+
+    def getSignature(self, glyphName):
+        """
+        Return the signature of a glyph as saved in the UFO.
+        """
+        glyphSet = self.getGlyphSet()
+        fileName = glyphSet.contents[glyphName]
+        fileInfo = os.stat(os.path.join(self._glyphsFolder, fileName))
+        stamp = [fileName, fileInfo.st_mtime, fileInfo.st_size]
+        entry = self.entries.get(glyphName)
+        if entry is not None and entry[0] == stamp:
+            self.counters['reused'] += 1
+            return _signatureFromJSON(entry[1])
+        glyph = _GlyphRecord()
+        pen = GlyphStructurePen()
+        glyphSet.readGlyph(glyphName, glyph, pen)
+        signature = penStructureKey(pen, glyph.anchors)
+        self.entries[glyphName] = stamp, signature
+        self.counters['read'] += 1
+        self._changed = True
+        return signature
+
+    def getSignatures(self, glyphNames=None):
+        """
+        Return {glyphName: signature} for glyphNames (all glyphs by default) found in the UFO.
+        """
+        if glyphNames is None:
+            glyphNames = self.getGlyphSet().contents.keys()
+        return dict([(glyphName, self.getSignature(glyphName)) for glyphName in glyphNames if self.hasGlyph(glyphName)])
+
+def _getLoadedGlyphs(font):
+    # {glyphName: glyph} of glyphs a defcon (or Robofont) font loaded from disk or created,
+    # any other glyph is as saved; None if that can’t be told
+    if hasattr(font, 'naked'):
+        font = font.naked()
+    return getattr(getattr(font, '_glyphSet', None), '_glyphs', None)
+
+def _isSaved(font, glyphName, loadedGlyphs):
+    if loadedGlyphs is not None:
+        if glyphName not in loadedGlyphs:
+            return True
+        glyph = loadedGlyphs[glyphName]
+    else:
+        glyph = font[glyphName]
+    if hasattr(glyph, 'naked'):
+        glyph = glyph.naked()
+    return getattr(glyph, 'dirty', True) == False
+
+def fontSignatures(font, glyphNames=None, index=None):
+    """
+    Return {glyphName: signature} for glyphNames (all glyphs by default) found in font.
+    With the SignatureIndex of the font’s UFO, glyphs unchanged since they were loaded or saved
+    get their signature from the index.
+    """
+    if glyphNames is None:
+        glyphNames = font.keys()
+    if index is None:
+        return dict([(glyphName, glyphSignature(font[glyphName])) for glyphName in glyphNames if glyphName in font])
+    loadedGlyphs = _getLoadedGlyphs(font)
+    signatures = {}
+    for glyphName in glyphNames:
+        if glyphName not in font:
+            continue
+        if index.hasGlyph(glyphName) and _isSaved(font, glyphName, loadedGlyphs):
+            signatures[glyphName] = index.getSignature(glyphName)
+        else:
+            signatures[glyphName] = glyphSignature(font[glyphName])
+            index.counters['live'] += 1
+    return signatures
+
+def _getIndex(master, cacheFolder):
+    path = master if isinstance(master, basestring) else getattr(master, 'path', None)
+    if path is not None and os.path.isdir(path):
+        return SignatureIndex(path, cacheFolder)
+
+def _ufoSignatures(args):
+    path, glyphNames, useIndex, cacheFolder = args
+    if useIndex:
+        index = SignatureIndex(path, cacheFolder)
+        signatures = index.getSignatures(glyphNames)
+        index.save()
+        return signatures, index.counters
+    from defcon.objects.font import Font
+    return fontSignatures(Font(path), glyphNames), {}
+
+def describeDifferences(signature, otherSignature):
+    """
+    Return report lines describing how two signatures differ.
+    """
+    contours, components, anchors = signature
+    otherContours, otherComponents, otherAnchors = otherSignature
+    differences = []
+    if len(contours) != len(otherContours):
+        differences.append(u'Contour count: %s ≠ %s' % (len(contours), len(otherContours)))
+    else:
+        for index, (contour, otherContour) in enumerate(zip(contours, otherContours)):
+            if len(contour) != len(otherContour):
+                differences.append(u'Contour %s point count: %s ≠ %s' % (index, len(contour), len(otherContour)))
+            elif contour != otherContour:
+                differences.append(u'Contour %s point types differ' % (index))
+    if components != otherComponents:
+        differences.append(u'Components: %s ≠ %s' % (', '.join(components) or '-', ', '.join(otherComponents) or '-'))
+    if anchors != otherAnchors:
+        differences.append(u'Anchors: %s ≠ %s' % (', '.join([str(name) for name in anchors]) or '-', ', '.join([str(name) for name in otherAnchors]) or '-'))
+    return differences
+
+class CompatibilityReport(object):
+    """
+    Compatibility of glyphs common to all masters, measured against the first master.
+
+        compatibleGlyphs        glyph names compatible across all masters
+        incompatibleGlyphs      {glyphName: [(masterIndex, differences), …]}
+        strayGlyphs             glyphs of the first master missing from others
+        issues                  set of distinct (masterIndex, differences), for the digest
+    """
+
+    def __init__(self, masterNames, glyphList, strayGlyphs):
+        self.masterNames = masterNames
+        self.glyphList = glyphList
+        self.strayGlyphs = strayGlyphs
+        self.compatibleGlyphs = []
+        self.incompatibleGlyphs = {}
+        self.issues = set()
+
+    def asDict(self):
+        return dict(
+            masters = self.masterNames,
+            compatibleGlyphs = sorted(self.compatibleGlyphs),
+            incompatibleGlyphs = dict([(glyphName, [dict(master=self.masterNames[masterIndex], differences=differences) for masterIndex, differences in issues]) for glyphName, issues in self.incompatibleGlyphs.items()]),
+            strayGlyphs = sorted(self.strayGlyphs)
+            )
+
+    def writeJSON(self, path):
+        f = open(path, 'w')
+        try:
+            json.dump(self.asDict(), f, indent=2, sort_keys=True)
+        finally:
+            f.close()
+
+    def digest(self):
+        """
+        Return the printable report lines.
+        """
+        lines = []
+        lines.append(u'\n*   Compatible glyphs: %s' % (len(self.compatibleGlyphs)))
+        lines.append(u'**  Incompatible glyphs: %s' % (len(self.incompatibleGlyphs)))
+        lines.append(u'*** Stray glyphs: %s\n– %s\n' % (len(self.strayGlyphs), u'\n– '.join(sorted(self.strayGlyphs))))
+        for glyphName in sorted(self.incompatibleGlyphs):
+            for masterIndex, differences in self.incompatibleGlyphs[glyphName]:
+                lines.append(u'%s: %s <X> %s' % (glyphName, self.masterNames[0], self.masterNames[masterIndex]))
+                lines += [u'– %s' % (difference) for difference in differences]
+                lines.append('')
+        return lines
+
+class CompatibilityAnalyzer(object):
+    """
+    Compare glyphs of master fonts by structural signature.
+
+        analyzer = CompatibilityAnalyzer(masterFonts, masterNames)
+        report = analyzer.analyze()
+
+    With processes > 1 and masters given as UFO paths, signatures of each master
+    are computed in their own process.
+    Unless useIndex is False, signatures of saved glyphs go through each UFO’s SignatureIndex.
+    """
+
+    def __init__(self, masters, masterNames=None, processes=1, useIndex=True, cacheFolder=None):
+        self.masters = masters
+        if masterNames is None:
+            masterNames = [str(master) for master in masters]
+        self.masterNames = masterNames
+        self.processes = processes
+        self.useIndex = useIndex
+        self.cacheFolder = cacheFolder
+        self.signatures = None
+        self.indexCounters = dict.fromkeys(['reused', 'read', 'live'], 0)
+
+    def _countIndex(self, counters):
+        for key, value in counters.items():
+            self.indexCounters[key] += value
+
+    def _masterSignatures(self, master, glyphNames):
+        if isinstance(master, basestring):
+            signatures, counters = _ufoSignatures((master, glyphNames, self.useIndex, self.cacheFolder))
+            self._countIndex(counters)
+            return signatures
+        index = _getIndex(master, self.cacheFolder) if self.useIndex else None
+        signatures = fontSignatures(master, glyphNames, index)
+        if index is not None:
+            index.save()
+            self._countIndex(index.counters)
+        return signatures
+
+    def computeSignatures(self, glyphNames=None):
+        masters = self.masters
+        if self.processes > 1 and all([isinstance(master, basestring) for master in masters]):
+            pool = Pool(min(self.processes, len(masters)))
+            try:
+                results = pool.map(_ufoSignatures, [(path, glyphNames, self.useIndex, self.cacheFolder) for path in masters])
+            finally:
+                pool.close()
+                pool.join()
+            signatures = []
+            for masterSignatures, counters in results:
+                signatures.append(masterSignatures)
+                self._countIndex(counters)
+        else:
+            signatures = [self._masterSignatures(master, glyphNames) for master in masters]
+        self.signatures = signatures
+        return signatures
+
+    def indexReport(self):
+        c = self.indexCounters
+        return 'signatures: %s reused from index, %s read from disk, %s from unsaved glyphs' % (c['reused'], c['read'], c['live'])
+
+    def analyze(self):
+        signatures = self.computeSignatures()
+        fontKeys = [set(masterSignatures.keys()) for masterSignatures in signatures]
+        commonGlyphs = set.intersection(*fontKeys) if fontKeys else set()
+        strayGlyphs = (fontKeys[0] - set().union(*fontKeys[1:])) if fontKeys else set()
+        report = CompatibilityReport(self.masterNames, sorted(commonGlyphs), strayGlyphs)
+        refSignatures = signatures[0]
+        for glyphName in report.glyphList:
+            refSignature = refSignatures[glyphName]
+            glyphIssues = []
+            for masterIndex in range(1, len(signatures)):
+                signature = signatures[masterIndex][glyphName]
+                if signature != refSignature:
+                    differences = tuple(describeDifferences(refSignature, signature))
+                    glyphIssues.append((masterIndex, differences))
+                    report.issues.add((masterIndex, differences))
+            if glyphIssues:
+                report.incompatibleGlyphs[glyphName] = glyphIssues
+            else:
+                report.compatibleGlyphs.append(glyphName)
+        return report
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+
+'''
+Family generator
+Headless batch generation of interpolated instance fonts.
+
+Master glyphs are serialized once to plain read-only data (structure key, point attributes,
+coordinate rows, unicodes, guidelines, note and lib), shared with a pool of worker processes.
+Spots and glyph chunks within a spot are fanned out to the workers, which return interpolated
+coordinate arrays; the parent process streams glyphs to the instance UFOs as they come in.
+Instances are written as a font interpolated in memory is saved: rounded as by font.round(),
+with interpolated guidelines, note and lib, and font info left unrounded.
+A single instance can also be streamed in process, one glyph at a time (see streamInstance),
+so that memory doesn’t grow with the number of glyphs.
+
+Works on any font objects following the defcon/fontParts API (font[glyphName], info, kerning,
+groups, newGlyph, save), so it runs outside of Robofont. Glyphs are interpolated as NumPy arrays,
+the module imports without NumPy but generating needs it.
+'''
+
+from _mutatorMath.objects.location import Location, frozenLocation
+from _mutatorMath.objects.mutator import buildMutator
+from glyphArrays import FlatGlyph, getStructure, readGlyphExtras, _readGlyph
+from batchInterpolation import KerningInterpolator, InfoInterpolator
+from instanceWriter import StreamingUFOWriter, FontWriter, InfoRecord, KerningRecord
+from multiprocessing import Pool, cpu_count
+from time import time
+import os
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def serializeMasters(masters, glyphNames):
+    """
+    Return the read-only form of master glyphs shared with workers:
+
+        {glyphName: [(locationTuple, structureKey, pointAttributes, rows, unicodes, extras), …]}
+
+    masters being a list of (Location, font). Glyphs missing from a master are left out.
+    """
+    glyphMasters = {}
+    for glyphName in glyphNames:
+        glyphData = []
+        for location, font in masters:
+            if glyphName not in font:
+                break
+            glyph = font[glyphName]
+            key, pointAttributes, rows = _readGlyph(glyph)
+            glyphData.append((Location(location).asTuple(), key, pointAttributes, rows, list(glyph.unicodes), readGlyphExtras(glyph)))
+        else:
+            glyphMasters[glyphName] = glyphData
+    return glyphMasters
+
+# worker state, set once per process by _initWorker
+_glyphMasters = None
+_glyphMutators = {}
+
+def _initWorker(glyphMasters):
+    global _glyphMasters
+    _glyphMasters = glyphMasters
+    _glyphMutators.clear()
+
+def buildGlyphMutator(glyphName, glyphData):
+    """
+    Return a mutator of FlatGlyphs for the serialized masters of a glyph.
+    """
+    items = []
+    for locationTuple, key, pointAttributes, rows, unicodes, extras in glyphData:
+        mathGlyph = FlatGlyph(structure=getStructure(key), values=numpy.array(rows, dtype=numpy.float64), pointAttributes=pointAttributes, name=glyphName, unicodes=unicodes, extras=extras)
+        items.append((Location(locationTuple), mathGlyph))
+    bias, mutator = buildMutator(items)
+    return mutator
+
+def _getGlyphMutator(glyphName):
+    if glyphName not in _glyphMutators:
+        _glyphMutators[glyphName] = buildGlyphMutator(glyphName, _glyphMasters[glyphName]).compile()
+    return _glyphMutators[glyphName]
+
+def _instanceData(instance):
+    # what is written of an instance FlatGlyph, plain data to go back from workers
+    return instance.structure.key, instance.values, instance.pointAttributes, instance.unicodes, instance.extras
+
+def interpolateGlyphChunk(task):
+    """
+    Interpolate a chunk of glyphs for one spot, task being (spotIndex, locationTuple, glyphNames).
+    Return (spotIndex, [(glyphName, instanceData), …]), instanceData being
+    (structureKey, values, pointAttributes, unicodes, extras), or None for incompatible glyphs.
+    """
+    spotIndex, locationTuple, glyphNames = task
+    location = frozenLocation(locationTuple)
+    results = []
+    for glyphName in glyphNames:
+        try:
+            instanceData = _instanceData(_getGlyphMutator(glyphName).makeInstance(location))
+        except:
+            instanceData = None
+        results.append((glyphName, instanceData))
+    return spotIndex, results
+
+def _chunks(items, size):
+    return [items[i:i+size] for i in range(0, len(items), size)]
+
+class FamilyGenerator(object):
+    """
+    Generate instance fonts for a list of spots from masters, a list of (Location, font).
+
+        generator = FamilyGenerator(masters, sourceFont=masters[0][1])
+        generator.generate([('A3', Location(horizontal=100, vertical=300)), …], folderPath=folderPath)
+
+    processes defaults to the number of cpus, processes=1 runs everything in the calling process.
+    Instance glyphs keep the unicodes of the neutral master’s glyph, unless glyphUnicodes is given:
+    a function (glyphName, unicodes) -> unicodes, such as one applying Robofont’s autoUnicodes().
+    """
+
+    def __init__(self, masters, sourceFont=None, glyphNames=None, processes=None, chunkSize=64, glyphUnicodes=None):
+        self.masters = masters
+        self.sourceFont = sourceFont if sourceFont is not None else masters[0][1]
+        if glyphNames is None:
+            glyphNames = [glyphName for glyphName in self.sourceFont.keys()]
+        self.glyphNames = glyphNames
+        self.processes = processes if processes is not None else cpu_count()
+        self.chunkSize = chunkSize
+        self.glyphUnicodes = glyphUnicodes
+        self.glyphMasters = None
+        self.streamed = {}
+        self.timings = {}
+
+    def _getTasks(self, instances):
+        glyphNames = [glyphName for glyphName in self.glyphNames if glyphName in self.glyphMasters]
+        tasks = []
+        for spotIndex, (styleName, location) in enumerate(instances):
+            locationTuple = Location(location).asTuple()
+            for chunk in _chunks(glyphNames, self.chunkSize):
+                tasks.append((spotIndex, locationTuple, chunk))
+        return tasks
+
+    def _interpolateFontData(self, instances, doFontInfos, doKerning):
+        # info and kerning are single objects per font, interpolated in the parent
+        # for all instances at once
+        infos = [None] * len(instances)
+        kernings = [None] * len(instances)
+        locations = [location for styleName, location in instances]
+        if doFontInfos:
+            try:
+                interpolator = InfoInterpolator([(location, font.info) for location, font in self.masters])
+                infos = interpolator.makeInstances(locations)
+            except:
+                pass
+        if doKerning:
+            try:
+                interpolator = KerningInterpolator([(location, font.kerning) for location, font in self.masters])
+                kernings = interpolator.makeInstances(locations)
+            except:
+                pass
+        return infos, kernings
+
+    def _openWriter(self, styleName, fontFactory, folderPath):
+        if folderPath is not None:
+            return StreamingUFOWriter(os.path.join(folderPath, '%s-%s.ufo' % (self.sourceFont.info.familyName, styleName)))
+        return FontWriter(fontFactory())
+
+    def _closeWriter(self, writer, styleName, info, kerning, addGroups):
+        sourceFont = self.sourceFont
+        infoRecord = InfoRecord()
+        if info is not None:
+            info.extractInfo(infoRecord)
+        infoRecord.familyName = sourceFont.info.familyName
+        infoRecord.styleName = styleName
+        kerningRecord = KerningRecord()
+        if kerning is not None:
+            kerningRecord.kerning.update(kerning)
+        groups = kerningRecord.groups
+        # groups go with kerning, as in fonts built in memory
+        if addGroups and kerning is not None:
+            for key, value in sourceFont.groups.items():
+                groups[key] = list(value)
+        lib = {}
+        glyphOrder = sourceFont.lib.get('public.glyphOrder')
+        if glyphOrder is not None:
+            lib['public.glyphOrder'] = list(glyphOrder)
+        return writer.close(infoRecord, kerningRecord.kerning, groups, lib)
+
+    def _writeGlyph(self, writer, glyphName, instanceData):
+        key, values, pointAttributes, unicodes, extras = instanceData
+        if self.glyphUnicodes is not None:
+            unicodes = self.glyphUnicodes(glyphName, list(unicodes or []))
+        writer.writeGlyph(glyphName, getStructure(key), values, pointAttributes, unicodes, extras)
+
+    def _writeGlyphs(self, writer, results):
+        incompatibleGlyphs = []
+        for glyphName, instanceData in results:
+            if instanceData is None:
+                incompatibleGlyphs.append(glyphName)
+                continue
+            self._writeGlyph(writer, glyphName, instanceData)
+        return incompatibleGlyphs
+
+    def streamInstance(self, styleName, location, folderPath, doGlyphs=True, doKerning=True, doFontInfos=True, addGroups=True):
+        """
+        Generate a single instance to familyName-styleName.ufo in folderPath, in process:
+        each glyph is read from the masters, interpolated, rounded and written before the next one,
+        nothing is kept but glyph names. Return (styleName, UFO path, incompatible glyph names);
+        what was written is summed up in self.streamed.
+        """
+        start = time()
+        if not os.path.isdir(folderPath):
+            os.makedirs(folderPath)
+        infos, kernings = self._interpolateFontData([(styleName, location)], doFontInfos, doKerning)
+        writer = self._openWriter(styleName, None, folderPath)
+        incompatibleGlyphs = []
+        if doGlyphs:
+            location = Location(location)
+            for glyphName in self.glyphNames:
+                glyphData = serializeMasters(self.masters, [glyphName]).get(glyphName)
+                if glyphData is None:
+                    continue
+                try:
+                    instanceData = _instanceData(buildGlyphMutator(glyphName, glyphData).makeInstance(location))
+                except:
+                    incompatibleGlyphs.append(glyphName)
+                    continue
+                self._writeGlyph(writer, glyphName, instanceData)
+        glyphCount = writer.glyphCount
+        path = self._closeWriter(writer, styleName, infos[0], kernings[0], addGroups)
+        self.streamed = {'glyphs': glyphCount, 'info': infos[0] is not None, 'kerning': kernings[0] is not None}
+        self.timings = {'total': (time()-start)*1000}
+        return styleName, path, incompatibleGlyphs
+
+    def generate(self, instances, fontFactory=None, folderPath=None, doGlyphs=True, doKerning=True, doFontInfos=True, addGroups=True):
+        """
+        Generate a font for each (styleName, location) in instances.
+        If folderPath is given, glyphs are streamed to familyName-styleName.ufo files in that folder,
+        otherwise fonts are built in memory, made by fontFactory.
+        Return a list of (styleName, UFO path or font, incompatible glyph names).
+        """
+        start = time()
+        if doGlyphs and self.glyphMasters is None:
+            self.glyphMasters = serializeMasters(self.masters, self.glyphNames)
+        serialized = time()
+        infos, kernings = self._interpolateFontData(instances, doFontInfos, doKerning)
+        tasks = self._getTasks(instances) if doGlyphs else []
+        chunkCounts = [0] * len(instances)
+        for spotIndex, locationTuple, chunk in tasks:
+            chunkCounts[spotIndex] += 1
+        if folderPath is not None and not os.path.isdir(folderPath):
+            os.makedirs(folderPath)
+
+        pool = None
+        if len(tasks) > 1 and self.processes > 1:
+            # workers inherit the serialized masters once, at startup
+            pool = Pool(min(self.processes, len(tasks)), _initWorker, (self.glyphMasters,))
+            results = pool.imap(interpolateGlyphChunk, tasks)
+        else:
+            _initWorker(self.glyphMasters)
+            results = (interpolateGlyphChunk(task) for task in tasks)
+
+        generated = []
+        writers = {}
+        incompatibleGlyphs = {}
+
+        def getWriter(spotIndex):
+            if spotIndex not in writers:
+                styleName, location = instances[spotIndex]
+                writers[spotIndex] = self._openWriter(styleName, fontFactory, folderPath)
+                incompatibleGlyphs[spotIndex] = []
+            return writers[spotIndex]
+
+        def finishFont(spotIndex):
+            styleName, location = instances[spotIndex]
+            writer = getWriter(spotIndex)
+            output = self._closeWriter(writer, styleName, infos[spotIndex], kernings[spotIndex], addGroups)
+            generated.append((styleName, output, incompatibleGlyphs.pop(spotIndex)))
+            del writers[spotIndex]
+
+        try:
+            for spotIndex in range(len(instances)):
+                if not chunkCounts[spotIndex]:
+                    finishFont(spotIndex)
+            # results come back in task order, so a font is finished and released
+            # as soon as its last chunk is in
+            for spotIndex, glyphResults in results:
+                writer = getWriter(spotIndex)
+                incompatibleGlyphs[spotIndex] += self._writeGlyphs(writer, glyphResults)
+                chunkCounts[spotIndex] -= 1
+                if not chunkCounts[spotIndex]:
+                    finishFont(spotIndex)
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+        self.timings = {'serialize': (serialized-start)*1000, 'total': (time()-start)*1000}
+        return generated
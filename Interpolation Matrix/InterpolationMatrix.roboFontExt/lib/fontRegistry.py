@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+'''
+Font registry
+Index of the fonts open in Robofont, for master lookups without enumerating AllFonts().
+
+Fonts are indexed by identity, by path and by 'familyName > styleName', and the index follows
+fontDidOpen & fontDidClose notifications. Paths and names can change without notice (save as,
+font info edits), so a path or name lookup that misses reindexes the registered fonts once,
+and hits are checked against the font’s current values.
+
+Tools of the extension share one registry (see getFontRegistry), which observes notifications
+for as long as one of them holds it:
+
+    fonts = getFontRegistry(AllFonts, addObserver, removeObserver)
+    fonts.acquire()
+    masterFont in fonts, fonts.getByPath(path), fonts.getByName(familyName, styleName)
+    fonts.release()
+'''
+
+from collections import OrderedDict
+
+def fontIdentity(font):
+    # Robofont wraps the same font in new objects, the wrapped font is what identifies it
+    if hasattr(font, 'naked'):
+        return id(font.naked())
+    return id(font)
+
+def fontNameKey(font):
+    return font.info.familyName, font.info.styleName
+
+class FontRegistry(object):
+    """
+    Open fonts indexed by identity, path and name, as they are opened & closed.
+    allFonts() returns the fonts open when the registry starts observing, or needs resyncing.
+    """
+
+    def __init__(self, allFonts=None, addObserver=None, removeObserver=None):
+        self.allFonts = allFonts
+        self.addObserver = addObserver
+        self.removeObserver = removeObserver
+        self.users = 0
+        self.counters = dict.fromkeys(['hits', 'misses', 'reindexes', 'syncs'], 0)
+        self.clear()
+
+    def clear(self):
+        self.fonts = OrderedDict()
+        self.paths = {}
+        self.names = {}
+
+    def sync(self, fonts=None):
+        """
+        Index fonts, or those allFonts() returns, instead of the registered ones.
+        """
+        if fonts is None:
+            fonts = self.allFonts() if self.allFonts is not None else []
+        self.counters['syncs'] += 1
+        self.clear()
+        for font in fonts:
+            self.add(font)
+
+    def acquire(self):
+        """
+        Start using the registry, the first user has it sync and observe notifications.
+        """
+        if self.users == 0:
+            self.sync()
+            if self.addObserver is not None:
+                self.addObserver(self, 'fontDidOpen', 'fontDidOpen')
+                self.addObserver(self, 'fontDidClose', 'fontDidClose')
+        self.users += 1
+        return self
+
+    def release(self):
+        """
+        Stop using the registry, the last user has it stop observing notifications.
+        """
+        if self.users == 0:
+            return
+        self.users -= 1
+        if self.users == 0:
+            if self.removeObserver is not None:
+                self.removeObserver(self, 'fontDidOpen')
+                self.removeObserver(self, 'fontDidClose')
+            self.clear()
+
+    def add(self, font):
+        if font is None:
+            return
+        identity = fontIdentity(font)
+        if identity in self.fonts:
+            return
+        self.fonts[identity] = font
+        self._indexFont(font)
+
+    def remove(self, font):
+        font = self.fonts.pop(fontIdentity(font), None)
+        if font is None:
+            return
+        for index in [self.paths, self.names]:
+            for key in [key for key, indexedFont in index.items() if indexedFont is font]:
+                del index[key]
+
+    def _indexFont(self, font):
+        path = getattr(font, 'path', None)
+        if path is not None:
+            self.paths[path] = font
+        self.names[fontNameKey(font)] = font
+
+    def reindex(self):
+        self.counters['reindexes'] += 1
+        self.paths = {}
+        self.names = {}
+        for font in self.fonts.values():
+            self._indexFont(font)
+
+    def fontDidOpen(self, notification):
+        self.add(notification.get('font'))
+
+    def fontDidClose(self, notification):
+        font = notification.get('font')
+        if font is not None:
+            self.remove(font)
+        elif font is None:
+            # which font closed isn't known, the open ones are asked for again
+            self.sync()
+
+    def __contains__(self, font):
+        return font is not None and fontIdentity(font) in self.fonts
+
+    def __iter__(self):
+        return iter(self.fonts.values())
+
+    def __len__(self):
+        return len(self.fonts)
+
+    def getFonts(self):
+        return self.fonts.values()
+
+    def _lookup(self, indexName, key, currentKey):
+        font = getattr(self, indexName).get(key)
+        if font is None or currentKey(font) != key:
+            self.reindex()
+            font = getattr(self, indexName).get(key)
+        if font is None:
+            self.counters['misses'] += 1
+        elif font is not None:
+            self.counters['hits'] += 1
+        return font
+
+    def getByPath(self, path):
+        """
+        Return the open font saved at path, or None.
+
+        >>> class Info(object): familyName, styleName = 'Family', 'Regular'
+        >>> class TestFont(object):
+        ...     info = Info()
+        ...     def __init__(self, path): self.path = path
+        >>> a, b = TestFont('a.ufo'), TestFont('b.ufo')
+        >>> fonts = FontRegistry(lambda: [a, b]).acquire()
+        >>> fonts.getByPath('b.ufo') is b
+        True
+        >>> b.path = 'c.ufo'
+        >>> fonts.getByPath('b.ufo'), fonts.getByPath('c.ufo') is b
+        (None, True)
+        >>> fonts.fontDidClose(dict(font=b))
+        >>> fonts.getByPath('c.ufo'), b in fonts, a in fonts
+        (None, False, True)
+        """
+        if path is None:
+            return None
+        return self._lookup('paths', path, lambda font: getattr(font, 'path', None))
+
+    def getByName(self, familyName, styleName):
+        """
+        Return an open font named familyName styleName, or None.
+        """
+        return self._lookup('names', (familyName, styleName), fontNameKey)
+
+    def getStats(self):
+        stats = dict(self.counters)
+        stats['size'] = len(self.fonts)
+        return stats
+
+_sharedRegistry = None
+
+def getFontRegistry(allFonts=None, addObserver=None, removeObserver=None):
+    """
+    Return the registry the extension’s tools share, made on first call.
+    """
+    global _sharedRegistry
+    if _sharedRegistry is None:
+        _sharedRegistry = FontRegistry(allFonts, addObserver, removeObserver)
+    return _sharedRegistry
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
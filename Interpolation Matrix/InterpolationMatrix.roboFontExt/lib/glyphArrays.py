@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+
+'''
+Glyph arrays
+Flatten compatible glyph math objects into (n, 2) numpy coordinate arrays and back,
+so that a mutator can compute many instances with a single matrix product.
+
+FlatGlyph is a compact math glyph built on those arrays, it can stand in for
+fontMath’s MathGlyph in mutators and is only turned back into a glyph at the end.
+Anchors are laid out by name, so that their order doesn’t matter, as with MathGlyph;
+guidelines, note and lib go along in a MathGlyph without geometry.
+'''
+
+from weakref import WeakValueDictionary
+from fontMath.mathGlyph import MathGlyph, FilterRedundantPointPen
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def _number(value):
+    # plain python numbers, integers when possible
+    value = float(value)
+    if value.is_integer():
+        return int(value)
+    return value
+
+def _anchorValues(anchor):
+    # fontMath stores anchors as dicts, glyph objects as anchor objects
+    if isinstance(anchor, dict):
+        return anchor.get('name'), anchor['x'], anchor['y']
+    return anchor.name, anchor.x, anchor.y
+
+def _appendAnchor(glyph, name, x, y):
+    # RoboFab style glyphs take (name, position), defcon glyphs take a dict
+    try:
+        glyph.appendAnchor(name, (x, y))
+    except TypeError:
+        glyph.appendAnchor(dict(name=name, x=x, y=y))
+
+class GlyphStructurePen(object):
+    """
+    Point pen recording a glyph’s structure apart from its coordinates.
+    """
+
+    def __init__(self):
+        self.contours = []
+        self.components = []
+        self.coordinates = []
+        self.pointAttributes = []
+        self.transformations = []
+
+    def beginPath(self, identifier=None, **kwargs):
+        self._points = []
+
+    def addPoint(self, pt, segmentType=None, smooth=False, name=None, identifier=None, **kwargs):
+        self._points.append(segmentType)
+        self.pointAttributes.append((smooth, name))
+        self.coordinates.append(pt)
+
+    def endPath(self):
+        self.contours.append(tuple(self._points))
+        self._points = None
+
+    def addComponent(self, baseGlyphName, transformation, identifier=None, **kwargs):
+        self.components.append(baseGlyphName)
+        self.transformations.append(tuple(transformation))
+
+def _structureKey(pen, anchorNames):
+    return tuple(pen.contours), tuple(pen.components), tuple(anchorNames)
+
+def _anchorName(anchorValues):
+    return anchorValues[0]
+
+def penStructureKey(pen, anchors):
+    """
+    Return the structure key of a glyph drawn into a GlyphStructurePen, with its anchors.
+    """
+    return _structureKey(pen, sorted([_anchorValues(anchor)[0] for anchor in anchors]))
+
+def glyphStructureKey(glyph):
+    """
+    Return the structure key of a glyph: (point types per contour, component base glyph names, sorted anchor names).
+    Glyphs with the same key are compatible, and have the same GlyphArrayStructure.
+    """
+    pen = GlyphStructurePen()
+    glyph.drawPoints(pen)
+    return penStructureKey(pen, glyph.anchors)
+
+def _readGlyph(glyph):
+    pen = GlyphStructurePen()
+    glyph.drawPoints(pen)
+    anchors = sorted([_anchorValues(anchor) for anchor in glyph.anchors], key=_anchorName)
+    height = getattr(glyph, 'height', None) or 0
+    rows = [(glyph.width, height)]
+    rows += pen.coordinates
+    rows += [(x, y) for name, x, y in anchors]
+    for xx, xy, yx, yy, dx, dy in pen.transformations:
+        rows += [(xx, yy), (xy, yx), (dx, dy)]
+    key = _structureKey(pen, [name for name, x, y in anchors])
+    return key, tuple(pen.pointAttributes), rows
+
+class GlyphArrayStructure(object):
+    """
+    Fixed structure of a glyph (contours and segment types, components, anchors),
+    taken from a reference glyph or math glyph. Smooth flags and point names
+    aren’t structural, they are kept per glyph as point attributes.
+
+    Compatible glyphs are turned into (n, 2) arrays laid out as:
+
+        width, height
+        x, y            one row per point
+        x, y            one row per anchor, sorted by name
+        xx, yy          three rows per component
+        xy, yx
+        dx, dy
+
+    so that the first column holds horizontal values and the second vertical ones.
+    """
+
+    def __init__(self, glyph=None, key=None):
+        self.pointAttributes = None
+        if glyph is not None:
+            key, self.pointAttributes, rows = _readGlyph(glyph)
+        self.key = key
+        self.contours, self.components, self.anchorNames = key
+        self.pointCount = sum([len(contour) for contour in self.contours])
+        self.size = 1 + self.pointCount + len(self.anchorNames) + (3 * len(self.components))
+
+    def asArray(self, glyph):
+        key, pointAttributes, rows = _readGlyph(glyph)
+        if len(rows) != self.size:
+            raise ValueError('Glyph %s doesn’t match the array structure.' % (glyph.name))
+        return numpy.array(rows, dtype=numpy.float64)
+
+    def roundValues(self, values):
+        """
+        Return values rounded, except component scales.
+        """
+        rounded = numpy.round(values)
+        start = 1 + self.pointCount + len(self.anchorNames)
+        for index in range(start, self.size, 3):
+            rounded[index:index+2] = values[index:index+2]
+        return rounded
+
+    def getAnchors(self, values):
+        index = 1 + self.pointCount
+        return [dict(name=name, x=_number(values[index+i][0]), y=_number(values[index+i][1])) for i, name in enumerate(self.anchorNames)]
+
+    def drawPoints(self, values, pointPen, pointAttributes=None):
+        """
+        Draw contours and components from values into a point pen.
+        """
+        if pointAttributes is None:
+            pointAttributes = self.pointAttributes
+        index = 1
+        for contour in self.contours:
+            pointPen.beginPath()
+            for segmentType in contour:
+                x, y = values[index]
+                smooth, name = pointAttributes[index-1] if pointAttributes else (False, None)
+                pointPen.addPoint((_number(x), _number(y)), segmentType, smooth, name)
+                index += 1
+            pointPen.endPath()
+        index += len(self.anchorNames)
+        for baseGlyphName in self.components:
+            (xx, yy), (xy, yx), (dx, dy) = values[index:index+3]
+            pointPen.addComponent(baseGlyphName, tuple([_number(value) for value in (xx, xy, yx, yy, dx, dy)]))
+            index += 3
+
+    def extractGlyph(self, values, glyph, pointAttributes=None):
+        """
+        Draw values (an array laid out by asArray, or the same rows as a list) into glyph, return the glyph.
+        """
+        glyph.width = _number(values[0][0])
+        if hasattr(glyph, 'height'):
+            glyph.height = _number(values[0][1])
+        # redundant curves become lines, as when MathGlyph objects are extracted
+        self.drawPoints(values, FilterRedundantPointPen(glyph.getPointPen()), pointAttributes)
+        for anchor in self.getAnchors(values):
+            _appendAnchor(glyph, anchor['name'], anchor['x'], anchor['y'])
+        return glyph
+
+class _GlyphExtras(object):
+    # a glyph as a MathGlyph sees it, without geometry: guidelines, note and lib
+
+    name = None
+    width = 0
+    height = 0
+    anchors = []
+    image = None
+
+    def __init__(self, glyph=None):
+        self.guidelines = list(getattr(glyph, 'guidelines', None) or [])
+        self.note = getattr(glyph, 'note', None)
+        self.lib = getattr(glyph, 'lib', None) or {}
+        self.unicodes = []
+
+    def drawPoints(self, pointPen):
+        pass
+
+def readGlyphExtras(glyph):
+    """
+    Return a MathGlyph of the guidelines, note and lib of glyph, None if it has none.
+    """
+    extras = _GlyphExtras(glyph)
+    if not (extras.guidelines or extras.note or extras.lib):
+        return None
+    return MathGlyph(extras)
+
+def _combineExtras(extras, otherExtras, operation):
+    # glyphs without extras count as empty ones, as MathGlyph objects with nothing in them
+    if extras is None and otherExtras is None:
+        return None
+    if extras is None:
+        extras = MathGlyph(_GlyphExtras())
+    if otherExtras is None:
+        otherExtras = MathGlyph(_GlyphExtras())
+    return operation(extras, otherExtras)
+
+def _add(a, b):
+    return a + b
+
+def _sub(a, b):
+    return a - b
+
+# identical structures are shared, so that compatibility is an identity check
+_structures = WeakValueDictionary()
+
+def getStructure(key):
+    structure = _structures.get(key)
+    if structure is None:
+        structure = _structures[key] = GlyphArrayStructure(key=key)
+    return structure
+
+class FlatGlyph(object):
+    """
+    Math glyph holding all its coordinates in a single (n, 2) float64 array
+    and a shared structure descriptor, guidelines, note and lib in extras (see readGlyphExtras).
+    Supports the same arithmetic as MathGlyph:
+
+        FlatGlyph + FlatGlyph
+        FlatGlyph - FlatGlyph
+        FlatGlyph * factor, factor being a number or an (x, y) tuple
+        FlatGlyph / factor
+    """
+
+    __slots__ = ('structure', 'values', 'pointAttributes', 'name', 'unicodes', 'extras')
+
+    def __init__(self, glyph=None, structure=None, values=None, pointAttributes=None, name=None, unicodes=None, extras=None):
+        if glyph is not None:
+            key, pointAttributes, rows = _readGlyph(glyph)
+            structure = getStructure(key)
+            values = numpy.array(rows, dtype=numpy.float64)
+            name = glyph.name
+            unicodes = getattr(glyph, 'unicodes', None)
+            extras = readGlyphExtras(glyph)
+        self.structure = structure
+        self.values = values
+        self.pointAttributes = pointAttributes
+        self.name = name
+        self.unicodes = unicodes
+        self.extras = extras
+
+    def __repr__(self):
+        return '<FlatGlyph %s %s points>' % (self.name, self.structure.pointCount)
+
+    def _new(self, values, extras):
+        return FlatGlyph(structure=self.structure, values=values, pointAttributes=self.pointAttributes, name=self.name, unicodes=self.unicodes, extras=extras)
+
+    def _otherValues(self, other):
+        if other.structure is not self.structure:
+            raise ValueError('Glyphs %s and %s are not compatible.' % (self.name, other.name))
+        return other.values
+
+    def _factor(self, factor):
+        if isinstance(factor, tuple):
+            return numpy.array(factor, dtype=numpy.float64)
+        return factor
+
+    def __add__(self, other):
+        return self._new(self.values + self._otherValues(other), _combineExtras(self.extras, other.extras, _add))
+
+    def __iadd__(self, other):
+        self.values += self._otherValues(other)
+        self.extras = _combineExtras(self.extras, other.extras, _add)
+        return self
+
+    def __sub__(self, other):
+        return self._new(self.values - self._otherValues(other), _combineExtras(self.extras, other.extras, _sub))
+
+    def __mul__(self, factor):
+        return self._new(self.values * self._factor(factor), None if self.extras is None else self.extras * factor)
+
+    __rmul__ = __mul__
+
+    def __div__(self, factor):
+        return self._new(self.values / self._factor(factor), None if self.extras is None else self.extras / factor)
+
+    __truediv__ = __div__
+
+    def copy(self):
+        return self._new(self.values.copy(), self.extras)
+
+    def round(self):
+        return self._new(self.structure.roundValues(self.values), None if self.extras is None else self.extras.round())
+
+    def asArray(self):
+        return self.values
+
+    def fromArray(self, values):
+        return self._new(numpy.asarray(values, dtype=numpy.float64).reshape(self.values.shape), self.extras)
+
+    def extractGlyph(self, glyph):
+        if self.extras is not None:
+            self.extras.extractGlyph(glyph, onlyGeometry=True)
+        if self.name is not None:
+            glyph.name = self.name
+        if self.unicodes:
+            glyph.unicodes = list(self.unicodes)
+        return self.structure.extractGlyph(self.values, glyph, self.pointAttributes)
+
+def makeMathGlyph(glyph):
+    """
+    Return a FlatGlyph for glyph, or a fontMath MathGlyph if numpy isn’t available.
+    """
+    if numpy is None:
+        from fontMath.mathGlyph import MathGlyph
+        return MathGlyph(glyph)
+    return FlatGlyph(glyph)
+
+def makeGlyphInstances(mutator, locations, glyphFactory):
+    """
+    Return instance glyphs (made by glyphFactory) for all locations,
+    computed in one batch by the mutator if numpy is available.
+    """
+    if numpy is None:
+        return [mutator.makeInstance(location).extractGlyph(glyphFactory()) for location in locations]
+    neutral = mutator.getNeutral()
+    if isinstance(neutral, FlatGlyph):
+        if neutral.extras is not None or [mathItem for mathItem, deltaName in mutator.values() if mathItem.extras is not None]:
+            # extras are interpolated by MathGlyph objects, one instance at a time
+            return [mutator.makeInstance(location).extractGlyph(glyphFactory()) for location in locations]
+        return mutator.makeInstances(locations, fromArray=lambda values: neutral.fromArray(values).extractGlyph(glyphFactory()))
+    structure = GlyphArrayStructure(neutral)
+    return mutator.makeInstances(locations, structure.asArray, lambda values: structure.extractGlyph(values, glyphFactory()))
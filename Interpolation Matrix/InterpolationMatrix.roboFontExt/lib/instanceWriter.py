@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+'''
+Instance writers
+Outputs for generated instances, receiving glyphs one at a time as coordinate arrays:
+
+    StreamingUFOWriter      writes each glyph straight to the UFO’s glyph set, so that an instance
+                            is never held in memory as a whole; contents, info, kerning, groups
+                            and lib are written when the writer is closed.
+    FontWriter              builds the instance in a font object (RFont, defcon Font…).
+
+Both write glyphs as a font built in memory is saved after font.round(): redundant points
+filtered out of unrounded outlines, then points, component offsets, anchors, guidelines
+and metrics rounded half up.
+'''
+
+from glyphArrays import _appendAnchor
+from fontMath.mathGlyph import FilterRedundantPointPen
+from fontTools.pens.pointPen import AbstractPointPen
+from math import floor
+import os
+import shutil
+
+try:
+    from fontTools.ufoLib import UFOWriter
+except ImportError:
+    from ufoLib import UFOWriter
+
+def _round(value):
+    # as fontParts rounds glyphs, halves go up
+    return int(floor(value + .5))
+
+class _RoundingPointPen(object):
+    # rounds point positions and component offsets, component scales are left as they are
+
+    def __init__(self, pointPen):
+        self.pointPen = pointPen
+
+    def beginPath(self, identifier=None, **kwargs):
+        self.pointPen.beginPath()
+
+    def addPoint(self, pt, segmentType=None, smooth=False, name=None, identifier=None, **kwargs):
+        x, y = pt
+        self.pointPen.addPoint((_round(x), _round(y)), segmentType, smooth, name)
+
+    def endPath(self):
+        self.pointPen.endPath()
+
+    def addComponent(self, baseGlyphName, transformation, identifier=None, **kwargs):
+        xx, xy, yx, yy, dx, dy = transformation
+        self.pointPen.addComponent(baseGlyphName, (xx, xy, yx, yy, _round(dx), _round(dy)))
+
+def _extractExtras(extras, glyph):
+    # guidelines, note and lib, before anything else as MathGlyph.extractGlyph clears the glyph;
+    # guideline positions are rounded, not their angles
+    extras = extras.copy()
+    for guideline in extras.guidelines:
+        guideline['x'] = _round(guideline['x'])
+        guideline['y'] = _round(guideline['y'])
+    extras.extractGlyph(glyph, onlyGeometry=True)
+
+def _roundedAnchors(structure, values):
+    return [dict(anchor, x=_round(anchor['x']), y=_round(anchor['y'])) for anchor in structure.getAnchors(values)]
+
+def _drawRounded(structure, values, pointPen, pointAttributes):
+    # redundant points are found on unrounded outlines, as when a glyph is rounded after extraction
+    structure.drawPoints(values, FilterRedundantPointPen(_RoundingPointPen(pointPen)), pointAttributes)
+
+class _GlyphRecord(object):
+    # glyph attributes read by glifLib when writing a glyph,
+    # and what MathGlyph.extractGlyph clears and sets
+
+    def __init__(self):
+        self.width = 0
+        self.height = 0
+        self.unicodes = []
+        self.anchors = []
+        self.guidelines = []
+        self.image = None
+        self.note = None
+        self.lib = {}
+
+    def getPointPen(self):
+        # outlines are drawn by glifLib, see StreamingUFOWriter.writeGlyph
+        return AbstractPointPen()
+
+    def clearContours(self):
+        pass
+
+    def clearComponents(self):
+        pass
+
+    def clearAnchors(self):
+        self.anchors = []
+
+    def clearGuidelines(self):
+        self.guidelines = []
+
+class InfoRecord(object):
+    """
+    Bare attribute holder for font info, to extract a MathInfo into and write to a UFO.
+    """
+
+class KerningRecord(object):
+    """
+    Bare kerning & groups holder, for interpolated kerning and source groups.
+    """
+
+    def __init__(self):
+        self.kerning = {}
+        self.groups = {}
+
+class StreamingUFOWriter(object):
+
+    def __init__(self, path, formatVersion=3):
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        self.path = path
+        self.writer = UFOWriter(path, formatVersion=formatVersion)
+        self.glyphSet = self.writer.getGlyphSet()
+        self.glyphCount = 0
+
+    def writeGlyph(self, glyphName, structure, values, pointAttributes=None, unicodes=None, extras=None):
+        glyph = _GlyphRecord()
+        if extras is not None:
+            _extractExtras(extras, glyph)
+        glyph.width = _round(values[0][0])
+        glyph.height = _round(values[0][1])
+        glyph.unicodes = list(unicodes or [])
+        glyph.anchors = _roundedAnchors(structure, values)
+        drawPoints = lambda pointPen: _drawRounded(structure, values, pointPen, pointAttributes)
+        self.glyphSet.writeGlyph(glyphName, glyph, drawPoints)
+        self.glyphCount += 1
+
+    def close(self, info=None, kerning=None, groups=None, lib=None):
+        """
+        Write what isn’t glyphs and return the UFO’s path.
+        """
+        self.glyphSet.writeContents()
+        if hasattr(self.writer, 'writeLayerContents'):
+            self.writer.writeLayerContents()
+        if info is not None:
+            self.writer.writeInfo(info)
+        if kerning:
+            self.writer.writeKerning(kerning)
+        if groups:
+            self.writer.writeGroups(groups)
+        if lib:
+            self.writer.writeLib(lib)
+        self.glyphSet = None
+        self.writer = None
+        return self.path
+
+class FontWriter(object):
+
+    def __init__(self, font):
+        self.font = font
+        self.glyphCount = 0
+
+    def writeGlyph(self, glyphName, structure, values, pointAttributes=None, unicodes=None, extras=None):
+        glyph = self.font.newGlyph(glyphName)
+        if extras is not None:
+            _extractExtras(extras, glyph)
+        glyph.width = _round(values[0][0])
+        if hasattr(glyph, 'height'):
+            glyph.height = _round(values[0][1])
+        if unicodes:
+            glyph.unicodes = list(unicodes)
+        _drawRounded(structure, values, glyph.getPointPen(), pointAttributes)
+        for anchor in _roundedAnchors(structure, values):
+            _appendAnchor(glyph, anchor['name'], anchor['x'], anchor['y'])
+        self.glyphCount += 1
+
+    def close(self, info=None, kerning=None, groups=None, lib=None):
+        """
+        Copy what isn’t glyphs to the font and return it.
+        """
+        font = self.font
+        if info is not None:
+            for attribute, value in info.__dict__.items():
+                setattr(font.info, attribute, value)
+        if kerning:
+            font.kerning.update(kerning)
+        if groups:
+            for key, value in groups.items():
+                font.groups[key] = value
+        if lib:
+            for key, value in lib.items():
+                font.lib[key] = value
+        return font
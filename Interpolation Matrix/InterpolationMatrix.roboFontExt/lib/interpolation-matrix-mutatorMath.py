@@ -7,7 +7,7 @@ v0.6.5b
 Interpolation matrix implementing Erik van Blokland’s MutatorMath objects (https://github.com/LettError/MutatorMath)
 in a grid/matrix, allowing for easy preview of inter/extrapolation behavior of letters while drawing in Robofont.
 As the math is the same to Superpolator’s, the preview is as close as can be to Superpolator output,
-although you don’t have as fine a coordinate system with this matrix (up to 15x15).
+although you don’t have as fine a coordinate system with this matrix (up to 50x50).
 
 (The standalone script will work only on Robofont from versions 1.6 onward)
 (For previous versions of Robofont (tested on 1.5 only) you can use the extension)
@@ -15,13 +15,18 @@ although you don’t have as fine a coordinate system with this matrix (up to 15
 Loïc Sander
 '''
 
-from _mutatorMath.objects.location import Location
+from _mutatorMath.objects.location import Location, FrozenLocation
 from _mutatorMath.objects.mutator import buildMutator
-from fontMath.mathGlyph import MathGlyph
-from fontMath.mathInfo import MathInfo
-from fontMath.mathKerning import MathKerning
 
-from matrixSpot import MatrixMaster, MatrixSpot, getKeyForValue, getValueForKey, splitSpotKey
+from glyphArrays import makeMathGlyph
+from batchInterpolation import KerningInterpolator, InfoInterpolator
+from compatibility import CompatibilityAnalyzer
+from fontRegistry import getFontRegistry
+from familyGenerator import FamilyGenerator
+from matrixPreview import PreviewTracker, InstanceWorker, Debouncer, DecompositionCache, InstanceCache, glyphFingerprint
+from matrixFile import writeMatrixDocument, readMatrixFile, getDocumentInstance, glyphDataFingerprint, allocateWeights
+from matrixLayout import MatrixLayout, SpotStore
+from matrixSpot import MatrixMaster, MatrixSpot, getKeyForValue, getValueForKey, splitSpotKey, parseSpot, parseSpotsList
 
 from vanilla import *
 from vanilla.dialogs import putFile, getFile
@@ -31,12 +36,20 @@ from defconAppKit.windows.progressWindow import ProgressWindow
 from mojo.glyphPreview import GlyphPreview
 from mojo.events import addObserver, removeObserver
 from mojo.extensions import getExtensionDefaultColor, setExtensionDefaultColor
+from PyObjCTools.AppHelper import callAfter
 from AppKit import NSColor, NSThickSquareBezelStyle, NSFocusRingTypeNone, NSBoxCustom, NSBezelBorder, NSLineBorder
+from AppKit import NSObject, NSNotificationCenter, NSViewBoundsDidChangeNotification
 from math import cos, sin, pi
 from time import time
+import objc
 import os
 import re
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 MasterColor = NSColor.colorWithCalibratedRed_green_blue_alpha_(0.4, 0.1, 0.2, 1)
 BlackColor = NSColor.colorWithCalibratedRed_green_blue_alpha_(0, 0, 0, 1)
 GlyphBoxFillColor = NSColor.colorWithCalibratedRed_green_blue_alpha_(0.5, 0.4, 0.4, .1)
@@ -44,7 +57,7 @@ GlyphBoxTextColor = NSColor.colorWithCalibratedRed_green_blue_alpha_(0.5, 0.4, 0
 GlyphBoxBorderColor = NSColor.colorWithCalibratedRed_green_blue_alpha_(1, 1, 1, 1)
 Transparent = NSColor.colorWithCalibratedRed_green_blue_alpha_(0, 0, 0, 0)
 
-def makePreviewGlyph(glyph, fixedWidth=True):
+def decomposePreviewGlyph(glyph, fixedWidth=True):
     if glyph is not None:
         components = glyph.components
         font = glyph.getParent()
@@ -74,6 +87,14 @@ def makePreviewGlyph(glyph, fixedWidth=True):
         return previewGlyph
     return
 
+# decomposed previews are cached and only rebuilt when a glyph or its components change
+previewGlyphs = DecompositionCache(decomposePreviewGlyph, maxSize=512)
+
+def makePreviewGlyph(glyph, fixedWidth=True, fingerprint=None):
+    if glyph is not None:
+        return previewGlyphs.get(glyph, (fixedWidth,), fingerprint)
+    return
+
 def errorGlyph():
     glyph = RGlyph()
     glyph.width = 500
@@ -110,6 +131,20 @@ def fontName(font):
 def colorToTuple(color): # convert NSColor to rgba tuple
     return color.redComponent(), color.greenComponent(), color.blueComponent(), color.alphaComponent()
 
+# calls back when the matrix is scrolled, the class is only defined once per session
+try:
+    MatrixScrollObserver = objc.lookUpClass('MatrixScrollObserver')
+except objc.nosuchclass_error:
+    class MatrixScrollObserver(NSObject):
+
+        def initWithCallback_(self, callback):
+            self = super(MatrixScrollObserver, self).init()
+            self.callback = callback
+            return self
+
+        def boundsDidChange_(self, notification):
+            self.callback()
+
 class InterpolationMatrixController:
 
     def __init__(self):
@@ -124,13 +159,24 @@ class InterpolationMatrixController:
         glyphEdit.setBackgroundColor_(Transparent)
         glyphEdit.setFocusRingType_(NSFocusRingTypeNone)
         self.axesGrid = {'horizontal': 3, 'vertical': 1}
-        self.gridMax = 15
+        self.gridMax = 50
         self.masters = []
         self.mutatorMasters = []
-        self.matrixSpots = {}
+        self.mutatorKey = ()
+        self.matrixSpots = SpotStore()
+        self.cells = {}
+        self.visibleSpots = set()
+        self.scrollObserver = MatrixScrollObserver.alloc().initWithCallback_(self.showVisibleCells)
         self.mutator = None
         self.currentGlyph = None
+        # open fonts are looked up in a registry following fonts as they open & close
+        self.fonts = getFontRegistry(AllFonts, addObserver, removeObserver).acquire()
         self.errorGlyph = errorGlyph()
+        self.preview = PreviewTracker()
+        self.instanceGlyphs = InstanceCache()
+        self.documentInstances = None
+        self.instanceWorker = InstanceWorker(self.publishInstances)
+        self.updateDebouncer = Debouncer(self.deferredUpdateMatrix)
         self.buildMatrix((self.axesGrid['horizontal'], self.axesGrid['vertical']))
         self.w.addColumn = SquareButton((-80, 10, 30, 30), u'+', callback=self.addColumn)
         self.w.removeColumn = SquareButton((-115, 10, 30, 30), u'-', callback=self.removeColumn)
@@ -142,10 +188,10 @@ class InterpolationMatrixController:
         self.w.loadMatrix = GradientButton((430, 10, 70, 30), title='Load', callback=self.loadMatrixFile)
         self.w.saveMatrix = GradientButton((505, 10, 70, 30), title='Save', callback=self.saveMatrix)
         self.w.clearMatrix = GradientButton((580, 10, 70, 30), title='Clear', callback=self.clearMatrix)
-        addObserver(self, 'updateMatrix', 'currentGlyphChanged')
-        addObserver(self, 'updateMatrix', 'fontDidClose')
-        addObserver(self, 'updateMatrix', 'mouseUp')
-        addObserver(self, 'updateMatrix', 'keyUp')
+        addObserver(self, 'scheduleUpdateMatrix', 'currentGlyphChanged')
+        addObserver(self, 'scheduleUpdateMatrix', 'fontDidClose')
+        addObserver(self, 'scheduleUpdateMatrix', 'mouseUp')
+        addObserver(self, 'scheduleUpdateMatrix', 'keyUp')
         self.w.bind('close', self.windowClose)
         self.w.bind('resize', self.windowResize)
         self.w.open()
@@ -155,71 +201,104 @@ class InterpolationMatrixController:
         pass
 
     def buildMatrix(self, axesGrid):
-        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = axesGrid
+        self.preview.reset()
+        self.instanceWorker.invalidate()
         if hasattr(self.w, 'matrix'):
+            NSNotificationCenter.defaultCenter().removeObserver_(self.scrollObserver)
             delattr(self.w, 'matrix')
-        self.w.matrix = Group((0, 50, -50, -0))
-        matrix = self.w.matrix
-        windowPosSize = self.w.getPosSize()
-        cellXSize, cellYSize = self.glyphPreviewCellSize(windowPosSize, axesGrid)
-
-        for i in range(nCellsOnHorizontalAxis):
-            ch = getKeyForValue(i)
-
-            for j in range(nCellsOnVerticalAxis):
-
-                spotKey = '%s%s'%(ch, j)
-
-                if not self.matrixSpots.has_key(spotKey):
-                    matrixSpot = MatrixSpot((i, j))
-                    matrixSpot.setWeights(((i+1)*100, (j+1)*100))
-                    self.matrixSpots[spotKey] = matrixSpot
-
-                elif self.matrixSpots.has_key(spotKey):
-                    matrixSpot = self.matrixSpots[spotKey]
+        # the matrix scrolls when its cells can't fit the window, only cells in view are made
+        self.layout = layout = MatrixLayout(axesGrid, self.matrixViewSize(self.w.getPosSize()))
+        contentWidth, contentHeight = layout.getContentSize()
+        self.matrixContent = Group((0, 0, contentWidth, contentHeight))
+        contentView = self.matrixContent.getNSView()
+        contentView.setFrame_(((0, 0), (contentWidth, contentHeight)))
+        self.w.matrix = ScrollView((0, 50, -50, -0), contentView, autohidesScrollers=True, drawsBackground=False)
+        if not contentView.isFlipped():
+            contentView.scrollPoint_((0, contentHeight))
+        clipView = self.w.matrix.getNSScrollView().contentView()
+        clipView.setPostsBoundsChangedNotifications_(True)
+        NSNotificationCenter.defaultCenter().addObserver_selector_name_object_(self.scrollObserver, 'boundsDidChange:', NSViewBoundsDidChangeNotification, clipView)
+        self.cells = {}
+        self.visibleSpots = set()
+        self.showVisibleCells(refresh=False)
+
+    def matrixViewSize(self, posSize):
+        x, y, w, h = posSize
+        return w-50, h-50
+
+    def getVisibleRect(self):
+        # visible part of the matrix, from its top left corner
+        scrollView = self.w.matrix.getNSScrollView()
+        contentView = scrollView.documentView()
+        (x, y), (w, h) = scrollView.documentVisibleRect()
+        if not contentView.isFlipped():
+            y = contentView.frame().size.height - y - h
+        return x, y, w, h
+
+    def showVisibleCells(self, refresh=True):
+        visibleSpots = self.layout.getVisibleSpots(self.getVisibleRect())
+        for i, j in self.visibleSpots - visibleSpots:
+            spotKey = '%s%s'%(getKeyForValue(i), j)
+            delattr(self.matrixContent, spotKey)
+            del self.cells[spotKey]
+            self.preview.forgetCell(spotKey)
+        newSpots = visibleSpots - self.visibleSpots
+        for i, j in newSpots:
+            self.makeCell(i, j)
+        self.visibleSpots = visibleSpots
+        if newSpots and refresh:
+            self.updateMatrix()
+
+    def makeCell(self, i, j):
+        layout = self.layout
+        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = layout.axesGrid
+        cellXSize, cellYSize = layout.getCellSize()
+        ch = getKeyForValue(i)
+        spotKey = '%s%s'%(ch, j)
+        matrixSpot = self.matrixSpots[spotKey]
 
-                setattr(matrix, spotKey, Group(((i*cellXSize)-i, (j*cellYSize), cellXSize, cellYSize)))
-                xEnd = yEnd = -2
-                if i == nCellsOnHorizontalAxis-1:
-                    xEnd = -3
-                if j == nCellsOnVerticalAxis-1:
-                    yEnd = -3
-                bSize = (2, 2, xEnd, yEnd)
-
-                cell = getattr(matrix, spotKey)
-                cell.background = Box(bSize)
-                cell.selectionMask = Box(bSize)
-                cell.selectionMask.show(False)
-                cell.masterMask = Box(bSize)
-                cell.masterMask.show(False)
-                for box in [cell.background, cell.selectionMask, cell.masterMask]:
-                    box = box.getNSBox()
-                    box.setBoxType_(NSBoxCustom)
-                    box.setFillColor_(GlyphBoxFillColor)
-                    box.setBorderWidth_(2)
-                    box.setBorderColor_(GlyphBoxBorderColor)
-                cell.glyphView = GlyphPreview(bSize)
-                cell.button = SquareButton((0, 0, -0, -0), None, callback=self.pickSpot)
-                cell.button.spot = matrixSpot.get()
-                # cell.button.getNSButton().setBordered_(False)
-                cell.button.getNSButton().setTransparent_(True)
-                cell.coordinate = TextBox((5, -17, 30, 12), matrixSpot.getReadableSpot(), sizeStyle='mini')
-                cell.coordinate.getNSTextField().setTextColor_(GlyphBoxTextColor)
-                hWeight, vWeight = matrixSpot.getWeights()
-                cell.locationHvalue = EditText((-40, (cellYSize/2)-8, 36, 16), str(hWeight), sizeStyle='mini', callback=self.setSpotRatio, continuous=False)
-                if nCellsOnHorizontalAxis <= 1:
-                    cell.locationHvalue.show(False)
-                cell.locationVvalue = EditText(((cellXSize/2)-18, -18, 36, 16), str(vWeight), sizeStyle='mini', callback=self.setSpotRatio, continuous=False)
-                if nCellsOnVerticalAxis <= 1:
-                    cell.locationVvalue.show(False)
-                for editInput in [cell.locationVvalue, cell.locationHvalue]:
-                    e = editInput.getNSTextField()
-                    e.setBordered_(False)
-                    e.setBackgroundColor_(Transparent)
-                    e.setFocusRingType_(NSFocusRingTypeNone)
-                    editInput.spot = matrixSpot.get()
-                cell.name = TextBox((7, 7, -5, 12), '', sizeStyle='mini', alignment='left')
-                cell.name.getNSTextField().setTextColor_(MasterColor)
+        setattr(self.matrixContent, spotKey, Group(layout.getCellFrame(i, j)))
+        xEnd = yEnd = -2
+        if i == nCellsOnHorizontalAxis-1:
+            xEnd = -3
+        if j == nCellsOnVerticalAxis-1:
+            yEnd = -3
+        bSize = (2, 2, xEnd, yEnd)
+
+        cell = self.cells[spotKey] = getattr(self.matrixContent, spotKey)
+        cell.background = Box(bSize)
+        cell.selectionMask = Box(bSize)
+        cell.selectionMask.show(False)
+        cell.masterMask = Box(bSize)
+        cell.masterMask.show(False)
+        for box in [cell.background, cell.selectionMask, cell.masterMask]:
+            box = box.getNSBox()
+            box.setBoxType_(NSBoxCustom)
+            box.setFillColor_(GlyphBoxFillColor)
+            box.setBorderWidth_(2)
+            box.setBorderColor_(GlyphBoxBorderColor)
+        cell.glyphView = GlyphPreview(bSize)
+        cell.button = SquareButton((0, 0, -0, -0), None, callback=self.pickSpot)
+        cell.button.spot = matrixSpot.get()
+        # cell.button.getNSButton().setBordered_(False)
+        cell.button.getNSButton().setTransparent_(True)
+        cell.coordinate = TextBox((5, -17, 30, 12), matrixSpot.getReadableSpot(), sizeStyle='mini')
+        cell.coordinate.getNSTextField().setTextColor_(GlyphBoxTextColor)
+        hWeight, vWeight = matrixSpot.getWeights()
+        cell.locationHvalue = EditText((-40, (cellYSize/2)-8, 36, 16), str(hWeight), sizeStyle='mini', callback=self.setSpotRatio, continuous=False)
+        if nCellsOnHorizontalAxis <= 1:
+            cell.locationHvalue.show(False)
+        cell.locationVvalue = EditText(((cellXSize/2)-18, -18, 36, 16), str(vWeight), sizeStyle='mini', callback=self.setSpotRatio, continuous=False)
+        if nCellsOnVerticalAxis <= 1:
+            cell.locationVvalue.show(False)
+        for editInput in [cell.locationVvalue, cell.locationHvalue]:
+            e = editInput.getNSTextField()
+            e.setBordered_(False)
+            e.setBackgroundColor_(Transparent)
+            e.setFocusRingType_(NSFocusRingTypeNone)
+            editInput.spot = matrixSpot.get()
+        cell.name = TextBox((7, 7, -5, 12), '', sizeStyle='mini', alignment='left')
+        cell.name.getNSTextField().setTextColor_(MasterColor)
 
     def updateMatrix(self, notification=None):
         axesGrid = self.axesGrid['horizontal'], self.axesGrid['vertical']
@@ -228,96 +307,201 @@ class InterpolationMatrixController:
             self.w.glyphTitle.name.set(currentGlyph)
         elif currentGlyph is None:
             self.w.glyphTitle.name.set('No current glyph')
+        self.preview.beginRefresh()
         self.placeGlyphMasters(currentGlyph, axesGrid)
         self.makeGlyphInstances(axesGrid)
+        self.preview.endRefresh()
 
     def placeGlyphMasters(self, glyphName, axesGrid):
-        availableFonts = AllFonts()
+        availableFonts = self.fonts
         masters = self.masters
+        preview = self.preview
         mutatorMasters = []
+        mutatorKey = []
         nCellsOnHorizontalAxis, nCellsOnVerticalAxis = axesGrid
-        matrix = self.w.matrix
-        masterGlyph = None
 
-        for matrixMaster in masters:
+        for matrixMaster in list(masters):
             spot = matrixMaster
             masterFont = spot.getFont()
             ch, j = spot
             i = getValueForKey(ch)
-            matrixSpot = self.matrixSpots[spot.getSpotKey()]
+            spotKey = spot.getSpotKey()
+            matrixSpot = self.matrixSpots[spotKey]
+            masterGlyph = None
+            masterKey = None
 
             if (masterFont in availableFonts) and (glyphName is not None) and (glyphName in masterFont):
                 if i <= nCellsOnHorizontalAxis and j <= nCellsOnVerticalAxis:
                     l = Location(**matrixSpot.getWeightsAsDict('horizontal', 'vertical'))
-                    masterGlyph = makePreviewGlyph(masterFont[glyphName])
-                    if masterGlyph is not None:
-                        mutatorMasters.append((l, MathGlyph(masterGlyph)))
+                    glyph = masterFont[glyphName]
+                    # previews are only rebuilt if the master glyph changed since last refresh
+                    fingerprint = glyphFingerprint(glyph)
+                    masterKey = id(masterFont), glyphName, fingerprint
+                    masterPreview = preview.getMaster(spotKey, masterKey)
+                    if masterPreview is None:
+                        masterGlyph = makePreviewGlyph(glyph, fingerprint=fingerprint)
+                        mathGlyph = makeMathGlyph(masterGlyph) if masterGlyph is not None else None
+                        preview.setMaster(spotKey, masterKey, masterGlyph, mathGlyph)
+                    elif masterPreview is not None:
+                        masterGlyph, mathGlyph = masterPreview
+                    if mathGlyph is not None:
+                        mutatorMasters.append((l, mathGlyph))
+                        mutatorKey.append((l.asTuple(), masterKey))
             elif (masterFont not in availableFonts):
                 masters.remove(matrixMaster)
+                preview.forgetMaster(spotKey)
 
-            if i < nCellsOnHorizontalAxis and j < nCellsOnVerticalAxis:
-                cell = getattr(matrix, spot.getSpotKey())
-                cell.glyphView.setGlyph(masterGlyph)
+            if i < nCellsOnHorizontalAxis and j < nCellsOnVerticalAxis and spotKey in self.cells:
+                fontName = ''
                 if masterGlyph is not None:
-                    cell.glyphView.getNSView().setContourColor_(MasterColor)
-                    cell.masterMask.show(True)
                     fontName = ' '.join([masterFont.info.familyName, masterFont.info.styleName])
-                    cell.name.set(fontName)
-                elif masterGlyph is None:
-                    cell.glyphView.getNSView().setContourColor_(BlackColor)
-                    cell.masterMask.show(False)
-                    cell.name.set('')
+                if preview.cellChanged(spotKey, ('master', masterKey, fontName)):
+                    cell = self.cells[spotKey]
+                    preview.setContent(spotKey, ('master', masterKey))
+                    cell.glyphView.setGlyph(masterGlyph)
+                    if masterGlyph is not None:
+                        cell.glyphView.getNSView().setContourColor_(MasterColor)
+                        cell.masterMask.show(True)
+                        cell.name.set(fontName)
+                    elif masterGlyph is None:
+                        cell.glyphView.getNSView().setContourColor_(BlackColor)
+                        cell.masterMask.show(False)
+                        cell.name.set('')
 
         self.mutatorMasters = mutatorMasters
+        self.mutatorKey = tuple(mutatorKey)
 
     def makeGlyphInstances(self, axesGrid):
 
-        instanceTime = []
-
         mutatorMasters = self.mutatorMasters
+        preview = self.preview
         masterSpots = [master.get() for master in self.masters]
-        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = axesGrid
-        matrix = self.w.matrix
-        instanceGlyphs = None
-
-        # start = time()
-        # count = 0
 
         if mutatorMasters:
 
-            try:
-                bias, mutator = buildMutator(mutatorMasters)
-            except:
-                mutator = None
-
-            for i in range(nCellsOnHorizontalAxis):
-                ch = getKeyForValue(i)
-
-                for j in range(nCellsOnVerticalAxis):
-
-                    if (ch, j) not in masterSpots:
+            # the mutator is only rebuilt if master glyphs or master weights changed
+            mutatorKey = self.mutatorKey
+            mutator = preview.getMutator(mutatorKey)
+            if mutator is None:
+                try:
+                    bias, mutator = buildMutator(mutatorMasters)
+                    mutator.compile()
+                except:
+                    mutator = None
+                preview.setMutator(mutatorKey, mutator)
 
-                        matrixSpot = self.matrixSpots['%s%s'%(ch, j)]
+            cells = []
+            instanceLocations = []
 
-                        if mutator is not None:
-                            instanceLocation = Location(**matrixSpot.getWeightsAsDict('horizontal', 'vertical'))
-                            instanceStart = time()
-                            instanceGlyph = RGlyph()
-                            iGlyph = mutator.makeInstance(instanceLocation)
-                            instanceGlyph = iGlyph.extractGlyph(RGlyph())
-                            instanceStop = time()
-                            instanceTime.append((instanceStop-instanceStart)*1000)
-                        else:
-                            instanceGlyph = self.errorGlyph
+            # only cells in view are interpolated
+            for i, j in sorted(self.visibleSpots):
+                ch = getKeyForValue(i)
 
-                        cell = getattr(matrix, '%s%s'%(ch, j))
-                        cell.glyphView.setGlyph(instanceGlyph)
-    #                     count += 1
+                if (ch, j) not in masterSpots:
 
-        # stop = time()
-        # if count:
-        #     wholeTime = (stop-start)*1000
-        #     print 'made %s instances in %0.3fms, average: %0.3fms' % (count, wholeTime, wholeTime/count)
+                    spotKey = '%s%s'%(ch, j)
+                    matrixSpot = self.matrixSpots[spotKey]
+                    # and a cell is only reinterpolated if the mutator or its weights changed
+                    # and its instance isn't cached, its new key is stored once its instance is shown
+                    cellKey = ('instance', mutatorKey, matrixSpot.getWeights())
+                    if preview.cellChanged(spotKey, cellKey, store=False):
+                        cachedInstance = self.instanceGlyphs.get(cellKey)
+                        if cachedInstance is None:
+                            cachedInstance = self.loadDocumentInstance(spotKey, cellKey)
+                        if cachedInstance is not None:
+                            self.showInstanceGlyph(spotKey, cellKey, *cachedInstance)
+                        elif cachedInstance is None:
+                            cells.append((spotKey, cellKey))
+                            instanceLocations.append(FrozenLocation(**matrixSpot.getWeightsAsDict('horizontal', 'vertical')))
+
+            # instances are computed in the background, anything still being computed is outdated
+            if not cells:
+                self.instanceWorker.invalidate()
+            elif mutator is None:
+                self.setInstanceGlyphs(self.instanceWorker.invalidate(), cells, None)
+            else:
+                self.instanceWorker.submit(mutator, cells, instanceLocations)
+
+    def loadDocumentInstance(self, spotKey, cellKey):
+        # instances saved with a matrix document are shown as long as its masters are unchanged,
+        # which is checked once per glyph, when a cell first needs one
+        document = self.documentInstances
+        glyphName = self.currentGlyph
+        if document is None or glyphName not in document['matrix']['instances']:
+            return
+        mutatorKey = cellKey[1]
+        validMutatorKey = document['mutatorKeys'].get(glyphName)
+        if validMutatorKey is None:
+            validMutatorKey = mutatorKey if self.documentMastersUnchanged(document['matrix'], glyphName) else False
+            document['mutatorKeys'][glyphName] = validMutatorKey
+        if validMutatorKey != mutatorKey:
+            return
+        documentInstance = getDocumentInstance(document['matrix'], glyphName, spotKey, RGlyph())
+        if documentInstance is None:
+            return
+        weights, instanceGlyph = documentInstance
+        if weights != tuple(cellKey[2]):
+            return
+        fingerprint = glyphFingerprint(instanceGlyph)
+        self.instanceGlyphs.set(cellKey, instanceGlyph, fingerprint)
+        return instanceGlyph, fingerprint
+
+    def documentMastersUnchanged(self, matrix, glyphName):
+        masters = [(master.getSpotKey(), master.getFontPath()) for master in self.masters]
+        if sorted(masters) != sorted([(spotKey, fontPath) for spotKey, weights, fontPath in matrix['masters']]):
+            return False
+        for spotKey, weights, fontPath in matrix['masters']:
+            if weights is None or tuple(self.matrixSpots[spotKey].getWeights()) != weights:
+                return False
+            if matrix['fingerprints'].get(spotKey, {}).get(glyphName) != self.getMasterFingerprint(spotKey):
+                return False
+        return True
+
+    def getMasterFingerprint(self, spotKey):
+        # fingerprint of the previewed (decomposed) master glyph, which instances are made from
+        masterPreview = self.preview.masters.get(spotKey)
+        if masterPreview is not None:
+            masterKey, (masterGlyph, mathGlyph) = masterPreview
+            if masterGlyph is not None:
+                return glyphDataFingerprint(masterGlyph)
+        return None
+
+    def scheduleUpdateMatrix(self, notification=None):
+        # bursts of notifications are coalesced into a single refresh
+        self.updateDebouncer(notification)
+
+    def deferredUpdateMatrix(self, notification=None):
+        callAfter(self.updateMatrix, notification)
+
+    def publishInstances(self, generation, cells, instances):
+        callAfter(self.setInstanceGlyphs, generation, cells, instances)
+
+    def setInstanceGlyphs(self, generation, cells, instances):
+        if not self.instanceWorker.isCurrent(generation):
+            return
+        for index, (spotKey, cellKey) in enumerate(cells):
+            instanceGlyph = None
+            if instances is not None:
+                try:
+                    instanceGlyph = instances[index].extractGlyph(RGlyph())
+                except:
+                    pass
+            if instanceGlyph is None:
+                self.showInstanceGlyph(spotKey, cellKey, self.errorGlyph, 'error')
+            elif instanceGlyph is not None:
+                # cells scrolled out of view meanwhile get it from the cache when back in view
+                fingerprint = glyphFingerprint(instanceGlyph)
+                self.instanceGlyphs.set(cellKey, instanceGlyph, fingerprint)
+                self.showInstanceGlyph(spotKey, cellKey, instanceGlyph, fingerprint)
+
+    def showInstanceGlyph(self, spotKey, cellKey, instanceGlyph, fingerprint):
+        cell = self.cells.get(spotKey)
+        if cell is None:
+            return
+        # views are only set if their glyph changed, other inputs can give the same outline
+        if self.preview.contentChanged(spotKey, fingerprint):
+            cell.glyphView.setGlyph(instanceGlyph)
+        self.preview.setCell(spotKey, cellKey)
 
     def generationSheet(self, sender):
 
@@ -383,7 +567,7 @@ class InterpolationMatrixController:
             '01234567890'
             ])
         glyph.targetFontTitle = TextBox((10, 104, 70, 17), 'To font')
-        fontList = [fontName(font) for font in AllFonts()]
+        fontList = [fontName(font) for font in self.fonts]
         fontList.insert(0, 'New font')
         glyph.targetFont = PopUpButton((100, 104, -10, 22), fontList)
         glyph.suffixTile = TextBox((10, 140, 50, 20), 'Suffix')
@@ -432,7 +616,7 @@ class InterpolationMatrixController:
             spotsList = []
 
             if len(self.masters):
-                availableFonts = AllFonts()
+                availableFonts = self.fonts
                 mastersList = fontTab.sourceFont.getItems()
                 sourceFontIndex = fontTab.sourceFont.get()
                 sourceFontName = mastersList[sourceFontIndex]
@@ -462,8 +646,9 @@ class InterpolationMatrixController:
             for spot in spotsList:
                 i, j = spot
                 ch = getKeyForValue(i)
-                pickedCell = getattr(self.w.matrix, '%s%s'%(ch, j))
-                pickedCell.selectionMask.show(False)
+                pickedCell = self.cells.get('%s%s'%(ch, j))
+                if pickedCell is not None:
+                    pickedCell.selectionMask.show(False)
                 self.generateInstanceFont(spot, masterLocations, generationInfos)
 
         elif _ID == 'report':
@@ -489,54 +674,12 @@ class InterpolationMatrixController:
         delattr(self.w, 'generateSheet')
 
     def parseSpotsList(self, inputSpots):
-
         axesGrid = self.axesGrid['horizontal'], self.axesGrid['vertical']
-        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = axesGrid
-        inputSpots = inputSpots.split(',')
         masterSpots = [master.getRaw() for master in self.masters]
-        spotsToGenerate = []
-
-        if inputSpots[0] == '':
-            return
-        elif inputSpots[0] == '*':
-            return [(i, j) for i in range(nCellsOnHorizontalAxis) for j in range(nCellsOnVerticalAxis) if (i,j) not in masterSpots]
-        else:
-            for item in inputSpots:
-                parsedSpot = self.parseSpot(item, axesGrid)
-                if parsedSpot is not None:
-                    parsedSpot = list(set(parsedSpot) - set(masterSpots))
-                    spotsToGenerate += parsedSpot
-            return spotsToGenerate
+        return parseSpotsList(inputSpots, axesGrid, masterSpots)
 
     def parseSpot(self, spotName, axesGrid):
-        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = axesGrid
-        s = re.search('([a-zA-Z](?![0-9]))|([a-zA-Z][0-9][0-9]?)|([0-9][0-9]?)', spotName)
-        if s:
-            letterOnly = s.group(1)
-            letterNumber = s.group(2)
-            numberOnly = s.group(3)
-
-            if numberOnly is not None:
-                lineNumber = int(numberOnly) - 1
-                if lineNumber < nCellsOnVerticalAxis:
-                    return [(i, lineNumber) for i in range(nCellsOnHorizontalAxis)]
-
-            elif letterOnly is not None:
-                columnNumber = getValueForKey(letterOnly.lower())
-                if columnNumber is not None and columnNumber < nCellsOnHorizontalAxis:
-                    return [(columnNumber, j) for j in range(nCellsOnVerticalAxis)]
-
-            elif letterNumber is not None:
-                letter = letterNumber[:1]
-                number = letterNumber[1:]
-                columnNumber = getValueForKey(letter.lower())
-                try:
-                    lineNumber = int(number) - 1
-                except:
-                    return
-                if columnNumber is not None and columnNumber < nCellsOnHorizontalAxis and lineNumber < nCellsOnVerticalAxis:
-                    return [(columnNumber, lineNumber)]
-        return
+        return parseSpot(spotName, axesGrid)
 
     def cancelGeneration(self, sender):
         self.w.generateSheet.close()
@@ -589,6 +732,29 @@ class InterpolationMatrixController:
                 progress = ProgressWindow('Generating instance %s%s'%(ch.upper(), j+1), parentWindow=self.w)
                 report.append(u'\n*** Generating instance %s ***\n'%(instanceName))
 
+                # saved source font: stream the instance to its UFO glyph by glyph, no font is built in memory
+                # (streaming needs numpy, without it the instance is built in memory);
+                # the UFO is the same as the one saved from memory, unicodes are set the same way
+
+                if (folderPath is not None) and (numpy is not None) and ((doGlyphs == True) or (doKerning == True) or (doFontInfos == True) or (addGroups == True)):
+                    generator = FamilyGenerator(masterLocations, baseFont, processes=1, glyphUnicodes=self.getAutoUnicodes())
+                    styleName, path, incompatibleGlyphs = generator.streamInstance(instanceName, instanceLocation, u'%s%s'%(folderPath, '/matrix-instances'), doGlyphs, doKerning, doFontInfos, addGroups)
+                    streamed = generator.streamed
+                    report.append(u'+ Created new font')
+                    if doFontInfos == True:
+                        report.append(u'+ Successfully interpolated font info' if streamed['info'] else u'+ Couldn’t interpolate font info')
+                    if doKerning == True:
+                        report.append(u'+ Successfully interpolated kerning' if streamed['kerning'] else u'+ Couldn’t interpolate kerning')
+                        if addGroups == True and streamed['kerning']:
+                            report.append(u'+ Successfully transferred groups')
+                    if doGlyphs == True:
+                        report.append(u'+ Successfully interpolated %s glyphs'%(streamed['glyphs']))
+                        report.append(u'+ Couldn’t interpolate %s glyphs'%(len(incompatibleGlyphs)))
+                    report.append(u'\n—> Saved font to UFO at %s\n'%(path))
+                    if UI:
+                        f = RFont(path)
+                    return
+
                 # Build fontx
                 if (doGlyphs == True) or (doKerning == True) or (doFontInfos == True) or (addGroups == True):
 
@@ -624,14 +790,13 @@ class InterpolationMatrixController:
 
                     report.append(u'+ Created new font')
 
-                # interpolate font infos
+                # interpolate font infos, set once the font is rounded so as to stay unrounded
 
+                instanceInfo = None
                 if doFontInfos == True:
-                    infoMasters = [(infoLocation, MathInfo(masterFont.info)) for infoLocation, masterFont in masterLocations]
+                    infoMasters = [(infoLocation, masterFont.info) for infoLocation, masterFont in masterLocations]
                     try:
-                        bias, iM = buildMutator(infoMasters)
-                        instanceInfo = iM.makeInstance(instanceLocation)
-                        instanceInfo.extractInfo(newFont.info)
+                        instanceInfo = InfoInterpolator(infoMasters).makeInstance(instanceLocation)
                         report.append(u'+ Successfully interpolated font info')
                     except:
                         report.append(u'+ Couldn’t interpolate font info')
@@ -639,11 +804,11 @@ class InterpolationMatrixController:
                 # interpolate kerning
 
                 if doKerning == True:
-                    kerningMasters = [(kerningLocation, MathKerning(masterFont.kerning)) for kerningLocation, masterFont in masterLocations]
+                    kerningMasters = [(kerningLocation, masterFont.kerning) for kerningLocation, masterFont in masterLocations]
                     try:
-                        bias, kM = buildMutator(kerningMasters)
-                        instanceKerning = kM.makeInstance(instanceLocation)
-                        instanceKerning.extractKerning(newFont)
+                        instanceKerning = KerningInterpolator(kerningMasters).makeInstance(instanceLocation)
+                        newFont.kerning.clear()
+                        newFont.kerning.update(instanceKerning)
                         report.append(u'+ Successfully interpolated kerning')
                         if addGroups == True:
                             for key, value in baseFont.groups.items():
@@ -666,10 +831,14 @@ class InterpolationMatrixController:
                 if (newFont is not None) and hasattr(RFont, 'showUI') and (folderPath is None) and UI:
                     newFont.autoUnicodes()
                     newFont.round()
+                    if instanceInfo is not None:
+                        instanceInfo.extractInfo(newFont.info)
                     newFont.showUI()
                 elif (newFont is not None) and (folderPath is not None):
                     newFont.autoUnicodes()
                     newFont.round()
+                    if instanceInfo is not None:
+                        instanceInfo.extractInfo(newFont.info)
                     newFont.save(path)
                     report.append(u'\n—> Saved font to UFO at %s\n'%(path))
                     if UI:
@@ -722,22 +891,36 @@ class InterpolationMatrixController:
             if targetFontName == 'New font':
                 targetFont = RFont(showUI=False)
             else:
-                targetFont = AllFonts().getFontsByFamilyNameStyleName(*targetFontName.split(' > '))
+                targetFont = self.fonts.getByName(*targetFontName.split(' > '))
             self.interpolateGlyphSet(instanceLocation, glyphList, masterLocations, targetFont, suffix)
             targetFont.showUI()
             progress.close()
 
         if incomingSpot is not None:
             ch, j = incomingSpot
-            pickedCell = getattr(self.w.matrix, '%s%s'%(ch, j))
-            pickedCell.selectionMask.show(False)
+            pickedCell = self.cells.get('%s%s'%(ch, j))
+            if pickedCell is not None:
+                pickedCell.selectionMask.show(False)
+
+    def getAutoUnicodes(self):
+
+        # unicodes as autoUnicodes() sets them on a font, for instances that aren’t built in memory
+        unicodesFont = RFont(showUI=False)
+
+        def glyphUnicodes(glyphName, unicodes):
+            glyph = unicodesFont.newGlyph(glyphName)
+            glyph.unicodes = unicodes
+            glyph.autoUnicodes()
+            return list(glyph.unicodes)
+
+        return glyphUnicodes
 
     def interpolateGlyphSet(self, instanceLocation, glyphSet, masters, targetFont, suffix=None):
 
         incompatibleGlyphs = []
 
         for glyphName in glyphSet:
-            masterGlyphs = [(masterLocation, MathGlyph(masterFont[glyphName])) for masterLocation, masterFont in masters]
+            masterGlyphs = [(masterLocation, makeMathGlyph(masterFont[glyphName])) for masterLocation, masterFont in masters]
             try:
                 bias, gM = buildMutator(masterGlyphs)
                 newGlyph = RGlyph()
@@ -780,79 +963,47 @@ class InterpolationMatrixController:
         try:
 
             masterFonts = [master.getFont() for master in self.masters]
-            glyphList, strayGlyphs = self.compareGlyphSets(masterFonts)
-            digest = []
-            interpolationReports = []
-            incompatibleGlyphs = 0
-
-            for glyphName in glyphList:
+            analyzer = CompatibilityAnalyzer(masterFonts, [fontName(masterFont) for masterFont in masterFonts])
+            report = analyzer.analyze()
 
+            if markGlyphs:
+                # first master: compatible with all, incompatible with all, or mixed
+                # other masters: compatible or not with the first
                 refMasterFont = masterFonts[0]
-                refMasterGlyph = refMasterFont[glyphName]
-
-                for masterFont in masterFonts[1:]:
-
-                    firstGlyph = refMasterFont[glyphName]
-                    secondGlyph = masterFont[glyphName]
-                    firstGlyph.mark = None
-                    secondGlyph.mark = None
-                    try:
-                        compatible, report = firstGlyph.isCompatible(secondGlyph)
-                    except:
-                        report = u'Compatibility check error'
-                        compatible == False
-
-                    if compatible == False:
-
-                        names = '%s <X> %s'%(fontName(refMasterFont), fontName(masterFont))
-                        reportID = (names, report)
-                        if reportID not in interpolationReports:
-                            digest.append(names)
-                            digest += [u'– %s'%(reportLine) for reportLine in report]
-                            digest.append('\n')
-                            interpolationReports.append(reportID)
-                            incompatibleGlyphs += 1
-
-                        if markGlyphs:
-                            if firstGlyph.mark == compatibleColor:
-                               firstGlyph.mark = mixedCompatibilityColor
-                            elif firstGlyph.mark != compatibleColor and firstGlyph.mark != mixedCompatibilityColor:
-                                firstGlyph.mark = incompatibleColor
-                            secondGlyph.mark = incompatibleColor
-
-                    elif compatible == True:
-
-                        if markGlyphs:
-                            if firstGlyph.mark == incompatibleColor or firstGlyph.mark == mixedCompatibilityColor:
-                               firstGlyph.mark = mixedCompatibilityColor
-                               secondGlyph.mark = mixedCompatibilityColor
-                            else:
-                                firstGlyph.mark = compatibleColor
-                                secondGlyph.mark = compatibleColor
+                for glyphName in report.glyphList:
+                    issues = dict(report.incompatibleGlyphs.get(glyphName, []))
+                    for masterIndex, masterFont in enumerate(masterFonts[1:]):
+                        if masterIndex+1 in issues:
+                            masterFont[glyphName].mark = incompatibleColor
+                        else:
+                            masterFont[glyphName].mark = compatibleColor if not issues else mixedCompatibilityColor
+                    if not issues:
+                        refMasterFont[glyphName].mark = compatibleColor
+                    elif len(issues) == len(masterFonts)-1:
+                        refMasterFont[glyphName].mark = incompatibleColor
+                    else:
+                        refMasterFont[glyphName].mark = mixedCompatibilityColor
 
         finally:
             progress.close()
 
-        print u'\n*   Compatible glyphs: %s'%(len(glyphList) - incompatibleGlyphs)
-        print u'**  Incompatible glyphs: %s'%(incompatibleGlyphs)
-        print u'*** Stray glyphs: %s\n– %s\n'%(len(strayGlyphs),u'\n– '.join(list(strayGlyphs)))
-        print '\n'.join(digest)
+        print '\n'.join(report.digest())
+        print analyzer.indexReport()
 
-    def glyphPreviewCellSize(self, posSize, axesGrid):
-        x, y, w, h = posSize
-        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = axesGrid
-        w -= 50-nCellsOnHorizontalAxis
-        h -= 50
-        cellWidth = w / nCellsOnHorizontalAxis
-        cellHeight = h / nCellsOnVerticalAxis
-        return cellWidth, cellHeight
+        reportFolder = None
+        if masterFonts and masterFonts[0].path is not None:
+            reportFolder = os.path.dirname(masterFonts[0].path)
+        if reportFolder is not None:
+            reportPath = os.path.join(reportFolder, 'compatibility-report.json')
+            report.writeJSON(reportPath)
+            print u'—> Saved report to %s\n' % (reportPath)
 
     def setSpotRatio(self, sender):
         ch, j = sender.spot
         spotKey = '%s%s'%(ch, j)
         matrixSpot = self.matrixSpots[spotKey]
         masterSpotKeys = [master.getSpotKey() for master in self.masters]
-        cell = getattr(self.w.matrix, spotKey)
+        cell = self.cells[spotKey]
         hWeight, vWeight = matrixSpot.getWeights()
         newHweight = self.parseWeightValue(cell.locationHvalue.get())
         newVweight = self.parseWeightValue(cell.locationVvalue.get())
@@ -869,63 +1020,20 @@ class InterpolationMatrixController:
 
     def reallocateWeights(self, masterSpotKeys=None):
 
-        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = self.axesGrid['horizontal'], self.axesGrid['vertical']
-        matrixSpots = self.matrixSpots
-        masters = self.masters
-
-        if len(masters) <= 1:
-
-            self.matrixSpots = {}
-
-            for i in range(nCellsOnHorizontalAxis):
-                ch = getKeyForValue(i)
+        axesGrid = self.axesGrid['horizontal'], self.axesGrid['vertical']
+        masterSpots = [master.getRaw() for master in self.masters]
+        self.matrixSpots = allocateWeights(axesGrid, self.matrixSpots, masterSpots, masterSpotKeys)
 
-                for j in range(nCellsOnVerticalAxis):
-                    spotKey = '%s%s'%(ch, j)
-                    cell = getattr(self.w.matrix, spotKey)
-                    matrixSpot = MatrixSpot((i, j))
-                    matrixSpot.setWeights(((i+1)*100, (j+1)*100))
-                    weights = matrixSpot.getWeights()
-                    cell.locationHvalue.set('%0.0f'%(weights[0]))
-                    cell.locationVvalue.set('%0.0f'%(weights[1]))
-                    self.matrixSpots[spotKey] = matrixSpot
-
-        elif len(masters) > 1:
-
-            if masterSpotKeys is None:
-                masterSpotKeys = [master.getSpotKey() for master in masters]
-            hMutatorMasters = []
-            vMutatorMasters = []
-            for master in masters:
-                masterSpotKey = master.getSpotKey()
-                mi, mj = master.getRaw()
-                mhl = Location(horizontal=mi)
-                mvl = Location(vertical=mj)
-                hWeight, vWeight = matrixSpots[masterSpotKey].getWeights()
-                hMutatorMasters.append((mhl, hWeight))
-                vMutatorMasters.append((mvl, vWeight))
-
-            for i in range(nCellsOnHorizontalAxis):
-                ch = getKeyForValue(i)
-                hb, hm = buildMutator(hMutatorMasters)
-                vb, vm = buildMutator(vMutatorMasters)
+        if len(masterSpots) <= 1:
+            masterSpotKeys = []
+        elif masterSpotKeys is None:
+            masterSpotKeys = [master.getSpotKey() for master in self.masters]
 
-                for j in range(nCellsOnVerticalAxis):
-                    spotKey = '%s%s'%(ch, j)
-                    if spotKey not in masterSpotKeys:
-                        cell = getattr(self.w.matrix, spotKey)
-                        spot = matrixSpots[spotKey]
-                        if hm is not None:
-                            lh = Location(horizontal=i)
-                            instanceHweight = hm.makeInstance(lh)
-                        if vm is not None:
-                            lv = Location(vertical=j)
-                            instanceVweight = vm.makeInstance(lv)
-                        spot.setWeights((instanceHweight, instanceVweight))
-                        weights = spot.getWeights()
-                        cell.locationHvalue.set('%0.0f'%(weights[0]))
-                        cell.locationVvalue.set('%0.0f'%(weights[1]))
-            self.matrixSpots = matrixSpots
+        for spotKey, cell in self.cells.items():
+            if spotKey not in masterSpotKeys:
+                weights = self.matrixSpots[spotKey].getWeights()
+                cell.locationHvalue.set('%0.0f'%(weights[0]))
+                cell.locationVvalue.set('%0.0f'%(weights[1]))
 
     def parseWeightValue(self, value):
         try: value = float(value)
@@ -938,15 +1046,14 @@ class InterpolationMatrixController:
         masters = self.masters
         masterSpots = [master.get() for master in masters]
         axesGrid = self.axesGrid['horizontal'], self.axesGrid['vertical']
-        matrix = self.w.matrix
         font = None
 
-        self.setSpotSelection(matrix, spot, axesGrid)
+        self.setSpotSelection(spot)
 
         self.w.spotSheet = Sheet((500, 250), self.w)
         spotSheet = self.w.spotSheet
         spotSheet.mastersTitle = TextBox((20, 20, -20, 21), 'Available masters', sizeStyle='small')
-        spotSheet.fontList = FontList((20, 40, -20, 110), AllFonts(), allowsMultipleSelection=False)
+        spotSheet.fontList = FontList((20, 40, -20, 110), self.fonts.getFonts(), allowsMultipleSelection=False)
         if spot not in masterSpots:
             spotSheet.yes = Button((-140, -40, 120, 20), 'Place Master', callback=self.changeSpot)
             spotSheet.generate = Button((20, -40, 180, 20), 'Generate Instance %s%s'%(ch.upper(), j+1), callback=self.generationSheet)
@@ -973,8 +1080,9 @@ class InterpolationMatrixController:
         font = fontsList[selectedFontIndex]
         self.w.spotSheet.close()
         delattr(self.w, 'spotSheet')
-        pickedCell = getattr(self.w.matrix, '%s%s'%(ch, j))
-        pickedCell.selectionMask.show(False)
+        pickedCell = self.cells.get('%s%s'%(ch, j))
+        if pickedCell is not None:
+            pickedCell.selectionMask.show(False)
         i = getValueForKey(ch)
         l = MatrixMaster(spot, font)
         self.masters.append(l)
@@ -984,11 +1092,12 @@ class InterpolationMatrixController:
         spot = (ch, j) = sender.spot
         self.w.spotSheet.close()
         delattr(self.w, 'spotSheet')
-        pickedCell = getattr(self.w.matrix, '%s%s'%(ch, j))
-        pickedCell.selectionMask.show(False)
-        pickedCell.masterMask.show(False)
-        pickedCell.glyphView.getNSView().setContourColor_(BlackColor)
-        pickedCell.name.set('')
+        pickedCell = self.cells.get('%s%s'%(ch, j))
+        if pickedCell is not None:
+            pickedCell.selectionMask.show(False)
+            pickedCell.masterMask.show(False)
+            pickedCell.glyphView.getNSView().setContourColor_(BlackColor)
+            pickedCell.name.set('')
         for matrixMaster in self.masters:
             masterSpot = matrixMaster.get()
             if spot == masterSpot:
@@ -1000,22 +1109,17 @@ class InterpolationMatrixController:
         self.reallocateWeights()
         self.updateMatrix()
 
-    def setSpotSelection(self, matrix, spot, axesGrid):
-        for i in range(axesGrid[0]):
-            ch = getKeyForValue(i)
-            for j in range(axesGrid[1]):
-                cell = getattr(matrix, '%s%s'%(ch, j))
-                if (ch,j) == spot:
-                    cell.selectionMask.show(True)
-                else:
-                    cell.selectionMask.show(False)
+    def setSpotSelection(self, spot):
+        for spotKey, cell in self.cells.items():
+            cell.selectionMask.show(splitSpotKey(spotKey) == spot)
 
     def keepSpot(self, sender):
         ch, j = sender.spot
         self.w.spotSheet.close()
         delattr(self.w, 'spotSheet')
-        pickedCell = getattr(self.w.matrix, '%s%s'%(ch, j))
-        pickedCell.selectionMask.show(False)
+        pickedCell = self.cells.get('%s%s'%(ch, j))
+        if pickedCell is not None:
+            pickedCell.selectionMask.show(False)
 
     def addColumn(self, sender):
         gridMax = self.gridMax
@@ -1084,82 +1188,83 @@ class InterpolationMatrixController:
 
     def clearMatrix(self, sender=None):
         self.masters = []
-        self.matrixSpots = {}
+        self.matrixSpots = SpotStore()
         self.mutator = None
-        matrix = self.w.matrix
-        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = self.axesGrid['horizontal'], self.axesGrid['vertical']
+        self.documentInstances = None
+        self.preview.reset()
+        self.instanceWorker.invalidate()
 
-        for i in range(nCellsOnHorizontalAxis):
-            ch = getKeyForValue(i)
-            for j in range(nCellsOnVerticalAxis):
-                cell = getattr(matrix, '%s%s'%(ch, j))
-                cell.glyphView.setGlyph(None)
-                cell.glyphView.getNSView().setContourColor_(BlackColor)
-                cell.selectionMask.show(False)
-                cell.masterMask.show(False)
-                cell.name.set('')
+        for cell in self.cells.values():
+            cell.glyphView.setGlyph(None)
+            cell.glyphView.getNSView().setContourColor_(BlackColor)
+            cell.selectionMask.show(False)
+            cell.masterMask.show(False)
+            cell.name.set('')
 
     def saveMatrix(self, sender):
-        pathToSave = putFile(title='Save interpolation matrix', fileName='matrix.txt', fileTypes=['txt'])
+        pathToSave = putFile(title='Save interpolation matrix', fileName='matrix.json', fileTypes=['json'])
         if pathToSave is not None:
             masters = self.masters
             matrixSpots = self.matrixSpots
             axesGrid = self.axesGrid
-            matrixTextValues = []
+            glyphName = self.currentGlyph
+            masterValues = []
             for master in masters:
                 masterSpotKey = master.getSpotKey()
                 matrixSpot = matrixSpots[masterSpotKey]
-                matrixTextValues.append(':'.join([masterSpotKey, matrixSpot.getWeightsAsString(), master.getFontPath()]))
+                fingerprints = {}
+                fingerprint = self.getMasterFingerprint(masterSpotKey)
+                if glyphName is not None and fingerprint is not None:
+                    fingerprints[glyphName] = fingerprint
+                masterValues.append((masterSpotKey, matrixSpot.getWeights(), master.getFontPath(), fingerprints))
+            # instances shown are saved along, for the matrix to show them as soon as it's reopened
+            instances = []
+            for spotKey, cellKey in sorted(self.preview.cells.items()):
+                if cellKey[0] == 'instance' and cellKey[1] == self.mutatorKey:
+                    cachedInstance = self.instanceGlyphs.get(cellKey)
+                    if cachedInstance is not None:
+                        instances.append((glyphName, spotKey, cellKey[2], cachedInstance[0]))
             posSize = self.w.getPosSize()
-            matrixTextValues = ['Matrix Interpolation File\n','%s,%s\n'%(axesGrid['horizontal'], axesGrid['vertical']), ','.join([str(value) for value in posSize]),'\n', str(self.currentGlyph),'\n',','.join(matrixTextValues)]
-            matrixTextForm = ''.join(matrixTextValues)
-            f = open(pathToSave, 'w')
-            f.write(matrixTextForm)
+            writeMatrixDocument(pathToSave, (axesGrid['horizontal'], axesGrid['vertical']), posSize, glyphName, masterValues, instances)
 
     def loadMatrixFile(self, sender):
-        pathToLoad = getFile(fileTypes=['txt'], allowsMultipleSelection=False, resultCallback=self.loadMatrix, parentWindow=self.w)
+        pathToLoad = getFile(fileTypes=['json', 'txt'], allowsMultipleSelection=False, resultCallback=self.loadMatrix, parentWindow=self.w)
 
     def loadMatrix(self, pathToLoad):
         if pathToLoad is not None:
-            self.matrixSpots = {}
+            self.matrixSpots = SpotStore()
+            self.documentInstances = None
             self.reallocateWeights()
-            f = open(pathToLoad[0], 'r')
-            matrixTextForm = f.read()
-            matrixValues = matrixTextForm.split('\n')
-            if matrixValues and matrixValues[0] == 'Matrix Interpolation File':
-                limits = tuple(matrixValues[1].split(','))
-                axesGrid = int(limits[0]), int(limits[1])
-                posSize = tuple([float(value) for value in matrixValues[2].split(',')])
+            matrix = readMatrixFile(pathToLoad[0])
+            if matrix is not None:
+                if matrix['instances']:
+                    self.documentInstances = dict(matrix=matrix, mutatorKeys={})
+                axesGrid = matrix['axesGrid']
+                posSize = matrix['posSize']
                 self.w.resize(posSize[2], posSize[3])
                 self.axesGrid['horizontal'], self.axesGrid['vertical'] = axesGrid
                 self.buildMatrix(axesGrid)
-                self.currentGlyph = matrixValues[3]
-                masterSpots = [value.split(':') for value in matrixValues[4].split(',')]
+                self.currentGlyph = matrix['currentGlyph']
+                masterSpots = matrix['masters']
                 if len(masterSpots):
                     masters = []
                     matrixSpots = self.matrixSpots
-                    fontsToOpen = []
-                    for masterSpot in masterSpots:
-                        if len(masterSpot) > 1:
-                            spotKey = masterSpot[0]
-                            fontPath = masterSpot[-1]
-                            spot = splitSpotKey(spotKey)
-                            if (spot is not None) and (fontPath is not None):
-                                f = [font for font in AllFonts() if font.path == fontPath]
-                                if not len(f):
-                                    f = RFont(fontPath)
-                                elif len(f):
-                                    f = f[0]
-                                if len(masterSpot) > 2:
-                                    cell = getattr(self.w.matrix, spotKey)
-                                    weights = masterSpot[1].split('/')
-                                    matrixSpot = MatrixSpot(spot)
-                                    hWeight, vWeight = float(weights[0]), float(weights[1])
-                                    matrixSpot.setWeights((hWeight, vWeight))
-                                    matrixSpots[spotKey] = matrixSpot
-                                    cell.locationHvalue.set(str(int(hWeight)))
-                                    cell.locationVvalue.set(str(int(vWeight)))
-                                masters.append(MatrixMaster(spot, f))
+                    for spotKey, weights, fontPath in masterSpots:
+                        spot = splitSpotKey(spotKey)
+                        f = self.fonts.getByPath(fontPath)
+                        if f is None:
+                            f = RFont(fontPath)
+                            self.fonts.add(f)
+                        if weights is not None:
+                            cell = self.cells.get(spotKey)
+                            matrixSpot = MatrixSpot(spot)
+                            hWeight, vWeight = weights
+                            matrixSpot.setWeights((hWeight, vWeight))
+                            matrixSpots[spotKey] = matrixSpot
+                            if cell is not None:
+                                cell.locationHvalue.set(str(int(hWeight)))
+                                cell.locationVvalue.set(str(int(vWeight)))
+                        masters.append(MatrixMaster(spot, f))
                     self.matrixSpots = matrixSpots
                     self.masters = masters
                 self.reallocateWeights()
@@ -1190,18 +1295,17 @@ class InterpolationMatrixController:
         return self.currentGlyph
 
     def windowResize(self, info):
-        axesGrid = (nCellsOnHorizontalAxis, nCellsOnVerticalAxis) = (self.axesGrid['horizontal'], self.axesGrid['vertical'])
-        posSize = info.getPosSize()
-        cellXSize, cellYSize = self.glyphPreviewCellSize(posSize, axesGrid)
-        matrix = self.w.matrix
-
-        for i in range(nCellsOnHorizontalAxis):
-            ch = getKeyForValue(i)
-            for j in range(nCellsOnVerticalAxis):
-                cell = getattr(matrix, '%s%s'%(ch,j))
-                cell.setPosSize((i*cellXSize, j*cellYSize, cellXSize, cellYSize))
-                cell.locationHvalue.setPosSize((-40, (cellYSize/2)-8, 36, 16))
-                cell.locationVvalue.setPosSize(((cellXSize/2)-18, -18, 36, 16))
+        layout = self.layout
+        layout.setViewSize(self.matrixViewSize(info.getPosSize()))
+        cellXSize, cellYSize = layout.getCellSize()
+        self.matrixContent.getNSView().setFrameSize_(layout.getContentSize())
+
+        for spotKey, cell in self.cells.items():
+            ch, j = splitSpotKey(spotKey)
+            cell.setPosSize(layout.getCellFrame(getValueForKey(ch), j))
+            cell.locationHvalue.setPosSize((-40, (cellYSize/2)-8, 36, 16))
+            cell.locationVvalue.setPosSize(((cellXSize/2)-18, -18, 36, 16))
+        self.showVisibleCells()
 
     def windowClose(self, notification):
         self.w.unbind('close', self.windowClose)
@@ -1210,5 +1314,9 @@ class InterpolationMatrixController:
         removeObserver(self, "mouseUp")
         removeObserver(self, "keyUp")
         removeObserver(self, "fontDidClose")
+        NSNotificationCenter.defaultCenter().removeObserver_(self.scrollObserver)
+        self.fonts.release()
+        self.updateDebouncer.cancel()
+        self.instanceWorker.stop()
 
 InterpolationMatrixController()
\ No newline at end of file
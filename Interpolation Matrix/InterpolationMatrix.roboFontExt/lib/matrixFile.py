@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+
+'''
+Matrix file
+Reading and writing of interpolation matrix files, and allocation of spot weights on a grid,
+independently from the Robofont UI.
+
+A matrix document is a JSON object, optionally followed by a NUL byte and a binary section:
+
+    {
+        "format": "interpolation-matrix", "version": 1,
+        "axesGrid": [nCellsOnHorizontalAxis, nCellsOnVerticalAxis],
+        "posSize": [x, y, width, height],                               (window position & size)
+        "currentGlyph": glyphName,
+        "masters": [{"spot": spotKey, "weights": [hWeight, vWeight], "path": fontPath,
+                     "fingerprints": {glyphName: fingerprint}}, …],
+        "structures": [[[contours, components, anchorNames], pointAttributes], …],
+        "instances": {glyphName: {spotKey: {"weights": [hWeight, vWeight],
+                      "structure": index, "offset": offset, "rows": rowCount}}}
+    }
+    \0
+    instance rows                   (x, y) pairs as little endian doubles, laid out as in glyphArrays
+
+Fingerprints (see glyphDataFingerprint) tell whether master glyphs changed since the document
+was saved, that is, whether stored instance outlines are stale.
+
+Matrices used to be saved as text files, which are still read:
+
+    Matrix Interpolation File
+    nCellsOnHorizontalAxis,nCellsOnVerticalAxis
+    x,y,width,height            (window position & size)
+    currentGlyph
+    spotKey:hWeight/vWeight:fontPath,spotKey:hWeight/vWeight:fontPath,…
+'''
+
+from _mutatorMath.objects.location import Location
+from _mutatorMath.objects.mutator import buildMutator
+from matrixSpot import MatrixSpot, getKeyForValue, splitSpotKey
+from matrixLayout import SpotStore
+from glyphArrays import GlyphArrayStructure, _readGlyph
+from collections import OrderedDict
+from array import array
+from hashlib import md5
+import json
+import os
+import sys
+
+MATRIX_FILE_HEADER = 'Matrix Interpolation File'
+MATRIX_DOCUMENT_FORMAT = 'interpolation-matrix'
+MATRIX_DOCUMENT_VERSION = 1
+
+def formatMatrixFile(axesGrid, posSize, currentGlyph, masters):
+    """
+    Return the text form of a matrix, masters being a list of (spotKey, weightsString, fontPath).
+    """
+    matrixTextValues = [':'.join([spotKey, weights, fontPath]) for spotKey, weights, fontPath in masters]
+    matrixTextValues = [MATRIX_FILE_HEADER, '\n', '%s,%s\n'%axesGrid, ','.join([str(value) for value in posSize]), '\n', str(currentGlyph), '\n', ','.join(matrixTextValues)]
+    return ''.join(matrixTextValues)
+
+def parseMatrixFile(matrixTextForm):
+    """
+    Return the values of a matrix file’s text as a dict:
+
+        axesGrid        (nCellsOnHorizontalAxis, nCellsOnVerticalAxis)
+        posSize         window position & size
+        currentGlyph    glyph name, as written
+        masters         list of (spotKey, (hWeight, vWeight) or None, fontPath)
+
+    or None if the text isn’t a matrix file.
+    """
+    matrixValues = matrixTextForm.split('\n')
+    if not matrixValues or matrixValues[0] != MATRIX_FILE_HEADER:
+        return
+    limits = tuple(matrixValues[1].split(','))
+    axesGrid = int(limits[0]), int(limits[1])
+    posSize = tuple([float(value) for value in matrixValues[2].split(',')])
+    currentGlyph = matrixValues[3]
+    masters = []
+    for masterSpot in [value.split(':') for value in matrixValues[4].split(',')]:
+        if len(masterSpot) > 1:
+            spotKey = masterSpot[0]
+            fontPath = masterSpot[-1]
+            if splitSpotKey(spotKey) is None:
+                continue
+            weights = None
+            if len(masterSpot) > 2:
+                hWeight, vWeight = masterSpot[1].split('/')
+                weights = float(hWeight), float(vWeight)
+            masters.append((spotKey, weights, fontPath))
+    return dict(axesGrid=axesGrid, posSize=posSize, currentGlyph=currentGlyph, masters=masters)
+
+def _plain(value):
+    # lists & unicode strings (from json, or fonts) as tuples & byte strings
+    if isinstance(value, (list, tuple)):
+        return tuple([_plain(item) for item in value])
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+def glyphDataFingerprint(glyph):
+    """
+    Return a fingerprint of a glyph’s structure and coordinates, stable across sessions.
+    """
+    key, pointAttributes, rows = _readGlyph(glyph)
+    return md5(repr((_plain(key), _plain(pointAttributes), [(float(x), float(y)) for x, y in rows]))).hexdigest()
+
+def _packRows(rows):
+    values = array('d', [value for row in rows for value in row])
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tostring()
+
+def _unpackRows(data, offset, rowCount):
+    values = array('d')
+    values.fromstring(data[offset:offset+(rowCount*16)])
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return [(values[index], values[index+1]) for index in range(0, len(values), 2)]
+
+def formatMatrixDocument(axesGrid, posSize, currentGlyph, masters, instances=()):
+    """
+    Return the document form of a matrix, masters being a list of
+    (spotKey, (hWeight, vWeight), fontPath, {glyphName: fingerprint})
+    and instances, outlines to store, a list of (glyphName, spotKey, (hWeight, vWeight), glyph).
+    """
+    document = OrderedDict()
+    document['format'] = MATRIX_DOCUMENT_FORMAT
+    document['version'] = MATRIX_DOCUMENT_VERSION
+    document['axesGrid'] = list(axesGrid)
+    document['posSize'] = list(posSize)
+    document['currentGlyph'] = currentGlyph
+    document['masters'] = [OrderedDict([('spot', spotKey), ('weights', list(weights)), ('path', fontPath), ('fingerprints', fingerprints)]) for spotKey, weights, fontPath, fingerprints in masters]
+    structures = []
+    structureIndices = {}
+    documentInstances = {}
+    data = []
+    offset = 0
+    for glyphName, spotKey, weights, glyph in instances:
+        key, pointAttributes, rows = _readGlyph(glyph)
+        structure = key, pointAttributes
+        if structure not in structureIndices:
+            structureIndices[structure] = len(structures)
+            structures.append(structure)
+        data.append(_packRows(rows))
+        documentInstances.setdefault(glyphName, {})[spotKey] = dict(weights=list(weights), structure=structureIndices[structure], offset=offset, rows=len(rows))
+        offset += len(data[-1])
+    if documentInstances:
+        document['structures'] = structures
+        document['instances'] = documentInstances
+    text = json.dumps(document, separators=(',', ':'))
+    if data:
+        return '\0'.join([text, ''.join(data)])
+    return text
+
+def parseMatrixDocument(data):
+    """
+    Return the values of a matrix document (or of a matrix text file, see parseMatrixFile) as a dict:
+
+        version         document version, 0 for text files
+        axesGrid        (nCellsOnHorizontalAxis, nCellsOnVerticalAxis)
+        posSize         window position & size
+        currentGlyph    glyph name
+        masters         list of (spotKey, (hWeight, vWeight) or None, fontPath)
+        fingerprints    {spotKey: {glyphName: fingerprint}} of masters
+        instances       {glyphName: {spotKey: instance}}, see getDocumentInstance
+
+    or None if the data isn’t a matrix document.
+    """
+    if data.startswith(MATRIX_FILE_HEADER):
+        matrix = parseMatrixFile(data)
+        if matrix is not None:
+            matrix.update(version=0, fingerprints={}, instances={}, structures=[], data='')
+        return matrix
+    text, separator, binaryData = data.partition('\0')
+    try:
+        document = json.loads(text)
+    except ValueError:
+        return
+    if not isinstance(document, dict) or document.get('format') != MATRIX_DOCUMENT_FORMAT:
+        return
+    if document.get('version', 0) > MATRIX_DOCUMENT_VERSION:
+        raise ValueError('Matrix document version %s is newer than this version of the matrix can read.' % (document['version']))
+    masters = []
+    fingerprints = {}
+    for master in document['masters']:
+        spotKey = master['spot']
+        if splitSpotKey(spotKey) is None:
+            continue
+        weights = master.get('weights')
+        if weights is not None:
+            weights = float(weights[0]), float(weights[1])
+        masters.append((spotKey, weights, master['path']))
+        fingerprints[spotKey] = master.get('fingerprints', {})
+    return dict(version=document['version'], axesGrid=tuple(document['axesGrid']), posSize=tuple(document['posSize']),
+                currentGlyph=document['currentGlyph'], masters=masters, fingerprints=fingerprints,
+                instances=document.get('instances', {}), structures=document.get('structures', []), data=binaryData)
+
+def getDocumentInstance(matrix, glyphName, spotKey, glyph):
+    """
+    Draw the instance stored for a spot into glyph and return ((hWeight, vWeight), glyph),
+    the weights of the spot the instance was made for, or None if there is no such instance.
+    Instances are only decoded when asked for, glyph structures once per document.
+    """
+    instance = matrix['instances'].get(glyphName, {}).get(spotKey)
+    if instance is None:
+        return
+    structures = matrix.setdefault('glyphStructures', {})
+    if instance['structure'] not in structures:
+        key, pointAttributes = _plain(matrix['structures'][instance['structure']])
+        structures[instance['structure']] = GlyphArrayStructure(key=key), pointAttributes
+    structure, pointAttributes = structures[instance['structure']]
+    rows = _unpackRows(matrix['data'], instance['offset'], instance['rows'])
+    if len(rows) != structure.size:
+        return
+    glyph.name = glyphName
+    return tuple(instance['weights']), structure.extractGlyph(rows, glyph, pointAttributes)
+
+def writeMatrixDocument(path, axesGrid, posSize, currentGlyph, masters, instances=()):
+    """
+    Save a matrix document (see formatMatrixDocument) to path, through a temporary file
+    so that a failed save leaves a previous document as it was.
+    """
+    tempPath = path + '.tmp'
+    f = open(tempPath, 'wb')
+    try:
+        f.write(formatMatrixDocument(axesGrid, posSize, currentGlyph, masters, instances))
+    finally:
+        f.close()
+    if os.path.exists(path):
+        os.remove(path)
+    os.rename(tempPath, path)
+
+def readMatrixFile(path):
+    """
+    Read a matrix document or a matrix text file, see parseMatrixDocument.
+    """
+    f = open(path, 'rb')
+    try:
+        return parseMatrixDocument(f.read())
+    finally:
+        f.close()
+
+class AxisWeights(object):
+    """
+    Weights along one axis of the grid: a piecewise linear function of the cell position
+    whose breakpoints are the masters’ (position, weight), solved by a one axis mutator.
+    Weights are solved once per position and kept, so a grid only ever solves
+    as many weights as it has columns or lines, and a resized grid solves only its new ones.
+    """
+
+    def __init__(self, axisName, breakpoints):
+        self.axisName = axisName
+        self.breakpoints = tuple(breakpoints)
+        bias, self.mutator = buildMutator([(Location(**{axisName: position}), weight) for position, weight in self.breakpoints])
+        self.weights = []
+
+    def getWeights(self, count):
+        weights = self.weights
+        for position in range(len(weights), count):
+            weights.append(self.mutator.makeInstance(Location(**{self.axisName: position})))
+        return weights[:count]
+
+_axisWeightsCache = OrderedDict()
+_axisWeightsCacheSize = 32
+
+def getAxisWeights(axisName, breakpoints):
+    """
+    Return the AxisWeights of an axis, shared between calls with the same breakpoints
+    (editing a master’s horizontal weight leaves the vertical weights solved, and vice versa).
+    """
+    key = axisName, tuple(breakpoints)
+    axisWeights = _axisWeightsCache.pop(key, None)
+    if axisWeights is None:
+        axisWeights = AxisWeights(axisName, breakpoints)
+    _axisWeightsCache[key] = axisWeights
+    if len(_axisWeightsCache) > _axisWeightsCacheSize:
+        _axisWeightsCache.popitem(last=False)
+    return axisWeights
+
+def allocateWeights(axesGrid, matrixSpots, masterSpots, masterSpotKeys=None):
+    """
+    Set the weights of every spot of a grid, return the spots ({spotKey: MatrixSpot}).
+
+    With less than two masters, all spots get default weights ((i+1)*100, (j+1)*100).
+    Otherwise spots that aren’t masters get weights interpolated along each axis
+    from the masters’ weights, masterSpots being the masters’ (i, j) positions:
+    each axis is solved once (see AxisWeights) and spot (i, j) gets (hWeights[i], vWeights[j]).
+    A SpotStore is allocated sparsely: only spots it already has are set, others when made.
+    """
+    nCellsOnHorizontalAxis, nCellsOnVerticalAxis = axesGrid
+
+    if len(masterSpots) <= 1:
+
+        if isinstance(matrixSpots, SpotStore):
+            return SpotStore()
+
+        matrixSpots = {}
+
+        for i in range(nCellsOnHorizontalAxis):
+            ch = getKeyForValue(i)
+
+            for j in range(nCellsOnVerticalAxis):
+                spotKey = '%s%s'%(ch, j)
+                matrixSpot = MatrixSpot((i, j))
+                matrixSpot.setWeights(((i+1)*100, (j+1)*100))
+                matrixSpots[spotKey] = matrixSpot
+
+        return matrixSpots
+
+    if masterSpotKeys is None:
+        masterSpotKeys = ['%s%s'%(getKeyForValue(mi), mj) for mi, mj in masterSpots]
+    masterSpotKeys = set(masterSpotKeys)
+    hBreakpoints = []
+    vBreakpoints = []
+    for mi, mj in masterSpots:
+        masterSpotKey = '%s%s'%(getKeyForValue(mi), mj)
+        hWeight, vWeight = matrixSpots[masterSpotKey].getWeights()
+        hBreakpoints.append((mi, hWeight))
+        vBreakpoints.append((mj, vWeight))
+
+    hWeights = getAxisWeights('horizontal', hBreakpoints).getWeights(nCellsOnHorizontalAxis)
+    vWeights = getAxisWeights('vertical', vBreakpoints).getWeights(nCellsOnVerticalAxis)
+
+    if isinstance(matrixSpots, SpotStore):
+        matrixSpots.allocate(hWeights, vWeights, masterSpotKeys)
+        return matrixSpots
+
+    for i, instanceHweight in enumerate(hWeights):
+        ch = getKeyForValue(i)
+
+        for j, instanceVweight in enumerate(vWeights):
+            spotKey = '%s%s'%(ch, j)
+            if spotKey not in masterSpotKeys:
+                matrixSpots[spotKey].setWeights((instanceHweight, instanceVweight))
+
+    return matrixSpots
+
+def getMatrixSpots(matrix):
+    """
+    Return the spots ({spotKey: MatrixSpot}) of a parsed matrix file, weighted as the matrix UI would.
+    """
+    axesGrid = matrix['axesGrid']
+    matrixSpots = SpotStore()
+    masterSpots = []
+    for spotKey, weights, fontPath in matrix['masters']:
+        ch, j = splitSpotKey(spotKey)
+        matrixSpot = MatrixSpot((ch, j))
+        if weights is not None:
+            matrixSpot.setWeights(weights)
+            matrixSpots[spotKey] = matrixSpot
+        masterSpots.append(matrixSpot.getRaw())
+    return allocateWeights(axesGrid, matrixSpots, masterSpots)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+'''
+Matrix instances
+Headless generation of an interpolation matrix’s spots to UFOs, with defcon instead of Robofont.
+
+    python matrixInstances.py matrix.json [spots] [-o folder] [-p processes]
+
+Spots are written as in the generation sheet: 'c3' for a single spot, 'c' for a column,
+'3' for a line, comma separated; '*' (default) generates every spot that isn’t a master.
+Master paths relative to the matrix file are resolved from its folder. Instances are saved to
+matrix-instances/ next to the source font (the first master) unless a folder is given.
+'''
+
+from _mutatorMath.objects.location import Location
+from familyGenerator import FamilyGenerator
+from matrixFile import readMatrixFile, getMatrixSpots
+from matrixSpot import getKeyForValue, parseSpotsList
+from time import time
+import argparse
+import os
+import sys
+
+def openMasters(matrix, matrixSpots, basePath, fontClass=None):
+    """
+    Return the masters of a parsed matrix file as a list of (Location, font).
+    """
+    if fontClass is None:
+        from defcon.objects.font import Font as fontClass
+    fonts = {}
+    masters = []
+    for spotKey, weights, fontPath in matrix['masters']:
+        fontPath = os.path.join(basePath, fontPath)
+        if fontPath not in fonts:
+            fonts[fontPath] = fontClass(fontPath)
+        location = Location(**matrixSpots[spotKey].getWeightsAsDict('horizontal', 'vertical'))
+        masters.append((location, fonts[fontPath]))
+    return masters
+
+def generateMatrixInstances(matrixPath, spots='*', folderPath=None, processes=None, chunkSize=64, doGlyphs=True, doKerning=True, doFontInfos=True, addGroups=True, fontClass=None):
+    """
+    Generate spots of the matrix file at matrixPath to UFOs,
+    return a list of (styleName, UFO path, incompatible glyph names).
+    """
+    matrix = readMatrixFile(matrixPath)
+    if matrix is None:
+        raise ValueError('%s is not a valid matrix file.' % (matrixPath))
+    axesGrid = matrix['axesGrid']
+    matrixSpots = getMatrixSpots(matrix)
+    masters = openMasters(matrix, matrixSpots, os.path.dirname(os.path.abspath(matrixPath)), fontClass)
+    if not masters:
+        return []
+    masterSpots = [matrixSpots[spotKey].getRaw() for spotKey, weights, fontPath in matrix['masters']]
+    spotsList = parseSpotsList(spots, axesGrid, masterSpots) or []
+
+    instances = []
+    for i, j in sorted(spotsList):
+        matrixSpot = matrixSpots['%s%s'%(getKeyForValue(i), j)]
+        instances.append((matrixSpot.getReadableSpot(), Location(**matrixSpot.getWeightsAsDict('horizontal', 'vertical'))))
+
+    sourceFont = masters[0][1]
+    if folderPath is None:
+        folderPath = os.path.join(os.path.dirname(sourceFont.path), 'matrix-instances')
+    generator = FamilyGenerator(masters, sourceFont, processes=processes, chunkSize=chunkSize)
+    return generator.generate(instances, folderPath=folderPath, doGlyphs=doGlyphs, doKerning=doKerning, doFontInfos=doFontInfos, addGroups=addGroups)
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Generate instances of an interpolation matrix file.')
+    parser.add_argument('matrix', help='matrix file, as saved by the Interpolation Matrix')
+    parser.add_argument('spots', nargs='?', default='*', help='spots to generate: c3,c,3 or * for all (default)')
+    parser.add_argument('-o', '--output', default=None, help='folder to save instances to')
+    parser.add_argument('-p', '--processes', type=int, default=None, help='number of worker processes (default: cpu count)')
+    parser.add_argument('--no-glyphs', dest='glyphs', action='store_false')
+    parser.add_argument('--no-kerning', dest='kerning', action='store_false')
+    parser.add_argument('--no-info', dest='info', action='store_false')
+    parser.add_argument('--no-groups', dest='groups', action='store_false')
+    options = parser.parse_args(args)
+
+    start = time()
+    try:
+        generated = generateMatrixInstances(options.matrix, options.spots, options.output, options.processes,
+            doGlyphs=options.glyphs, doKerning=options.kerning, doFontInfos=options.info, addGroups=options.groups)
+    except ValueError as error:
+        print(error)
+        return 1
+    for styleName, path, incompatibleGlyphs in generated:
+        print('*** Generated instance %s -> %s' % (styleName, path))
+        if incompatibleGlyphs:
+            print('+ Could not interpolate %s glyphs: %s' % (len(incompatibleGlyphs), ' '.join(incompatibleGlyphs)))
+    print('%s instances generated in %0.1fs' % (len(generated), time()-start))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+'''
+Matrix layout
+Sparse spot storage and cell layout of large interpolation matrices, independent from AppKit.
+
+A matrix larger than its window is scrolled and only the cells in view get views:
+
+    MatrixLayout    where cells are in the scrolled content, which cells a visible rectangle shows
+    SpotStore       {spotKey: MatrixSpot} that only makes the spots asked for
+'''
+
+from matrixSpot import MatrixSpot, getValueForKey, splitSpotKey
+from bisect import bisect_right, insort
+from copy import copy, deepcopy
+
+def _copyAxisWeights(weight, offsetWeight):
+    # an axis’ weight and the offset weight following it, linked to each other only
+    weight, offsetWeight = copy(weight), copy(offsetWeight)
+    weight.slaves = [offsetWeight]
+    offsetWeight.master = weight
+    return weight, offsetWeight
+
+class SpotStore(dict):
+    """
+    Sparse {spotKey: MatrixSpot}: a spot is made when first asked for, with the weights
+    it would have had if every spot had been made with the grid (see allocateWeights),
+    so 'in' and has_key() only tell which spots were made so far.
+
+    A spot’s weights depend on every allocation it went through (offset weights are clamped
+    to each new limits), but each axis only on its own: spots of a column that were covered
+    by the same allocations share their horizontal weight, spots of a line their vertical one.
+    Allocations are folded into a template spot per column and per line instead of being kept,
+    and a spot takes its weights from its column’s and line’s when made. Grids of different
+    sizes cover different parts of a column, so templates are kept per band of the column
+    between the grid sizes used so far (and likewise for lines).
+
+    >>> from matrixFile import allocateWeights
+    >>> from matrixLayout import SpotStore
+    >>> from matrixSpot import getKeyForValue
+    >>> keys = [('%s%s' % (getKeyForValue(i), j), i, j) for i in range(20) for j in range(20)]
+    >>> eager = dict([(key, MatrixSpot((i, j))) for key, i, j in keys])
+    >>> for key, i, j in keys:
+    ...     eager[key].setWeights(((i+1)*100, (j+1)*100))
+    >>> lazy = SpotStore()
+    >>> import random
+    >>> r = random.Random(3)
+    >>> masterSpots = [(0, 0), (11, 2), (3, 11)]
+    >>> for cycle in range(12):
+    ...     axesGrid = r.choice([(15, 15), (15, 15), (20, 12), (12, 20), (20, 20)])
+    ...     for mi, mj in masterSpots:
+    ...         weights = r.randint(-2000, 2000), r.randint(-2000, 2000)
+    ...         for spots in [eager, lazy]:
+    ...             spots['%s%s' % (getKeyForValue(mi), mj)].setWeights(weights)
+    ...     eager = allocateWeights(axesGrid, eager, masterSpots)
+    ...     lazy = allocateWeights(axesGrid, lazy, masterSpots)
+    ...     scrolledSpot = lazy['%s%s' % (getKeyForValue(cycle), cycle+4)]
+    >>> len(lazy) < len(eager)
+    True
+    >>> [key for key, i, j in keys if eager[key].getWeights() != lazy[key].getWeights()]
+    []
+    >>> len(lazy.columns) <= 20 * (len(lazy.vSizes) + 1)
+    True
+    """
+
+    def __init__(self, spots=None):
+        dict.__init__(self, spots or {})
+        # grid sizes allocated so far, and template spots {(index, band): MatrixSpot}
+        self.hSizes = []
+        self.vSizes = []
+        self.columns = {}
+        self.lines = {}
+
+    def __missing__(self, spotKey):
+        spot = splitSpotKey(spotKey)
+        i = getValueForKey(spot[0]) if spot is not None else None
+        if i is None or spot[1] < 0:
+            raise KeyError(spotKey)
+        j = spot[1]
+        matrixSpot = MatrixSpot((i, j))
+        matrixSpot.setWeights(((i+1)*100, (j+1)*100))
+        column = self.columns.get((i, bisect_right(self.vSizes, j)))
+        if column is not None:
+            matrixSpot.xWeight, matrixSpot.xOffsetWeight = _copyAxisWeights(column.xWeight, column.xOffsetWeight)
+        line = self.lines.get((j, bisect_right(self.hSizes, i)))
+        if line is not None:
+            matrixSpot.yWeight, matrixSpot.yOffsetWeight = _copyAxisWeights(line.yWeight, line.yOffsetWeight)
+        self[spotKey] = matrixSpot
+        return matrixSpot
+
+    def _coveredBands(self, templates, sizes, size):
+        # bands of the other axis covered by a grid of size, splitting the band size falls in
+        if size not in sizes:
+            band = bisect_right(sizes, size)
+            insort(sizes, size)
+            for (index, templateBand), template in sorted(templates.items(), reverse=True):
+                if templateBand > band:
+                    templates[index, templateBand+1] = templates.pop((index, templateBand))
+                elif templateBand == band:
+                    templates[index, band+1] = deepcopy(template)
+        return range(sizes.index(size)+1)
+
+    def allocate(self, hWeights, vWeights, masterSpotKeys):
+        """
+        Give spots that aren't masters weights (hWeights[i], vWeights[j]),
+        now for spots already made, later for the others.
+        """
+        masterSpotKeys = set(masterSpotKeys)
+        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = len(hWeights), len(vWeights)
+        # masters are made before, so that spots made later never were masters
+        for spotKey in masterSpotKeys:
+            self[spotKey]
+        for band in self._coveredBands(self.columns, self.vSizes, nCellsOnVerticalAxis):
+            for i, hWeight in enumerate(hWeights):
+                if (i, band) not in self.columns:
+                    self.columns[i, band] = MatrixSpot((i, 0))
+                    self.columns[i, band].setWeights(((i+1)*100, 100))
+                self.columns[i, band].setWeights((hWeight, 100))
+        for band in self._coveredBands(self.lines, self.hSizes, nCellsOnHorizontalAxis):
+            for j, vWeight in enumerate(vWeights):
+                if (j, band) not in self.lines:
+                    self.lines[j, band] = MatrixSpot((0, j))
+                    self.lines[j, band].setWeights((100, (j+1)*100))
+                self.lines[j, band].setWeights((100, vWeight))
+        for spotKey, matrixSpot in self.items():
+            i, j = matrixSpot.getRaw()
+            if i < nCellsOnHorizontalAxis and j < nCellsOnVerticalAxis and spotKey not in masterSpotKeys:
+                matrixSpot.setWeights((hWeights[i], vWeights[j]))
+
+class MatrixLayout(object):
+    """
+    Cell geometry of a grid shown in a scrolled view of viewSize.
+
+    Cells share the view as long as they can be at least minCellSize,
+    past that they keep minCellSize and the content overflows the view.
+    Neighbouring columns overlap by a point so that their borders merge.
+    Frames are (x, y, width, height) from the content's top left corner.
+    """
+
+    def __init__(self, axesGrid, viewSize, minCellSize=(50, 50)):
+        self.axesGrid = tuple(axesGrid)
+        self.minCellSize = minCellSize
+        self.setViewSize(viewSize)
+
+    def setViewSize(self, viewSize):
+        self.viewSize = viewSize
+        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = self.axesGrid
+        viewWidth, viewHeight = viewSize
+        minWidth, minHeight = self.minCellSize
+        self.cellWidth = max(minWidth, (viewWidth + nCellsOnHorizontalAxis) / float(nCellsOnHorizontalAxis))
+        self.cellHeight = max(minHeight, viewHeight / float(nCellsOnVerticalAxis))
+
+    def getCellSize(self):
+        return self.cellWidth, self.cellHeight
+
+    def getContentSize(self):
+        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = self.axesGrid
+        return nCellsOnHorizontalAxis * (self.cellWidth-1), nCellsOnVerticalAxis * self.cellHeight
+
+    def overflows(self):
+        contentWidth, contentHeight = self.getContentSize()
+        viewWidth, viewHeight = self.viewSize
+        return contentWidth > viewWidth, contentHeight > viewHeight
+
+    def getCellFrame(self, i, j):
+        return i * (self.cellWidth-1), j * self.cellHeight, self.cellWidth, self.cellHeight
+
+    def _getRange(self, start, length, step, size, count, margin):
+        # cells whose [index*step, index*step+size) intersects [start, start+length)
+        first = int((start - size) // step) + 1
+        last = -int(-(start + length) // step)
+        return max(0, first - margin), min(count, last + margin)
+
+    def getVisibleRange(self, rect, margin=1):
+        """
+        Return the ranges of columns & lines, as ((iStart, iEnd), (jStart, jEnd)), with cells
+        in rect, plus margin cells around for scrolling not to show blanks before views are made.
+
+        >>> layout = MatrixLayout((50, 50), (950, 350))
+        >>> layout.getCellSize()
+        (50, 50)
+        >>> layout.getVisibleRange((0, 0, 950, 350), margin=0)
+        ((0, 20), (0, 7))
+        >>> layout.getVisibleRange((980, 1000, 950, 350))
+        ((18, 41), (19, 28))
+        >>> layout.getVisibleRange((2000, 2000, 950, 350))
+        ((39, 50), (39, 48))
+        """
+        x, y, width, height = rect
+        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = self.axesGrid
+        return (self._getRange(x, width, self.cellWidth-1, self.cellWidth, nCellsOnHorizontalAxis, margin),
+                self._getRange(y, height, self.cellHeight, self.cellHeight, nCellsOnVerticalAxis, margin))
+
+    def getVisibleSpots(self, rect, margin=1):
+        """
+        Return the (i, j) of cells in rect, see getVisibleRange.
+
+        >>> layout = MatrixLayout((3, 1), (950, 350))
+        >>> layout.getCellSize()
+        (317.6666666666667, 350.0)
+        >>> sorted(layout.getVisibleSpots((0, 0, 950, 350)))
+        [(0, 0), (1, 0), (2, 0)]
+        >>> layout.overflows()
+        (False, False)
+        """
+        (iStart, iEnd), (jStart, jEnd) = self.getVisibleRange(rect, margin)
+        return set([(i, j) for i in range(iStart, iEnd) for j in range(jStart, jEnd)])
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
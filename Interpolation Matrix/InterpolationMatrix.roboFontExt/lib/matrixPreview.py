@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+
+'''
+Matrix preview
+Bookkeeping for incremental refreshes of the interpolation matrix preview, independent from AppKit.
+
+A refresh only needs to redo what its inputs changed:
+
+    master cells        preview glyph rebuilt when the master glyph’s fingerprint changes
+    mutator             rebuilt when a master glyph or a master’s weights change
+    instance cells      reinterpolated when the mutator or the spot’s weights change,
+                        unless an InstanceCache still has the instance for these inputs
+    cell views          set only when the glyph they show changes
+
+Instances can be computed off the UI thread: a Debouncer coalesces bursts of notifications
+into one refresh and an InstanceWorker computes instances in a background thread,
+publishing results tagged with a generation number so that stale ones can be dropped.
+'''
+
+from glyphArrays import _readGlyph
+from collections import OrderedDict
+from threading import Condition, Lock, Thread, Timer
+
+def _getParent(glyph):
+    if hasattr(glyph, 'getParent'):
+        return glyph.getParent()
+    return getattr(glyph, 'font', None)
+
+def glyphFingerprint(glyph, _depth=0):
+    """
+    Return a hash of everything a glyph’s preview is drawn from: width, contours, anchors,
+    components and, as previews are decomposed, the fingerprints of component base glyphs.
+    """
+    key, pointAttributes, rows = _readGlyph(glyph)
+    contours, components, anchorNames = key
+    baseFingerprints = ()
+    if components and _depth < 10:
+        font = _getParent(glyph)
+        if font is not None:
+            baseFingerprints = tuple([glyphFingerprint(font[baseGlyph], _depth+1) if baseGlyph in font else None for baseGlyph in components])
+    return hash((key, tuple([tuple(row) for row in rows]), baseFingerprints))
+
+class DecompositionCache(object):
+    """
+    Bounded (LRU) cache of decomposed glyphs, made by decompose(glyph, *options).
+    Entries are keyed by glyph identity (font, glyph name, options) and only reused while
+    the glyph’s fingerprint, which covers component base glyphs, is unchanged.
+    With copy=True, copies of cached glyphs are returned, for callers that modify them.
+    """
+
+    def __init__(self, decompose, maxSize=256, copy=False):
+        self.decompose = decompose
+        self.maxSize = maxSize
+        self.copy = copy
+        self.entries = OrderedDict()
+        self.counters = dict.fromkeys(['hits', 'misses', 'evictions'], 0)
+
+    def get(self, glyph, options=(), fingerprint=None):
+        if fingerprint is None:
+            fingerprint = glyphFingerprint(glyph)
+        key = (id(_getParent(glyph)), glyph.name) + tuple(options)
+        entry = self.entries.pop(key, None)
+        if entry is not None and entry[0] == fingerprint:
+            self.counters['hits'] += 1
+            decomposedGlyph = entry[1]
+        else:
+            self.counters['misses'] += 1
+            decomposedGlyph = self.decompose(glyph, *options)
+            entry = fingerprint, decomposedGlyph
+        self.entries[key] = entry
+        if len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+            self.counters['evictions'] += 1
+        if self.copy and decomposedGlyph is not None:
+            return decomposedGlyph.copy()
+        return decomposedGlyph
+
+    def clear(self):
+        self.entries.clear()
+
+    def getStats(self):
+        stats = dict(self.counters)
+        stats['size'] = len(self.entries)
+        return stats
+
+    def report(self):
+        c = self.counters
+        lookups = c['hits'] + c['misses']
+        hitRate = 100. * c['hits'] / lookups if lookups else 0
+        return 'decomposed glyphs: %s entries, %s hits/%s misses (%0.0f%%), %s evictions' % (len(self.entries), c['hits'], c['misses'], hitRate, c['evictions'])
+
+class InstanceCache(object):
+    """
+    Bounded (LRU) cache of instance glyphs made for matrix cells, as (glyph, fingerprint),
+    keyed by cell keys: master fingerprints & locations and the spot’s location.
+    Cells coming back to inputs they had before (an undone edit, a glyph shown again,
+    a cell scrolled back in view) are shown without being interpolated again.
+    """
+
+    def __init__(self, maxSize=1024):
+        self.maxSize = maxSize
+        self.entries = OrderedDict()
+        self.counters = dict.fromkeys(['hits', 'misses', 'evictions'], 0)
+
+    def get(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            self.counters['misses'] += 1
+            return None
+        self.counters['hits'] += 1
+        self.entries[key] = entry
+        return entry
+
+    def set(self, key, glyph, fingerprint):
+        self.entries.pop(key, None)
+        self.entries[key] = glyph, fingerprint
+        if len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def getStats(self):
+        stats = dict(self.counters)
+        stats['size'] = len(self.entries)
+        return stats
+
+    def report(self):
+        c = self.counters
+        lookups = c['hits'] + c['misses']
+        hitRate = 100. * c['hits'] / lookups if lookups else 0
+        return 'instance glyphs: %s entries, %s hits/%s misses (%0.0f%%), %s evictions' % (len(self.entries), c['hits'], c['misses'], hitRate, c['evictions'])
+
+class PreviewTracker(object):
+    """
+    Keeps what the matrix views show, keyed by their inputs, and counts hits versus recomputes.
+    """
+
+    def __init__(self):
+        self.counters = dict.fromkeys(['refreshes', 'skippedRefreshes', 'masterHits', 'masterRecomputes', 'mutatorHits', 'mutatorRecomputes', 'cellHits', 'cellRecomputes', 'viewUpdates', 'viewSkips'], 0)
+        self.reset()
+
+    def reset(self):
+        """
+        Forget everything, to be called when the views are rebuilt.
+        """
+        self.masters = {}
+        self.cells = {}
+        self.contents = {}
+        self.mutatorKey = None
+        self.mutator = None
+        self._changed = False
+
+    def beginRefresh(self):
+        self.counters['refreshes'] += 1
+        self._changed = False
+
+    def endRefresh(self):
+        if not self._changed:
+            self.counters['skippedRefreshes'] += 1
+        return self._changed
+
+    def getMaster(self, spotKey, masterKey):
+        """
+        Return the (previewGlyph, mathGlyph) kept for a master spot if its key is unchanged, None otherwise.
+        """
+        master = self.masters.get(spotKey)
+        if master is not None and master[0] == masterKey:
+            self.counters['masterHits'] += 1
+            return master[1]
+        self.counters['masterRecomputes'] += 1
+        self._changed = True
+        return None
+
+    def setMaster(self, spotKey, masterKey, previewGlyph, mathGlyph):
+        self.masters[spotKey] = masterKey, (previewGlyph, mathGlyph)
+
+    def forgetMaster(self, spotKey):
+        self.masters.pop(spotKey, None)
+
+    def getMutator(self, mutatorKey):
+        if self.mutator is not None and self.mutatorKey == mutatorKey:
+            self.counters['mutatorHits'] += 1
+            return self.mutator
+        self.counters['mutatorRecomputes'] += 1
+        self._changed = True
+        return None
+
+    def setMutator(self, mutatorKey, mutator):
+        self.mutatorKey = mutatorKey
+        self.mutator = mutator
+
+    def cellChanged(self, spotKey, cellKey, store=True):
+        """
+        Return True if a cell’s key differs from what it shows, and store the new key
+        unless store is False (the cell’s content will come later, see setCell).
+        """
+        if self.cells.get(spotKey) == cellKey:
+            self.counters['cellHits'] += 1
+            return False
+        if store:
+            self.cells[spotKey] = cellKey
+        self.counters['cellRecomputes'] += 1
+        self._changed = True
+        return True
+
+    def setCell(self, spotKey, cellKey):
+        self.cells[spotKey] = cellKey
+
+    def forgetCell(self, spotKey):
+        """
+        Forget what a cell shows, to be called when its view is removed.
+        """
+        self.cells.pop(spotKey, None)
+        self.contents.pop(spotKey, None)
+
+    def setContent(self, spotKey, content):
+        """
+        Store what a cell’s view was set to show, as a glyph fingerprint or any other key.
+        """
+        self.contents[spotKey] = content
+
+    def contentChanged(self, spotKey, content):
+        """
+        Return True if a cell’s view shows something else than content, which it is then set to show:
+        new inputs may still give the glyph a view shows.
+        """
+        if self.contents.get(spotKey) == content:
+            self.counters['viewSkips'] += 1
+            return False
+        self.contents[spotKey] = content
+        self.counters['viewUpdates'] += 1
+        return True
+
+    def getStats(self):
+        return dict(self.counters)
+
+    def report(self):
+        c = self.counters
+        return 'refreshes: %s (%s skipped), masters: %s hits/%s recomputes, mutator: %s hits/%s recomputes, cells: %s hits/%s recomputes, views: %s updates/%s skips' % (
+            c['refreshes'], c['skippedRefreshes'], c['masterHits'], c['masterRecomputes'], c['mutatorHits'], c['mutatorRecomputes'], c['cellHits'], c['cellRecomputes'], c['viewUpdates'], c['viewSkips'])
+
+class Debouncer(object):
+    """
+    Coalesce bursts of calls: callback is called once, delay seconds after the last call,
+    with the last call’s arguments, from a timer thread.
+    """
+
+    def __init__(self, callback, delay=.05, timerFactory=Timer):
+        self.callback = callback
+        self.delay = delay
+        self.timerFactory = timerFactory
+        self._timer = None
+        self._lock = Lock()
+        self.calls = 0
+        self.fired = 0
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = self.timerFactory(self.delay, self._fire, args, kwargs)
+            self._timer.start()
+
+    def _fire(self, *args, **kwargs):
+        with self._lock:
+            self._timer = None
+            self.fired += 1
+        self.callback(*args, **kwargs)
+
+    def cancel(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+def computeInstances(mutator, locations):
+    # math instances, turned into glyphs by whoever gets them
+    return mutator.makeInstances(locations)
+
+class InstanceWorker(object):
+    """
+    Compute instances in a background thread, one request at a time.
+
+    submit(mutator, spotKeys, locations) returns the request’s generation number;
+    a new request replaces any request still waiting. Once computed, results are passed to
+
+        publish(generation, spotKeys, instances)
+
+    from the worker thread, instances being None if the computation failed.
+    Results of requests superseded in the meantime aren’t published, and as publishing
+    usually hands results over to the UI thread, receivers should check isCurrent(generation)
+    before using them.
+    """
+
+    def __init__(self, publish, compute=computeInstances):
+        self.publish = publish
+        self.compute = compute
+        self.generation = 0
+        self.counters = dict.fromkeys(['submitted', 'computed', 'dropped', 'published'], 0)
+        self._request = None
+        self._condition = Condition()
+        self._thread = None
+        self._stopped = False
+
+    def submit(self, mutator, spotKeys, locations):
+        with self._condition:
+            self.generation += 1
+            self.counters['submitted'] += 1
+            if self._request is not None:
+                self.counters['dropped'] += 1
+            self._request = self.generation, mutator, spotKeys, locations
+            if self._thread is None:
+                self._thread = Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify()
+            return self.generation
+
+    def isCurrent(self, generation):
+        return generation == self.generation
+
+    def invalidate(self):
+        """
+        Make results still to come stale, return the new generation number.
+        """
+        with self._condition:
+            self.generation += 1
+            if self._request is not None:
+                self._request = None
+                self.counters['dropped'] += 1
+            return self.generation
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._request is None and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                generation, mutator, spotKeys, locations = self._request
+                self._request = None
+            try:
+                instances = self.compute(mutator, locations)
+            except:
+                instances = None
+            with self._condition:
+                self.counters['computed'] += 1
+                if not self.isCurrent(generation):
+                    self.counters['dropped'] += 1
+                    continue
+                self.counters['published'] += 1
+            self.publish(generation, spotKeys, instances)
+
+    def stop(self, timeout=1):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
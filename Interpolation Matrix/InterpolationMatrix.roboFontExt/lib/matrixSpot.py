@@ -1,21 +1,84 @@
 from __future__ import division
+import re
+
+# columns are keyed by letters, a to z, then aa, ab... as spreadsheet columns
 
 def getValueForKey(ch):
-    try: return 'abcdefghijklmnopqrstuvwxyz'.index(ch)
+    try:
+        value = 0
+        for c in ch:
+            value = value*26 + 'abcdefghijklmnopqrstuvwxyz'.index(c) + 1
+        return value - 1 if value else None
     except: return
 
 def getKeyForValue(i):
-    try: return 'abcdefghijklmnopqrstuvwxyz'[i]
-    except: return
+    if not isinstance(i, (int, long)) or i < 0:
+        return
+    ch = ''
+    i += 1
+    while i:
+        i, r = divmod(i-1, 26)
+        ch = 'abcdefghijklmnopqrstuvwxyz'[r] + ch
+    return ch
 
 def splitSpotKey(spotKey):
     try:
-        ch = spotKey[0]
-        j = int(spotKey[1:])
+        s = re.match('([a-zA-Z]+)(.+)$', spotKey)
+        ch = s.group(1)
+        j = int(s.group(2))
         return ch, j
     except:
         return None
 
+def parseSpot(spotName, axesGrid):
+    # a letter for a column, a number for a line, or both for a single spot: 'c', '3', 'c3'
+    nCellsOnHorizontalAxis, nCellsOnVerticalAxis = axesGrid
+    s = re.search('([a-zA-Z]+(?![a-zA-Z0-9]))|([a-zA-Z]+[0-9][0-9]?)|([0-9][0-9]?)', spotName)
+    if s:
+        letterOnly = s.group(1)
+        letterNumber = s.group(2)
+        numberOnly = s.group(3)
+
+        if numberOnly is not None:
+            lineNumber = int(numberOnly) - 1
+            if lineNumber < nCellsOnVerticalAxis:
+                return [(i, lineNumber) for i in range(nCellsOnHorizontalAxis)]
+
+        elif letterOnly is not None:
+            columnNumber = getValueForKey(letterOnly.lower())
+            if columnNumber is not None and columnNumber < nCellsOnHorizontalAxis:
+                return [(columnNumber, j) for j in range(nCellsOnVerticalAxis)]
+
+        elif letterNumber is not None:
+            letter = re.match('[a-zA-Z]+', letterNumber).group()
+            number = letterNumber[len(letter):]
+            columnNumber = getValueForKey(letter.lower())
+            try:
+                lineNumber = int(number) - 1
+            except:
+                return
+            if columnNumber is not None and columnNumber < nCellsOnHorizontalAxis and lineNumber < nCellsOnVerticalAxis:
+                return [(columnNumber, lineNumber)]
+    return
+
+def parseSpotsList(inputSpots, axesGrid, masterSpots):
+    # comma separated spot names, or * for every spot that is not a master
+    nCellsOnHorizontalAxis, nCellsOnVerticalAxis = axesGrid
+    inputSpots = inputSpots.split(',')
+    spotsToGenerate = []
+
+    if inputSpots[0] == '':
+        return
+    elif inputSpots[0] == '*':
+        return [(i, j) for i in range(nCellsOnHorizontalAxis) for j in range(nCellsOnVerticalAxis) if (i,j) not in masterSpots]
+    else:
+        for item in inputSpots:
+            parsedSpot = parseSpot(item, axesGrid)
+            if parsedSpot is not None:
+                parsedSpot = list(set(parsedSpot) - set(masterSpots))
+                spotsToGenerate += parsedSpot
+        return spotsToGenerate
+
 from baseParameter import SingleValueParameter
 
 class baseMatrixSpot(object):
@@ -158,8 +221,12 @@ class MatrixSpot(baseMatrixSpot):
         for i, name in enumerate(['x', 'y']):
             value = weights[i]
             one, value = self._normalize(name, value)
+            limits = value-one, value+one
             weight = getattr(self, '%sWeight'%(name))
-            weight.setLimits((value-one, value+one))
+            # weight reallocations mostly set the weights a spot already has
+            if weight.limits == limits and weight.value == weight._constrainValue(value):
+                continue
+            weight.setLimits(limits)
             weight.set(value)
 
     def getWeights(self):
@@ -9,6 +9,8 @@ from mojo.glyphPreview import GlyphPreview
 from mojo.events import addObserver, removeObserver
 from AppKit import NSColor
 from math import cos, sin, pi
+# previewMatrixSolver.py has to sit next to this script
+from previewMatrixSolver import PreviewMatrixSolver
 
 def errorGlyph():
     glyph = RGlyph()
@@ -96,7 +98,7 @@ class interpolationMatrixController(object):
         self.w.matrixModel = Group((15, 265, 270, 270))
         self.w.matrixView = Group((300, 0, 0, -0))
         self.master_matrix = []
-        self.instance_matrix = []
+        self.solver = PreviewMatrixSolver()
         self.ipf = .5
         self.xpf = 1
         x, y, wi, he = self.w.getPosSize()
@@ -104,7 +106,6 @@ class interpolationMatrixController(object):
         he /= 3
         for i, k in enumerate(['a','b','c']):
             self.master_matrix.append([])
-            self.instance_matrix.append([])
             for j, l in enumerate(['a','b','c']):
                 setattr(self.w.matrixView, 'back'+k+l, Box((wi*i, he*j, wi, he)))
                 setattr(self.w.matrixView, k+l, GlyphPreview((wi*i, he*j, wi, he)))
@@ -117,7 +118,6 @@ class interpolationMatrixController(object):
                 spotButton.getNSButton().setBordered_(False)
                 resetpot.getNSButton().setBezelStyle_(7)
                 self.master_matrix[i].append([k+l, None])
-                self.instance_matrix[i].append([k+l, None])
         self.w.interpolation = Group((10, 565, 280, 50))
         self.w.interpolation.start = TextBox((7, 2, 20, 12), '0', sizeStyle='mini')
         self.w.interpolation.end = TextBox((-20, 2, 20, 12), '1', sizeStyle='mini')
@@ -146,10 +146,17 @@ class interpolationMatrixController(object):
         self.w.fontList.update()
         
     def updateInstances(self):
-        for i, k in enumerate(['a','b','c']):
-            for j, l in enumerate(['a','b','c']):
-                if self.master_matrix[i][j][1] is None:
-                    self.makeInstance(i,j,k,l)
+        # every cell that isn't a master is made in one pass, as a combination of masters
+        masters = dict([((i, j), spot[1]) for i, line in enumerate(self.master_matrix) for j, spot in enumerate(line) if spot[1] is not None])
+        self.solver.setMasters(masters)
+        for (i, j), instanceOutline in self.solver.makeInstances(self.ipf, self.xpf).items():
+            k, l = ['a','b','c'][i], ['a','b','c'][j]
+            instance = RGlyph()
+            if instanceOutline is not None:
+                instanceOutline.extractGlyph(instance)
+            matrixView = getattr(self.w.matrixView, k+l)
+            matrixView.show(True)
+            matrixView.setGlyph(instance)
                         
     def updateMasters(self, notification=None):
         for i, line in enumerate(self.master_matrix):
@@ -201,9 +208,7 @@ class interpolationMatrixController(object):
                     matrixButton.getNSButton().setBordered_(False)
 
     def clearInstanceMatrix(self):
-        for i, k in enumerate(['a','b','c']):
-            for j, l in enumerate(['a','b','c']):
-                self.instance_matrix[i][j][1] = None
+        self.solver.reset()
                        
     def setMaster(self, key):
         i, j, k, l = key
@@ -233,14 +238,13 @@ class interpolationMatrixController(object):
             matrixView.show(True)
             matrixView.setGlyph(glyph)
             self.master_matrix[i][j][1] = glyph
-            self.instance_matrix[i][j][1] = glyph
             familyName = selectedFont.info.familyName
             styleName = selectedFont.info.styleName
             spotButton.setTitle('\n'.join([familyName,styleName]))
                         
         elif selectedFont is None:
             self.master_matrix[i][j][1] = None
-            self.instance_matrix[i][j][1] = None
+            self.solver.clearSpot((i, j))
             spotButton.setTitle('')
             
         self.newFont = []
@@ -257,112 +261,12 @@ class interpolationMatrixController(object):
                 self.w.fontList.select(selectedFont)
         return selectedFont
             
-    def makeInstance(self, i, j, k, l, instancesAsMasters=False):
-        instance = RGlyph()
-        previousInstance = None
-        matrixView = getattr(self.w.matrixView, k+l)
-        matrix = self.master_matrix
-
-        if instancesAsMasters:
-            matrix = self.instance_matrix
-        
-        prevHspot = matrix[i][(j-1)%3][1]
-        nextHspot = matrix[i][(j+1)%3][1]
-        prevVspot = matrix[(i-1)%3][j][1]
-        nextVspot = matrix[(i+1)%3][j][1]
-        
-        # look for masters in one direction
-        if (prevHspot is not None) and (nextHspot is not None):
-            
-            master1 = prevHspot
-            master2 = nextHspot
-            
-            instance = self.linearInterpolation(j, master1, master2)
-          
-        # look for masters in second direction      
-        if (prevVspot is not None) and (nextVspot is not None):
-            
-            master1 = prevVspot
-            master2 = nextVspot
-            if instance.isEmpty() == False: previousInstance = instance
-            
-            instance = self.linearInterpolation(i, master1, master2, previousInstance)
-
-        # if no masters in line found
-        #if instance.isEmpty():
-
-        corner_1 = matrix[(i-1)%3][(j-1)%3][1]
-        corner_2 = matrix[(i-1)%3][(j+1)%3][1]
-        corner_3 = matrix[(i+1)%3][(j+1)%3][1]
-        corner_4 = matrix[(i+1)%3][(j-1)%3][1]
-
-        if (prevHspot is not None) and (prevVspot is not None) and (corner_1 is not None):
-            if instance.isEmpty() == False: previousInstance = instance
-            instance = self.triangularInterpolation(prevHspot, prevVspot, corner_1, previousInstance)
-
-        elif (nextHspot is not None) and (prevVspot is not None) and (corner_2 is not None):
-            if instance.isEmpty() == False: previousInstance = instance
-            instance = self.triangularInterpolation(nextHspot, prevVspot, corner_2, previousInstance)
-
-        elif (nextHspot is not None) and (nextVspot is not None) and (corner_3 is not None):
-            if instance.isEmpty() == False: previousInstance = instance
-            instance = self.triangularInterpolation(nextHspot, nextVspot, corner_3, previousInstance)
-
-        elif (nextHspot is not None) and (prevVspot is not None) and (corner_4 is not None):
-            if instance.isEmpty() == False: previousInstance = instance
-            instance = self.triangularInterpolation(nextHspot, prevVspot, corner_4, previousInstance)
-
-        if instance.isEmpty() and not instancesAsMasters:
-            self.makeInstance(i,j,k,l, True)
-            return
-        
-        matrixView.show(True)
-        matrixView.setGlyph(instance)
-        self.instance_matrix[i][j][1] = instance
-
-    def linearInterpolation(self, i, master1, master2, previousInstance=None):
-
-        instance = RGlyph()
-        ipf = self.ipf
-        xpf = self.xpf
-
-        if ((i-1)%3 < i) and ((i+1)%3 < i):
-            instance.interpolate(-xpf, master1, master2)
-        elif ((i-1)%3 > i) and ((i+1)%3 > i):
-            instance.interpolate(1+xpf, master1, master2)
-            
-        elif ((((i-1)%3 < i) and ((i+1)%3 > i)) or (((i-1)%3 > i) and (i+1)%3 < i)):
-            instance.interpolate(ipf, master1, master2)
-
-        if previousInstance is not None:
-            instance.interpolate(ipf, instance, previousInstance)
-
-        # if instance.isEmpty():
-        #     instance = errorGlyph()
-        return instance
-
-    def triangularInterpolation(self, master1, master2, master3, previousInstance=None):
-
-        ipf = self.ipf
-        xpf = self.xpf
-
-        instance = RGlyph()
-        midInstance = RGlyph()
-        midInstance.interpolate(ipf, master1, master2)
-        instance.interpolate(1+xpf, master3, midInstance)
-
-        if previousInstance is not None:
-            instance.interpolate(ipf, instance, previousInstance)
-        
-        # if instance.isEmpty():
-        #     instance = errorGlyph()
-        return instance
-
     def sliderInput(self, sender):
         mode = sender.name
         value = sender.get()
         setattr(self, mode, value)
-        self.updateMasters()
+        # masters are unchanged, their outlines kept by the solver are only combined again
+        self.updateInstances()
 
     def resetMatrix(self, sender):
         self.clearMatrix()
@@ -370,17 +274,15 @@ class interpolationMatrixController(object):
     def clearMatrix(self, keepMasters=False):
         saveMasters = list(self.master_matrix)
         self.master_matrix = []
-        self.instance_matrix = []
+        self.solver.reset()
         for i, k in enumerate(['a','b','c']):
             self.master_matrix.append([])
-            self.instance_matrix.append([])
             for j, l in enumerate(['a','b','c']):
                 if keepMasters and (saveMasters[i][j][1] is not None):
                     master = saveMasters[i][j][1]
                     self.master_matrix[i].append([k+l, master])
                 else:
                     self.master_matrix[i].append([k+l, None])
-                self.instance_matrix[i].append([k+l, None])
                 glyphCell = getattr(self.w.matrixView, k+l)
                 glyphCell.setGlyph(None)
                 spot = getattr(self.w.matrixModel, k+l)
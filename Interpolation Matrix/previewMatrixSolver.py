@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+
+'''
+Preview matrix solver
+Closed form instances of the 3x3 interpolation preview matrix (interpolation-preview-matrix.py),
+independent from Robofont.
+
+Cells of the preview are chains of glyph interpolations, min + (max - min) * factor,
+between masters and intermediate glyphs. Every step being affine, an instance is a linear
+combination of masters: the chain is run once on weights, {(i, j): weight} of masters at
+column i & line j, and each instance is then made in a single pass over its masters’ outlines.
+
+Masters are kept as coordinate rows (numpy arrays when numpy is available) for as long as their
+glyph is unchanged: moving the preview’s factors only combines rows again.
+
+An empty weights dict stands for an empty glyph, what the chain makes when a cell has no
+neighbours to interpolate from; interpolating from an empty glyph gives an empty glyph.
+'''
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def interpolateWeights(factor, minWeights, maxWeights):
+    """
+    Weights of minGlyph + (maxGlyph - minGlyph) * factor, as RGlyph.interpolate() makes it.
+
+    >>> sorted(interpolateWeights(.5, {(0, 0): 1.}, {(0, 2): 1.}).items())
+    [((0, 0), 0.5), ((0, 2), 0.5)]
+    >>> interpolateWeights(.5, {}, {(0, 2): 1.})
+    {}
+    """
+    if not minWeights or not maxWeights:
+        return {}
+    weights = {}
+    for key, weight in minWeights.items():
+        weights[key] = weights.get(key, 0) + weight * (1 - factor)
+    for key, weight in maxWeights.items():
+        weights[key] = weights.get(key, 0) + weight * factor
+    return weights
+
+def linearWeights(index, master1, master2, ipf, xpf, previousInstance=None):
+    # inter/extrapolation on a line or column, from the two other spots of that line/column
+    instance = {}
+    if ((index-1)%3 < index) and ((index+1)%3 < index):
+        instance = interpolateWeights(-xpf, master1, master2)
+    elif ((index-1)%3 > index) and ((index+1)%3 > index):
+        instance = interpolateWeights(1+xpf, master1, master2)
+    elif ((((index-1)%3 < index) and ((index+1)%3 > index)) or (((index-1)%3 > index) and (index+1)%3 < index)):
+        instance = interpolateWeights(ipf, master1, master2)
+    if previousInstance is not None:
+        instance = interpolateWeights(ipf, instance, previousInstance)
+    return instance
+
+def triangularWeights(master1, master2, master3, ipf, xpf, previousInstance=None):
+    # extrapolation from a corner through the middle of its two neighbours
+    midInstance = interpolateWeights(ipf, master1, master2)
+    instance = interpolateWeights(1+xpf, master3, midInstance)
+    if previousInstance is not None:
+        instance = interpolateWeights(ipf, instance, previousInstance)
+    return instance
+
+def solveCellWeights(matrix, i, j, ipf, xpf):
+    """
+    Return the weights of cell (i, j) from the weights of other cells, matrix[i][j], None for cells without glyph.
+    Follows the interpolations of the preview matrix, in the same order.
+
+    >>> matrix = [[None]*3 for i in range(3)]
+    >>> matrix[0][0], matrix[0][2] = {(0, 0): 1.}, {(0, 2): 1.}
+    >>> sorted(solveCellWeights(matrix, 0, 1, .5, 1).items())
+    [((0, 0), 0.5), ((0, 2), 0.5)]
+    >>> solveCellWeights(matrix, 2, 2, .5, 1)
+    {}
+    """
+    instance = {}
+    previousInstance = None
+
+    prevHspot = matrix[i][(j-1)%3]
+    nextHspot = matrix[i][(j+1)%3]
+    prevVspot = matrix[(i-1)%3][j]
+    nextVspot = matrix[(i+1)%3][j]
+
+    if (prevHspot is not None) and (nextHspot is not None):
+        instance = linearWeights(j, prevHspot, nextHspot, ipf, xpf)
+
+    if (prevVspot is not None) and (nextVspot is not None):
+        if instance: previousInstance = instance
+        instance = linearWeights(i, prevVspot, nextVspot, ipf, xpf, previousInstance)
+
+    corner_1 = matrix[(i-1)%3][(j-1)%3]
+    corner_2 = matrix[(i-1)%3][(j+1)%3]
+    corner_3 = matrix[(i+1)%3][(j+1)%3]
+    corner_4 = matrix[(i+1)%3][(j-1)%3]
+
+    if (prevHspot is not None) and (prevVspot is not None) and (corner_1 is not None):
+        if instance: previousInstance = instance
+        instance = triangularWeights(prevHspot, prevVspot, corner_1, ipf, xpf, previousInstance)
+
+    elif (nextHspot is not None) and (prevVspot is not None) and (corner_2 is not None):
+        if instance: previousInstance = instance
+        instance = triangularWeights(nextHspot, prevVspot, corner_2, ipf, xpf, previousInstance)
+
+    elif (nextHspot is not None) and (nextVspot is not None) and (corner_3 is not None):
+        if instance: previousInstance = instance
+        instance = triangularWeights(nextHspot, nextVspot, corner_3, ipf, xpf, previousInstance)
+
+    elif (nextHspot is not None) and (prevVspot is not None) and (corner_4 is not None):
+        if instance: previousInstance = instance
+        instance = triangularWeights(nextHspot, prevVspot, corner_4, ipf, xpf, previousInstance)
+
+    return instance
+
+def solveMatrixWeights(masterSpots, instanceWeights, ipf, xpf):
+    """
+    Return {(i, j): weights} of every cell that isn't a master, masterSpots being the (i, j) of masters.
+    Cells a first pass leaves empty are solved again from instances, instanceWeights[i][j],
+    which hold weights of the previous refresh and are updated cell by cell.
+
+    >>> instanceWeights = [[None]*3 for i in range(3)]
+    >>> cells = solveMatrixWeights([(0, 0), (2, 0), (0, 2)], instanceWeights, .5, 1)
+    >>> sorted(cells[(1, 1)].items())
+    [((0, 0), 0.0), ((0, 2), 0.5), ((2, 0), 0.5)]
+    >>> sorted(cells[(2, 2)].items())
+    [((0, 0), -1.0), ((0, 2), 1.0), ((2, 0), 1.0)]
+    >>> solveMatrixWeights([(0, 0), (2, 2)], [[None]*3 for i in range(3)], .5, 1)[(1, 1)]
+    {}
+    """
+    masterWeights = [[None]*3 for i in range(3)]
+    for i, j in masterSpots:
+        masterWeights[i][j] = instanceWeights[i][j] = {(i, j): 1.}
+    cells = {}
+    for i in range(3):
+        for j in range(3):
+            if masterWeights[i][j] is None:
+                weights = solveCellWeights(masterWeights, i, j, ipf, xpf)
+                if not weights:
+                    weights = solveCellWeights(instanceWeights, i, j, ipf, xpf)
+                instanceWeights[i][j] = cells[(i, j)] = weights
+    return cells
+
+class _OutlinePen(object):
+    # point pen recording contours apart from their coordinates
+
+    def __init__(self):
+        self.contours = []
+        self.coordinates = []
+
+    def beginPath(self, identifier=None, **kwargs):
+        self.contours.append([])
+
+    def addPoint(self, pt, segmentType=None, smooth=False, name=None, identifier=None, **kwargs):
+        self.contours[-1].append((segmentType, smooth, name))
+        self.coordinates.append(pt)
+
+    def endPath(self):
+        pass
+
+    def addComponent(self, baseGlyphName, transformation, identifier=None, **kwargs):
+        pass
+
+def _anchorValues(anchor):
+    if isinstance(anchor, dict):
+        return anchor.get('name'), anchor['x'], anchor['y']
+    return anchor.name, anchor.x, anchor.y
+
+def _appendAnchor(glyph, name, x, y):
+    # RoboFab style glyphs take (name, position), defcon glyphs take a dict
+    try:
+        glyph.appendAnchor(name, (x, y))
+    except TypeError:
+        glyph.appendAnchor(dict(name=name, x=x, y=y))
+
+class GlyphOutline(object):
+    """
+    A glyph as coordinate rows, (width, 0), points of contours and anchors, apart from its structure,
+    which has to match for glyphs to interpolate: point types of contours and anchor names.
+    """
+
+    def __init__(self, glyph):
+        pen = _OutlinePen()
+        glyph.drawPoints(pen)
+        anchors = [_anchorValues(anchor) for anchor in glyph.anchors]
+        self.contours = [tuple(contour) for contour in pen.contours]
+        self.anchorNames = tuple([name for name, x, y in anchors])
+        self.structure = tuple([tuple([segmentType for segmentType, smooth, name in contour]) for contour in self.contours]), self.anchorNames
+        rows = [(glyph.width, 0)] + list(pen.coordinates) + [(x, y) for name, x, y in anchors]
+        if numpy is not None:
+            self.rows = numpy.array(rows, dtype=numpy.float64)
+        elif numpy is None:
+            self.rows = [(float(x), float(y)) for x, y in rows]
+
+    def extractGlyph(self, rows, glyph):
+        """
+        Draw rows, laid out as this outline’s, into glyph and return it.
+        """
+        glyph.width = rows[0][0]
+        pointPen = glyph.getPointPen()
+        index = 1
+        for contour in self.contours:
+            pointPen.beginPath()
+            for segmentType, smooth, name in contour:
+                x, y = rows[index]
+                pointPen.addPoint((x, y), segmentType, smooth, name)
+                index += 1
+            pointPen.endPath()
+        for name in self.anchorNames:
+            x, y = rows[index]
+            _appendAnchor(glyph, name, x, y)
+            index += 1
+        return glyph
+
+def glyphStructure(glyph):
+    """
+    Return what has to match for glyphs to interpolate: point types of contours, anchor names.
+    """
+    pen = _OutlinePen()
+    glyph.drawPoints(pen)
+    contours = tuple([tuple([segmentType for segmentType, smooth, name in contour]) for contour in pen.contours])
+    return contours, tuple([_anchorValues(anchor)[0] for anchor in glyph.anchors])
+
+def combineRows(weightedRows):
+    """
+    Return the sum of rows * weight for (rows, weight) in weightedRows, rows being of the same length.
+
+    >>> [tuple(row) for row in combineRows([([(0., 0.), (100., 10.)], .25), ([(400., 0.), (200., 30.)], .75)])]
+    [(300.0, 0.0), (175.0, 25.0)]
+    """
+    if numpy is not None:
+        return sum([numpy.asarray(rows) * weight for rows, weight in weightedRows])
+    combined = None
+    for rows, weight in weightedRows:
+        if combined is None:
+            combined = [(x * weight, y * weight) for x, y in rows]
+        elif combined is not None:
+            combined = [(cx + x * weight, cy + y * weight) for (cx, cy), (x, y) in zip(combined, rows)]
+    return combined
+
+class InstanceOutline(object):
+    """
+    Instance of the preview matrix: combined rows and the outline they’re laid out as.
+    """
+
+    def __init__(self, outline, rows):
+        self.outline = outline
+        self.rows = rows
+
+    def extractGlyph(self, glyph):
+        return self.outline.extractGlyph(self.rows, glyph)
+
+class PreviewMatrixSolver(object):
+    """
+    Instances of the preview matrix from masters {(i, j): glyph}.
+    Masters are turned into coordinate rows when their glyph changes, so that changing factors
+    only combines rows again. Cells whose masters aren’t compatible have no instance (None),
+    as the interpolation chain gives empty glyphs for those.
+    """
+
+    def __init__(self):
+        self.instanceWeights = [[None]*3 for i in range(3)]
+        self.masters = {}
+        self.counters = dict.fromkeys(['conversions', 'reuses'], 0)
+
+    def setMasters(self, masters):
+        """
+        Set masters {(i, j): glyph}, glyphs already set as the same object aren’t converted again.
+        """
+        outlines = {}
+        for key, glyph in masters.items():
+            master = self.masters.get(key)
+            if master is not None and master[0] is glyph:
+                self.counters['reuses'] += 1
+            elif master is None or master[0] is not glyph:
+                self.counters['conversions'] += 1
+                master = glyph, GlyphOutline(glyph)
+            outlines[key] = master
+        self.masters = outlines
+
+    def reset(self):
+        """
+        Forget instances of previous refreshes, as when the preview’s instances are cleared.
+        """
+        self.instanceWeights = [[None]*3 for i in range(3)]
+
+    def clearSpot(self, (i, j)):
+        self.instanceWeights[i][j] = None
+
+    def solve(self, ipf, xpf):
+        """
+        Return {(i, j): weights} of cells that aren’t masters.
+        """
+        return solveMatrixWeights(self.masters.keys(), self.instanceWeights, ipf, xpf)
+
+    def makeInstance(self, weights):
+        # instances of previous refreshes can refer to masters since removed
+        if not weights or not all([key in self.masters for key in weights]):
+            return None
+        outlines = [self.masters[key][1] for key in sorted(weights)]
+        if len(set([outline.structure for outline in outlines])) != 1:
+            return None
+        return InstanceOutline(outlines[0], combineRows([(outline.rows, weights[key]) for key, outline in zip(sorted(weights), outlines)]))
+
+    def makeInstances(self, ipf, xpf):
+        """
+        Return {(i, j): InstanceOutline or None} of cells that aren’t masters.
+        """
+        return dict([(spot, self.makeInstance(weights)) for spot, weights in self.solve(ipf, xpf).items()])
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,664 @@
+# -*- coding: utf-8 -*-
+
+'''
+Interpolation Matrix benchmarks
+Headless timings for the interpolation hot paths, run with: python benchmark.py
+Dev tool, kept out of the extension bundle: it imports the modules from the extension's lib.
+'''
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'InterpolationMatrix.roboFontExt', 'lib'))
+
+from _mutatorMath.objects.location import Location, FrozenLocation
+from _mutatorMath.objects.mutator import buildMutator, getLimits, buildLimitsIndex, getIndexedLimits
+from glyphArrays import FlatGlyph, makeMathGlyph
+from familyGenerator import FamilyGenerator
+from compatibility import CompatibilityAnalyzer, glyphSignature, describeDifferences
+from defcon.objects.font import Font
+from defcon.objects.glyph import Glyph
+from fontMath.mathGlyph import MathGlyph
+from fontMath.mathKerning import MathKerning
+from fontMath.mathInfo import MathInfo
+from batchInterpolation import KerningInterpolator, InfoInterpolator
+from matrixFile import allocateWeights, formatMatrixFile, formatMatrixDocument, parseMatrixDocument, getDocumentInstance, glyphDataFingerprint
+from matrixLayout import MatrixLayout, SpotStore
+from fontRegistry import FontRegistry
+from matrixPreview import PreviewTracker, InstanceCache, glyphFingerprint
+from matrixSpot import MatrixSpot, getKeyForValue
+from time import time
+from multiprocessing import cpu_count, Process, Queue
+import random
+import resource
+import shutil
+import tempfile
+
+# the 3x3 preview matrix is a standalone script, its solver sits next to it
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+def gridLocations(nCellsOnHorizontalAxis=15, nCellsOnVerticalAxis=15):
+    return [Location(horizontal=(i+1)*100, vertical=(j+1)*100) for i in range(nCellsOnHorizontalAxis) for j in range(nCellsOnVerticalAxis)]
+
+def gridMasters(masterSpots, value=lambda i, j: float(i*10+j)):
+    return [(Location(horizontal=(i+1)*100, vertical=(j+1)*100), value(i, j)) for i, j in masterSpots]
+
+def syntheticGlyph(seed, contours=3, points=24, name='a'):
+    r = random.Random(seed)
+    glyph = Glyph()
+    glyph.name = name
+    glyph.width = 400 + r.randint(0, 300)
+    pen = glyph.getPointPen()
+    for c in range(contours):
+        pen.beginPath()
+        for p in range(points):
+            segmentType = 'curve' if p%3 == 0 else None
+            pen.addPoint((r.randint(0, 700), r.randint(-200, 800)), segmentType)
+        pen.endPath()
+    glyph.appendAnchor(dict(name='top', x=r.randint(0, 700), y=700))
+    return glyph
+
+def latinGlyphSet(seed, count=600):
+    # glyph set of roughly the size and complexity of an extended latin font,
+    # contours and point counts are the same for every seed so that sets are compatible
+    r = random.Random(0)
+    glyphs = []
+    for i in range(count):
+        contours = r.randint(1, 4)
+        points = r.randint(4, 40)
+        glyphs.append(syntheticGlyph(seed*count+i, contours, points, 'glyph%s' % (i)))
+    return glyphs
+
+def deepSize(obj, seen=None):
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum([deepSize(key, seen)+deepSize(value, seen) for key, value in obj.items()])
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum([deepSize(item, seen) for item in obj])
+    elif hasattr(obj, '__dict__'):
+        size += deepSize(obj.__dict__, seen)
+    elif hasattr(obj, '__slots__'):
+        size += sum([deepSize(getattr(obj, name), seen) for name in obj.__slots__ if hasattr(obj, name)])
+    return size
+
+def timeIt(function, repeat=5):
+    best = None
+    for r in range(repeat):
+        start = time()
+        function()
+        elapsed = time()-start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best*1000
+
+def timeInstances(mutator, locations, repeat=5):
+    best = None
+    for r in range(repeat):
+        start = time()
+        for location in locations:
+            mutator.makeInstance(Location(location))
+        elapsed = time()-start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best*1000/len(locations)
+
+def benchmarkCompiledMutator():
+    locations = gridLocations()
+    for masterSpots in [
+        [(0, 0), (14, 0), (0, 14)],
+        [(0, 0), (14, 0), (0, 14), (14, 14)],
+        [(0, 0), (7, 0), (14, 0), (0, 7), (7, 7), (14, 7), (0, 14), (7, 14), (14, 14)],
+        ]:
+        # cached mutators come compiled
+        bias, mutator = buildMutator(gridMasters(masterSpots), useCache=False)
+        assert not mutator.isCompiled()
+        before = timeInstances(mutator, locations)
+        mutator.compile()
+        after = timeInstances(mutator, locations)
+        print('compiled mutator, 15x15 grid, %s masters: %0.4fms -> %0.4fms per instance (x%0.1f)' % (len(masterSpots), before, after, before/after))
+
+def benchmarkBatchInstances():
+    locations = gridLocations()
+    masterSpots = [(0, 0), (14, 0), (0, 14), (14, 14)]
+    glyphs = gridMasters(masterSpots, lambda i, j: syntheticGlyph(i*15+j))
+    # math objects only, turning instances into glyphs is timed apart
+    bias, mutator = buildMutator([(location, MathGlyph(glyph)) for location, glyph in glyphs])
+    mutator.compile()
+    mathGlyphSerial = timeIt(lambda: [mutator.makeInstance(location) for location in locations])
+    bias, mutator = buildMutator([(location, FlatGlyph(glyph)) for location, glyph in glyphs])
+    mutator.compile()
+    serial = timeIt(lambda: [mutator.makeInstance(location) for location in locations])
+    batch = timeIt(lambda: mutator.makeInstances(locations))
+    instances = mutator.makeInstances(locations)
+    extraction = timeIt(lambda: [instance.extractGlyph(Glyph()) for instance in instances])
+    print('batch instances, 15x15 grid, 72 points: makeInstance MathGlyph %0.1fms, FlatGlyph %0.1fms -> makeInstances %0.1fms per grid (x%0.1f), extracting glyphs %0.1fms' % (mathGlyphSerial, serial, batch, serial/batch, extraction))
+
+def benchmarkFlatGlyph():
+    masterLocations = [Location(weight=100), Location(weight=900), Location(width=100), Location(weight=900, width=100)]
+    glyphSets = [latinGlyphSet(seed) for seed in range(len(masterLocations))]
+    instanceLocation = Location(weight=400, width=50)
+    for mathGlyph in [MathGlyph, FlatGlyph]:
+        masters = [[mathGlyph(glyph) for glyph in glyphSet] for glyphSet in glyphSets]
+        size = deepSize(masters)
+        def interpolate():
+            for i in range(len(glyphSets[0])):
+                bias, mutator = buildMutator([(location, glyphs[i]) for location, glyphs in zip(masterLocations, masters)])
+                mutator.makeInstance(Location(instanceLocation))
+        print('%s, %s glyphs x %s masters: %0.0fkb, interpolated in %0.1fms' % (mathGlyph.__name__, len(glyphSets[0]), len(masters), size/1024., timeIt(interpolate, 3)))
+
+def benchmarkMutatorCache():
+    masterLocations = [Location(weight=100), Location(weight=900), Location(width=100), Location(weight=900, width=100), Location(weight=500, width=50)]
+    glyphSets = [latinGlyphSet(seed) for seed in range(len(masterLocations))]
+    masters = [[FlatGlyph(glyph) for glyph in glyphSet] for glyphSet in glyphSets]
+    instanceLocation = Location(weight=400, width=50)
+    times = []
+    for useCache in [False, True]:
+        def interpolate():
+            for i in range(len(glyphSets[0])):
+                bias, mutator = buildMutator([(location, glyphs[i]) for location, glyphs in zip(masterLocations, masters)], useCache)
+                mutator.makeInstance(Location(instanceLocation))
+        times.append(timeIt(interpolate, 3))
+    print('cached mutator topology, %s glyphs x %s masters: %0.1fms -> %0.1fms (x%0.1f)' % (len(glyphSets[0]), len(masters), times[0], times[1], times[0]/times[1]))
+
+def benchmarkLocations(repeat=20000):
+    for locationClass in [Location, FrozenLocation]:
+        a = locationClass(horizontal=300, vertical=200, weight=0)
+        b = locationClass(horizontal=100, vertical=100)
+        results = []
+        for name, operation in [
+            ('__add__', lambda: a + b),
+            ('__sub__', lambda: a - b),
+            ('isOnAxis', lambda: a.isOnAxis()),
+            ('asTuple', lambda: a.asTuple()),
+            ]:
+            results.append('%s %0.2fus' % (name, timeIt(lambda: [operation() for i in range(repeat)])*1000/repeat))
+        print('%s: %s' % (locationClass.__name__, ', '.join(results)))
+
+def benchmarkLimits():
+    r = random.Random(0)
+    grid = [(i, j) for i in range(25) for j in range(25)]
+    locations = gridLocations(8, 8)
+    for count in [2, 10, 50, 100, 200, 400]:
+        masterSpots = [(0, 0)] + r.sample(grid[1:], count-1)
+        masters = gridMasters(masterSpots)
+        masterLocations = [location for location, value in masters]
+        index = buildLimitsIndex(masterLocations)
+        scanned = timeIt(lambda: [getLimits(masterLocations, location) for location in locations], 3)/len(locations)
+        indexed = timeIt(lambda: [getIndexedLimits(index, location) for location in locations], 3)/len(locations)
+        print('limits, %s masters: %0.3fms -> %0.3fms per instance (x%0.1f)' % (count, scanned, indexed, scanned/indexed))
+
+def syntheticFont(seed, count=600):
+    font = Font()
+    font.info.familyName = 'Benchmark'
+    font.info.unitsPerEm = 1000
+    font.info.xHeight = 400 + seed*50
+    for glyph in latinGlyphSet(seed, count):
+        font.insertGlyph(glyph, glyph.name)
+    font.kerning.update(dict([(('glyph%s' % (i), 'glyph%s' % (i+1)), -10*seed-i%20) for i in range(count-1)]))
+    return font
+
+def benchmarkFamilyGenerator(spotCount=8):
+    masters = [(Location(horizontal=100, vertical=100), syntheticFont(0)), (Location(horizontal=1500, vertical=100), syntheticFont(1)),
+               (Location(horizontal=100, vertical=1500), syntheticFont(2)), (Location(horizontal=1500, vertical=1500), syntheticFont(3))]
+    instances = [('S%s' % (i), Location(horizontal=100+i*150, vertical=1500-i*150)) for i in range(spotCount)]
+    times = []
+    for processes in [1, cpu_count()]:
+        folderPath = tempfile.mkdtemp()
+        try:
+            generator = FamilyGenerator(masters, processes=processes)
+            start = time()
+            generator.generate(instances, Font, folderPath)
+            times.append((time()-start)*1000)
+        finally:
+            shutil.rmtree(folderPath)
+    print('family generator, %s fonts x %s glyphs: serial %0.0fms -> %s processes %0.0fms (x%0.1f)' % (spotCount, len(masters[0][1]), times[0], cpu_count(), times[1], times[0]/times[1]))
+
+def pairwiseCompatibilityReport(fonts):
+    # the former report: each glyph checked against the first master pair by pair,
+    # reports deduplicated with a list
+    glyphList = sorted(set.intersection(*[set(font.keys()) for font in fonts]))
+    interpolationReports = []
+    for glyphName in glyphList:
+        for font in fonts[1:]:
+            firstSignature, secondSignature = glyphSignature(fonts[0][glyphName]), glyphSignature(font[glyphName])
+            if firstSignature != secondSignature:
+                reportID = (glyphName, tuple(describeDifferences(firstSignature, secondSignature)))
+                if reportID not in interpolationReports:
+                    interpolationReports.append(reportID)
+    return interpolationReports
+
+def benchmarkCompatibility(glyphCount=2000, masterCount=4):
+    fonts = [syntheticFont(seed, glyphCount) for seed in range(masterCount)]
+    r = random.Random(1)
+    for font in fonts[1:]:
+        for glyphName in r.sample(font.keys(), glyphCount//10):
+            glyph = font[glyphName]
+            glyph.removeContour(glyph[0])
+    pairwise = timeIt(lambda: pairwiseCompatibilityReport(fonts), 1)
+    bySignature = timeIt(lambda: CompatibilityAnalyzer(fonts).analyze(), 1)
+    report = CompatibilityAnalyzer(fonts).analyze()
+    print('compatibility report, %s glyphs x %s masters, %s incompatible: %0.0fms -> %0.0fms (x%0.1f)' % (glyphCount, masterCount, len(report.incompatibleGlyphs), pairwise, bySignature, pairwise/bySignature))
+
+def benchmarkSignatureIndex(glyphCount=600, masterCount=6, editedCount=10):
+    folder = tempfile.mkdtemp()
+    cacheFolder = os.path.join(folder, 'cache')
+    try:
+        paths = []
+        for seed in range(masterCount):
+            path = os.path.join(folder, 'master%s.ufo' % (seed))
+            syntheticFont(seed, glyphCount).save(path)
+            paths.append(path)
+        analyze = lambda useIndex: CompatibilityAnalyzer(paths, useIndex=useIndex, cacheFolder=cacheFolder).analyze()
+        withoutIndex = timeIt(lambda: analyze(False), 1)
+        coldIndex = timeIt(lambda: analyze(True), 1)
+        warmIndex = timeIt(lambda: analyze(True), 1)
+        font = Font(paths[-1])
+        for glyphName in sorted(font.keys())[:editedCount]:
+            glyph = font[glyphName]
+            glyph.removeContour(glyph[0])
+        font.save()
+        analyzer = CompatibilityAnalyzer(paths, cacheFolder=cacheFolder)
+        start = time()
+        report = analyzer.analyze()
+        edited = (time()-start)*1000
+        print('compatibility report, %s glyphs x %s masters: %0.0fms without index, %0.0fms cold index, %0.0fms warm index, %0.0fms after editing %s glyphs (%s incompatible, %s)' % (glyphCount, masterCount, withoutIndex, coldIndex, warmIndex, edited, editedCount, len(report.incompatibleGlyphs), analyzer.indexReport()))
+    finally:
+        shutil.rmtree(folder)
+
+def buildInstanceInMemory(masters, styleName, location, folderPath):
+    # the former generation: every glyph interpolated into a font object, saved at the end
+    font = Font()
+    font.info.styleName = styleName
+    for glyphName in masters[0][1].keys():
+        bias, mutator = buildMutator([(masterLocation, MathGlyph(masterFont[glyphName])) for masterLocation, masterFont in masters])
+        glyph = font.newGlyph(glyphName)
+        mutator.makeInstance(location).round().extractGlyph(glyph)
+    path = os.path.join(folderPath, 'Benchmark-%s.ufo' % (styleName))
+    font.save(path)
+    return path
+
+def _measureGeneration(queue, streaming, glyphCount):
+    masters = [(Location(horizontal=100), syntheticFont(0, glyphCount)), (Location(horizontal=1500), syntheticFont(1, glyphCount))]
+    location = Location(horizontal=700)
+    folderPath = tempfile.mkdtemp()
+    try:
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if streaming:
+            FamilyGenerator(masters, processes=1).streamInstance('M', location, folderPath)
+        else:
+            buildInstanceInMemory(masters, 'M', location, folderPath)
+        queue.put(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before)
+    finally:
+        shutil.rmtree(folderPath)
+
+def benchmarkStreamingInstance(glyphCounts=(2000, 10000)):
+    # no tracemalloc in python 2: peak resident size growth (kB on linux), measured in a fresh process
+    for glyphCount in glyphCounts:
+        growths = []
+        for streaming in [False, True]:
+            queue = Queue()
+            process = Process(target=_measureGeneration, args=(queue, streaming, glyphCount))
+            process.start()
+            growths.append(queue.get())
+            process.join()
+        print('instance generation, %s glyphs, peak memory growth: in memory font %0.1fMB -> streamed %0.1fMB' % (glyphCount, growths[0]/1024., growths[1]/1024.))
+
+def syntheticKerning(seed, pairCount=20000, glyphCount=800):
+    r = random.Random(seed)
+    glyphNames = ['glyph%s' % (i) for i in range(glyphCount)]
+    kerning = {}
+    while len(kerning) < pairCount:
+        kerning[r.choice(glyphNames), r.choice(glyphNames)] = r.randint(-150, 50)
+    return kerning
+
+def benchmarkKerning(pairCount=20000, instanceCounts=(1, 8, 32)):
+    locations = [Location(horizontal=100, vertical=100), Location(horizontal=1500, vertical=100), Location(horizontal=100, vertical=1500), Location(horizontal=1500, vertical=1500)]
+    masters = [(location, syntheticKerning(seed, pairCount)) for seed, location in enumerate(locations)]
+    r = random.Random(3)
+    for instanceCount in instanceCounts:
+        instances = [Location(horizontal=r.uniform(100, 1500), vertical=r.uniform(100, 1500)) for i in range(instanceCount)]
+        def mathKerningInstances():
+            bias, mutator = buildMutator([(location, MathKerning(kerning)) for location, kerning in masters])
+            for location in instances:
+                mutator.makeInstance(location).round()
+        perInstance = timeIt(mathKerningInstances, 1)
+        batch = timeIt(lambda: KerningInterpolator(masters).makeInstances(instances), 1)
+        print('kerning, %s pairs x %s masters, %s instances: MathKerning %0.0fms -> batch %0.0fms (x%0.1f)' % (pairCount, len(masters), instanceCount, perInstance, batch, perInstance/batch))
+
+def benchmarkInfo(spotCount=225):
+    masters = [(Location(horizontal=100, vertical=100), syntheticFont(0, 1)), (Location(horizontal=1500, vertical=100), syntheticFont(1, 1)),
+               (Location(horizontal=100, vertical=1500), syntheticFont(2, 1)), (Location(horizontal=1500, vertical=1500), syntheticFont(3, 1))]
+    for seed, (location, font) in enumerate(masters):
+        info = font.info
+        info.capHeight, info.ascender, info.descender, info.italicAngle = 700+seed*10, 750, -250, 0
+        info.openTypeOS2WeightClass = 100+seed*200
+        info.postscriptBlueValues = [-15, 0, info.xHeight, info.xHeight+15, 700, 715]
+        info.postscriptStemSnapH, info.postscriptStemSnapV = [60+seed*20], [80+seed*30, 90+seed*30]
+        # defined in some masters only
+        info.postscriptSlantAngle = -12 if seed == 3 else None
+    locations = [Location(horizontal=100+i*100, vertical=100+j*100) for i in range(15) for j in range(15)][:spotCount]
+    def mathInfoInstances():
+        bias, mutator = buildMutator([(location, MathInfo(font.info)) for location, font in masters], useCache=False)
+        return [mutator.makeInstance(location).round() for location in locations]
+    perInstance = timeIt(mathInfoInstances, 1)
+    batch = timeIt(lambda: InfoInterpolator([(location, font.info) for location, font in masters]).makeInstances(locations, roundValues=True), 1)
+    same = [info.__dict__ for info in mathInfoInstances()] == [info.__dict__ for info in InfoInterpolator([(location, font.info) for location, font in masters]).makeInstances(locations, roundValues=True)]
+    print('font info, %s instances: MathInfo %0.0fms -> batch %0.0fms (x%0.1f), same output: %s' % (len(locations), perInstance, batch, perInstance/batch, same))
+
+def allocateWeightsPerCell(axesGrid, matrixSpots, masterSpots):
+    # reference: one horizontal evaluation per column, one vertical evaluation per spot
+    masterSpotKeys = ['%s%s'%(getKeyForValue(mi), mj) for mi, mj in masterSpots]
+    hb, hm = buildMutator([(Location(horizontal=mi), matrixSpots['%s%s'%(getKeyForValue(mi), mj)].getWeights()[0]) for mi, mj in masterSpots])
+    vb, vm = buildMutator([(Location(vertical=mj), matrixSpots['%s%s'%(getKeyForValue(mi), mj)].getWeights()[1]) for mi, mj in masterSpots])
+    for i in range(axesGrid[0]):
+        ch = getKeyForValue(i)
+        instanceHweight = hm.makeInstance(Location(horizontal=i))
+        for j in range(axesGrid[1]):
+            spotKey = '%s%s'%(ch, j)
+            if spotKey not in masterSpotKeys:
+                matrixSpots[spotKey].setWeights((instanceHweight, vm.makeInstance(Location(vertical=j))))
+    return matrixSpots
+
+def weightAllocationCycles(allocate, cycles=20, gridMax=15):
+    masterSpots = [(0, 0), (gridMax-1, 0), (0, gridMax-1), (gridMax-1, gridMax-1), (7, 7)]
+    matrixSpots = {}
+    for i in range(gridMax):
+        for j in range(gridMax):
+            matrixSpots['%s%s'%(getKeyForValue(i), j)] = MatrixSpot((i, j), ((i+1)*100, (j+1)*100))
+    for mi, mj in masterSpots:
+        matrixSpots['%s%s'%(getKeyForValue(mi), mj)].setWeights((100+mi*80, 100+mj*60))
+    results = []
+    for cycle in range(cycles):
+        # remove & add back a column, a line, then edit a master weight, as the matrix UI would
+        for axesGrid in [(gridMax-1, gridMax), (gridMax, gridMax), (gridMax, gridMax-1), (gridMax, gridMax)]:
+            spots = [(mi, mj) for mi, mj in masterSpots if mi < axesGrid[0] and mj < axesGrid[1]]
+            allocate(axesGrid, matrixSpots, spots)
+        matrixSpots['h7'].setWeights((700+cycle, 520))
+        allocate((gridMax, gridMax), matrixSpots, masterSpots)
+        results.append(sorted([(spotKey, matrixSpot.getWeights()) for spotKey, matrixSpot in matrixSpots.items()]))
+    return results
+
+def benchmarkWeightAllocation(cycles=20, gridMax=15):
+    perCell = timeIt(lambda: weightAllocationCycles(allocateWeightsPerCell, cycles, gridMax), 1)
+    solved = timeIt(lambda: weightAllocationCycles(allocateWeights, cycles, gridMax), 1)
+    same = weightAllocationCycles(allocateWeightsPerCell, cycles, gridMax) == weightAllocationCycles(allocateWeights, cycles, gridMax)
+    print('weight allocation, %sx%s grid, %s add/remove column/line & master edit cycles: per cell %0.0fms -> axis weights %0.0fms (x%0.1f), same weights: %s' % (gridMax, gridMax, cycles, perCell, solved, perCell/solved, same))
+
+def benchmarkSparseGrid(gridMax=50, viewSize=(950, 350)):
+    masterSpots = [(0, 0), (gridMax-1, 0), (0, gridMax-1), (gridMax-1, gridMax-1)]
+    layout = MatrixLayout((gridMax, gridMax), viewSize)
+    visibleSpots = layout.getVisibleSpots((0, 0) + viewSize)
+    def build(matrixSpots, spots):
+        # spots get views, then weights are allocated & read by the views, as the matrix UI does
+        for i, j in spots:
+            matrixSpots['%s%s'%(getKeyForValue(i), j)] = MatrixSpot((i, j), ((i+1)*100, (j+1)*100))
+        matrixSpots = allocateWeights((gridMax, gridMax), matrixSpots, masterSpots)
+        return [matrixSpots['%s%s'%(getKeyForValue(i), j)].getWeights() for i, j in sorted(spots)]
+    allSpots = [(i, j) for i in range(gridMax) for j in range(gridMax)]
+    eager = timeIt(lambda: build({}, allSpots), 3)
+    sparse = timeIt(lambda: build(SpotStore(), visibleSpots), 3)
+    print('%sx%s grid, %s cells in view: every spot %0.1fms -> spots in view %0.1fms (x%0.1f)' % (gridMax, gridMax, len(visibleSpots), eager, sparse, eager/sparse))
+
+def benchmarkInstanceCache(switches=6):
+    # the matrix going back and forth between two glyphs, as the preview refreshes cells
+    masterSpots = [(0, 0), (14, 0), (0, 14), (14, 14)]
+    glyphs = dict([(name, [syntheticGlyph(offset+seed, name=name) for seed in range(len(masterSpots))]) for offset, name in [(0, 'a'), (10, 'b')]])
+    locations = [(spotKey, (i+1)*100, (j+1)*100) for spotKey, i, j in [('%s%s'%(getKeyForValue(i), j), i, j) for i in range(15) for j in range(15)] if (i, j) not in masterSpots]
+    def refreshes(instanceGlyphs):
+        preview = PreviewTracker()
+        for switch in range(switches):
+            masterGlyphs = glyphs['ab'[switch%2]]
+            mutatorKey = tuple([(location.asTuple(), glyphFingerprint(glyph)) for (location, value), glyph in zip(gridMasters(masterSpots), masterGlyphs)])
+            mutator = None
+            for spotKey, h, v in locations:
+                cellKey = ('instance', mutatorKey, (h, v))
+                if not preview.cellChanged(spotKey, cellKey, store=False):
+                    continue
+                cachedInstance = instanceGlyphs.get(cellKey) if instanceGlyphs is not None else None
+                if cachedInstance is None:
+                    if mutator is None:
+                        bias, mutator = buildMutator([(location, makeMathGlyph(glyph)) for (location, value), glyph in zip(gridMasters(masterSpots), masterGlyphs)])
+                    instanceGlyph = mutator.makeInstance(Location(horizontal=h, vertical=v)).extractGlyph(Glyph())
+                    cachedInstance = instanceGlyph, glyphFingerprint(instanceGlyph)
+                    if instanceGlyphs is not None:
+                        instanceGlyphs.set(cellKey, *cachedInstance)
+                preview.contentChanged(spotKey, cachedInstance[1])
+                preview.setCell(spotKey, cellKey)
+    uncached = timeIt(lambda: refreshes(None), 3)
+    instanceGlyphs = InstanceCache()
+    cached = timeIt(lambda: refreshes(instanceGlyphs), 1)
+    print('instance cache, 15x15 grid, %s glyph switches: %0.0fms -> %0.0fms (x%0.1f), %s' % (switches, uncached, cached, uncached/cached, instanceGlyphs.report()))
+
+def benchmarkMatrixReload():
+    # reopening a 15x15 matrix until every cell shows: reinterpolating from a text file vs reading a document
+    masterSpots = [(0, 0), (14, 0), (0, 14), (14, 14)]
+    masterGlyphs = [syntheticGlyph(seed) for seed in range(len(masterSpots))]
+    masterKeys = ['%s%s'%(getKeyForValue(i), j) for i, j in masterSpots]
+    locations = [(spotKey, ((i+1)*100, (j+1)*100)) for spotKey, i, j in [('%s%s'%(getKeyForValue(i), j), i, j) for i in range(15) for j in range(15)] if (i, j) not in masterSpots]
+    masters = [(spotKey, ((i+1)*100., (j+1)*100.), 'master%s.ufo'%index) for index, (spotKey, (i, j)) in enumerate(zip(masterKeys, masterSpots))]
+    def reinterpolate(text):
+        matrix = parseMatrixDocument(text)
+        bias, mutator = buildMutator([(Location(horizontal=h, vertical=v), makeMathGlyph(glyph)) for (spotKey, (h, v), fontPath), glyph in zip(matrix['masters'], masterGlyphs)])
+        return [mutator.makeInstance(Location(horizontal=h, vertical=v)).extractGlyph(Glyph()) for spotKey, (h, v) in locations]
+    text = formatMatrixFile((15, 15), (0, 0, 1000, 400), 'a', [(spotKey, '%s/%s'%weights, fontPath) for spotKey, weights, fontPath in masters])
+    instances = [('a', spotKey, weights, glyph) for (spotKey, weights), glyph in zip(locations, reinterpolate(text))]
+    document = formatMatrixDocument((15, 15), (0, 0, 1000, 400), 'a', [master + ({'a': glyphDataFingerprint(glyph)},) for master, glyph in zip(masters, masterGlyphs)], instances)
+    def read(data):
+        matrix = parseMatrixDocument(data)
+        fingerprints = [glyphDataFingerprint(glyph) for glyph in masterGlyphs]
+        assert fingerprints == [matrix['fingerprints'][spotKey]['a'] for spotKey in masterKeys]
+        return [getDocumentInstance(matrix, 'a', spotKey, Glyph()) for spotKey, weights in locations]
+    reinterpolated = timeIt(lambda: reinterpolate(text), 3)
+    documentRead = timeIt(lambda: read(document), 3)
+    print('matrix reload, 15x15 grid: reinterpolated %0.0fms -> read from document %0.0fms (x%0.1f), %0.0fkB document' % (reinterpolated, documentRead, reinterpolated/documentRead, len(document)/1024.))
+
+def benchmarkFontRegistry(fontCount=40, masterCount=4, refreshes=1000):
+    # master lookups of preview refreshes: scanning the open fonts vs the registry
+    fonts = []
+    for index in range(fontCount):
+        font = Font()
+        font.info.familyName, font.info.styleName = 'Family', 'Style %s' % index
+        fonts.append(font)
+    masterFonts = fonts[-masterCount:]
+    def scan():
+        for refresh in range(refreshes):
+            availableFonts = list(fonts)
+            [masterFont in availableFonts for masterFont in masterFonts]
+            [font for font in availableFonts if (font.info.familyName, font.info.styleName) == ('Family', 'Style 0')]
+    registry = FontRegistry(lambda: list(fonts)).acquire()
+    def lookup():
+        for refresh in range(refreshes):
+            [masterFont in registry for masterFont in masterFonts]
+            registry.getByName('Family', 'Style 0')
+    scanned = timeIt(scan, 3)
+    indexed = timeIt(lookup, 3)
+    print('font lookups, %s open fonts, %s refreshes: scanned %0.1fms -> registry %0.1fms (x%0.1f)' % (fontCount, refreshes, scanned, indexed, scanned/indexed))
+
+class ChainPreviewMatrix(object):
+    # the 3x3 preview matrix's chained RGlyph.interpolate() calls, with defcon glyphs
+    def __init__(self, ipf=.5, xpf=1):
+        self.ipf, self.xpf = ipf, xpf
+        self.instanceMatrix = [[None]*3 for i in range(3)]
+
+    def setMasters(self, masters):
+        self.masterMatrix = [[masters.get((i, j)) for j in range(3)] for i in range(3)]
+        for (i, j), glyph in masters.items():
+            self.instanceMatrix[i][j] = glyph
+
+    def interpolate(self, factor, minGlyph, maxGlyph):
+        from previewMatrixSolver import glyphStructure
+        instance = Glyph()
+        if not len(minGlyph) or not len(maxGlyph) or glyphStructure(minGlyph) != glyphStructure(maxGlyph):
+            return instance
+        return (MathGlyph(minGlyph) + (MathGlyph(maxGlyph) - MathGlyph(minGlyph)) * factor).extractGlyph(instance)
+
+    def linearInterpolation(self, i, master1, master2, previousInstance=None):
+        instance = Glyph()
+        if ((i-1)%3 < i) and ((i+1)%3 < i):
+            instance = self.interpolate(-self.xpf, master1, master2)
+        elif ((i-1)%3 > i) and ((i+1)%3 > i):
+            instance = self.interpolate(1+self.xpf, master1, master2)
+        elif ((((i-1)%3 < i) and ((i+1)%3 > i)) or (((i-1)%3 > i) and (i+1)%3 < i)):
+            instance = self.interpolate(self.ipf, master1, master2)
+        if previousInstance is not None:
+            instance = self.interpolate(self.ipf, instance, previousInstance)
+        return instance
+
+    def triangularInterpolation(self, master1, master2, master3, previousInstance=None):
+        midInstance = self.interpolate(self.ipf, master1, master2)
+        instance = self.interpolate(1+self.xpf, master3, midInstance)
+        if previousInstance is not None:
+            instance = self.interpolate(self.ipf, instance, previousInstance)
+        return instance
+
+    def makeInstance(self, i, j, instancesAsMasters=False):
+        instance = Glyph()
+        previousInstance = None
+        matrix = self.instanceMatrix if instancesAsMasters else self.masterMatrix
+        prevHspot, nextHspot = matrix[i][(j-1)%3], matrix[i][(j+1)%3]
+        prevVspot, nextVspot = matrix[(i-1)%3][j], matrix[(i+1)%3][j]
+        if (prevHspot is not None) and (nextHspot is not None):
+            instance = self.linearInterpolation(j, prevHspot, nextHspot)
+        if (prevVspot is not None) and (nextVspot is not None):
+            if len(instance): previousInstance = instance
+            instance = self.linearInterpolation(i, prevVspot, nextVspot, previousInstance)
+        corner_1, corner_2 = matrix[(i-1)%3][(j-1)%3], matrix[(i-1)%3][(j+1)%3]
+        corner_3, corner_4 = matrix[(i+1)%3][(j+1)%3], matrix[(i+1)%3][(j-1)%3]
+        for master1, master2, corner in [(prevHspot, prevVspot, corner_1), (nextHspot, prevVspot, corner_2), (nextHspot, nextVspot, corner_3), (nextHspot, prevVspot, corner_4)]:
+            if (master1 is not None) and (master2 is not None) and (corner is not None):
+                if len(instance): previousInstance = instance
+                instance = self.triangularInterpolation(master1, master2, corner, previousInstance)
+                break
+        if not len(instance) and not instancesAsMasters:
+            return self.makeInstance(i, j, True)
+        self.instanceMatrix[i][j] = instance
+        return instance
+
+    def makeInstances(self):
+        return dict([((i, j), self.makeInstance(i, j)) for i in range(3) for j in range(3) if self.masterMatrix[i][j] is None])
+
+def checkPreviewMatrixSolver(seed=0, refreshes=2):
+    # closed form instances against the chain, for every layout of two masters or more
+    from previewMatrixSolver import PreviewMatrixSolver
+    from itertools import combinations
+    spots = [(i, j) for i in range(3) for j in range(3)]
+    glyphs = dict([(spot, syntheticGlyph(seed+index, contours=2, points=12)) for index, spot in enumerate(spots)])
+    layouts = mismatches = 0
+    for count in range(2, 9):
+        for masterSpots in combinations(spots, count):
+            masters = dict([(spot, glyphs[spot]) for spot in masterSpots])
+            chain, solver = ChainPreviewMatrix(), PreviewMatrixSolver()
+            for refresh in range(refreshes):
+                chain.setMasters(masters)
+                solver.setMasters(masters)
+                expected = chain.makeInstances()
+                instances = solver.makeInstances(.5, 1)
+                for spot, glyph in expected.items():
+                    instance = instances[spot]
+                    if instance is None:
+                        same = not len(glyph)
+                    elif instance is not None:
+                        extracted = instance.extractGlyph(Glyph())
+                        points = [(point.x, point.y) for contour in glyph for point in contour]
+                        extractedPoints = [(point.x, point.y) for contour in extracted for point in contour]
+                        same = len(points) == len(extractedPoints) and abs(glyph.width - extracted.width) < 1e-6 and all([abs(x1-x2) < 1e-6 and abs(y1-y2) < 1e-6 for (x1, y1), (x2, y2) in zip(points, extractedPoints)])
+                    if not same:
+                        mismatches += 1
+            layouts += 1
+    return layouts, mismatches
+
+def benchmarkPreviewMatrix(refreshes=50):
+    # full 3x3 refreshes of the preview matrix, as on each draw: four corner masters
+    from previewMatrixSolver import PreviewMatrixSolver
+    masters = dict([(spot, syntheticGlyph(index)) for index, spot in enumerate([(0, 0), (2, 0), (0, 2), (2, 2)])])
+    def chained():
+        chain = ChainPreviewMatrix()
+        for refresh in range(refreshes):
+            chain.setMasters(masters)
+            chain.makeInstances()
+    def solved():
+        solver = PreviewMatrixSolver()
+        for refresh in range(refreshes):
+            solver.setMasters(masters)
+            [instance.extractGlyph(Glyph()) for instance in solver.makeInstances(.5, 1).values() if instance is not None]
+    layouts, mismatches = checkPreviewMatrixSolver()
+    chainTime = timeIt(chained, 3)
+    solverTime = timeIt(solved, 3)
+    print('preview matrix, %s 3x3 refreshes: chained %0.0fms -> closed form %0.0fms (x%0.1f), %s master layouts checked, %s mismatches' % (refreshes, chainTime, solverTime, chainTime/solverTime, layouts, mismatches))
+
+def normalizedMaster(glyph):
+    # what the preview matrix's setMaster does to a master: a copy centered on a 1000 width, scaled and moved
+    normalized = Glyph()
+    glyph.drawPoints(normalized.getPointPen())
+    for anchor in glyph.anchors:
+        normalized.appendAnchor(dict(name=anchor.name, x=anchor.x, y=anchor.y))
+    xMin, yMin, xMax, yMax = normalized.bounds
+    dx = (1000 - (xMax - xMin)) / 2. - xMin
+    for contour in normalized:
+        for point in contour:
+            point.x, point.y = (point.x + dx) * .75 + 125, point.y * .75 - 50
+    normalized.width = 1000
+    return normalized
+
+def benchmarkPreviewSlider(steps=50):
+    # dragging a factor slider of the preview matrix: masters normalized again on each step vs kept outlines
+    from previewMatrixSolver import PreviewMatrixSolver
+    masters = dict([(spot, syntheticGlyph(index)) for index, spot in enumerate([(0, 0), (2, 0), (0, 2), (2, 2)])])
+    factors = [step / float(steps) for step in range(steps)]
+    def rebuilt():
+        solver = PreviewMatrixSolver()
+        for ipf in factors:
+            solver.setMasters(dict([(spot, normalizedMaster(glyph)) for spot, glyph in masters.items()]))
+            [instance.extractGlyph(Glyph()) for instance in solver.makeInstances(ipf, 1).values() if instance is not None]
+    solver = PreviewMatrixSolver()
+    solver.setMasters(dict([(spot, normalizedMaster(glyph)) for spot, glyph in masters.items()]))
+    def combined():
+        for ipf in factors:
+            [instance.extractGlyph(Glyph()) for instance in solver.makeInstances(ipf, 1).values() if instance is not None]
+    rebuiltTime = timeIt(rebuilt, 3)
+    combinedTime = timeIt(combined, 3)
+    print('preview matrix slider, %s steps: masters rebuilt %0.0fms -> outlines kept %0.0fms (x%0.1f), %0.1fms per step' % (steps, rebuiltTime, combinedTime, rebuiltTime/combinedTime, combinedTime/steps))
+
+def benchmarkAnisotropicInstances():
+    # ambivalent locations: two getInstance calls recombined with (1,0) & (0,1) vs one fused traversal
+    masterSpots = [(0, 0), (14, 0), (0, 14), (14, 14), (7, 7)]
+    locations = [Location(horizontal=((i+1)*100, (14-i)*100+50), vertical=((j+1)*100, (j+1)*100+30)) for i in range(15) for j in range(15)]
+    for label, makeMath in [('MathGlyph', MathGlyph), ('FlatGlyph', FlatGlyph)]:
+        bias, mutator = buildMutator(gridMasters(masterSpots, lambda i, j: makeMath(syntheticGlyph(i*15+j))))
+        neutral = mutator.getNeutral()
+        def split(location):
+            locX, locY = location.split()
+            return mutator.getInstance(locX-bias)*(1,0)+mutator.getInstance(locY-bias)*(0,1)+neutral
+        splitGlyphs = [split(location).extractGlyph(Glyph()) for location in locations]
+        fusedGlyphs = [mutator.makeInstance(location).extractGlyph(Glyph()) for location in locations]
+        same = [glyphDataFingerprint(glyph) for glyph in splitGlyphs] == [glyphDataFingerprint(glyph) for glyph in fusedGlyphs]
+        splitTime = timeIt(lambda: [split(location) for location in locations])
+        fusedTime = timeIt(lambda: [mutator.makeInstance(location) for location in locations])
+        print('anisotropic instances, 15x15 grid, %s masters, %s: split %0.1fms -> fused %0.1fms (x%0.1f), same output: %s' % (len(masterSpots), label, splitTime, fusedTime, splitTime/fusedTime, same))
+
+if __name__ == '__main__':
+    benchmarkCompiledMutator()
+    benchmarkBatchInstances()
+    benchmarkFlatGlyph()
+    benchmarkMutatorCache()
+    benchmarkLocations()
+    benchmarkLimits()
+    benchmarkFamilyGenerator()
+    benchmarkCompatibility()
+    benchmarkSignatureIndex()
+    benchmarkStreamingInstance()
+    benchmarkKerning()
+    benchmarkInfo()
+    benchmarkWeightAllocation()
+    benchmarkSparseGrid()
+    benchmarkInstanceCache()
+    benchmarkMatrixReload()
+    benchmarkFontRegistry()
+    benchmarkPreviewMatrix()
+    benchmarkPreviewSlider()
+    benchmarkAnisotropicInstances()
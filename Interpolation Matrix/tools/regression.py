@@ -0,0 +1,424 @@
+# -*- coding: utf-8 -*-
+
+'''
+Interpolation regression
+Checks that instances of the bundled MutatorMath keep matching pinned reference values,
+and times each scenario, so that optimizations show their effect on results and speed at once.
+
+    python regression.py            compare with regression-reference.json
+    python regression.py --update   pin current results, after a deliberate change of results
+
+Scenarios are designspaces of 1 to 4 axes generated from a seed: a neutral, on-axis masters
+and, for off-axis scenarios, masters combining axes. Instances are asked for at on-axis,
+off-axis and ambivalent (anisotropic) locations, with inter- and extrapolation, through:
+
+    reference       uncached, uncompiled mutator, makeInstance() on fontMath glyphs
+    compiled        cached & compiled mutator, makeInstance() on fontMath glyphs
+    batch           cached & compiled mutator, makeInstances() on glyph arrays
+
+and every path has to give the pinned values, within tolerance.
+
+Then an instance font is streamed to a UFO by the family generator and compared with the UFO
+of the same instance built in memory and saved, as the Interpolation Matrix does without numpy:
+glyphs, unicodes, guidelines, note, lib, info, kerning and groups have to be identical.
+
+Dev tool, kept out of the extension bundle: it imports the modules from the extension's lib.
+'''
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'InterpolationMatrix.roboFontExt', 'lib'))
+
+from _mutatorMath.objects.location import Location, biasFromLocations
+from _mutatorMath.objects.mutator import buildMutator, clearMutatorCache
+from glyphArrays import makeMathGlyph, makeGlyphInstances, _readGlyph
+from batchInterpolation import InfoInterpolator, KerningInterpolator
+from familyGenerator import FamilyGenerator
+from defcon.objects.font import Font
+from defcon.objects.glyph import Glyph
+from fontMath.mathGlyph import MathGlyph
+from fontTools.agl import toUnicode
+from fontTools.misc.fixedTools import otRound
+from time import time
+import json
+import random
+import shutil
+import tempfile
+
+REFERENCE_FORMAT = 'interpolation-regression'
+REFERENCE_VERSION = 1
+REFERENCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'regression-reference.json')
+TOLERANCE = 1e-6
+
+AXIS_NAMES = ['weight', 'width', 'contrast', 'slant']
+
+def getScenarios():
+    """
+    Return (name, axisCount, offAxis, seed) of every scenario.
+    """
+    scenarios = []
+    for axisCount in range(1, 5):
+        for offAxis in [False, True]:
+            if offAxis and axisCount == 1:
+                continue
+            name = '%s axis %s' % (axisCount, 'off-axis' if offAxis else 'on-axis')
+            scenarios.append((name, axisCount, offAxis, axisCount*10 + offAxis))
+    return scenarios
+
+def designspaceGlyph(r, points=8):
+    # compatible glyphs: same contour & anchor, random coordinates
+    glyph = Glyph()
+    glyph.width = r.randint(300, 800)
+    pen = glyph.getPointPen()
+    pen.beginPath()
+    for p in range(points):
+        pen.addPoint((r.randint(0, 700), r.randint(-200, 800)), 'curve' if p%2 == 0 else None)
+    pen.endPath()
+    glyph.appendAnchor(dict(name='top', x=r.randint(0, 700), y=r.randint(600, 800)))
+    return glyph
+
+def makeDesignspace(axisCount, offAxis, seed, locationCount=8):
+    """
+    Return masters as [(Location, glyph)] and instance locations as [(kind, Location)],
+    kind being 'on-axis', 'off-axis' or 'ambivalent'.
+    """
+    r = random.Random(seed)
+    axisNames = AXIS_NAMES[:axisCount]
+    axisValues = {}
+    def masterLocation(values):
+        # every axis given, for the bias to be at the neutral
+        location = Location(**dict([(name, 0) for name in axisNames]))
+        location.update(values)
+        return location
+    masters = [(masterLocation({}), designspaceGlyph(r))]
+    for name in axisNames:
+        values = r.sample([-300, -100, 200, 400, 600, 1000], r.randint(1, 2))
+        axisValues[name] = values
+        for value in values:
+            masters.append((masterLocation({name: value}), designspaceGlyph(r)))
+    if offAxis:
+        # corners are drawn again until they leave the bias at the neutral
+        while True:
+            corners = set()
+            for index in range(r.randint(1, 3)):
+                names = r.sample(axisNames, r.randint(2, axisCount))
+                corners.add(tuple(sorted([(name, r.choice(axisValues[name])) for name in names])))
+            cornerLocations = [masterLocation(dict(corner)) for corner in sorted(corners)]
+            if biasFromLocations([location for location, glyph in masters] + cornerLocations).isOrigin():
+                break
+        masters += [(location, designspaceGlyph(r)) for location in cornerLocations]
+    def axisValue(name):
+        low, high = min(axisValues[name] + [0]), max(axisValues[name] + [0])
+        return round(r.uniform(low - 150, high + 150), 2)
+    locations = []
+    for index in range(locationCount):
+        name = r.choice(axisNames)
+        locations.append(('on-axis', Location(**{name: axisValue(name)})))
+    for index in range(locationCount):
+        locations.append(('off-axis', Location(**dict([(name, axisValue(name)) for name in axisNames]))))
+    for index in range(locationCount):
+        values = dict([(name, axisValue(name)) for name in axisNames])
+        for name in r.sample(axisNames, r.randint(1, axisCount)):
+            values[name] = (values[name], axisValue(name))
+        locations.append(('ambivalent', Location(**values)))
+    return masters, locations
+
+def glyphValues(glyph):
+    # width, height, points and anchors as a flat list of floats
+    key, pointAttributes, rows = _readGlyph(glyph)
+    return [float(value) for row in rows for value in row]
+
+def evaluateReference(masters, locations):
+    clearMutatorCache()
+    bias, mutator = buildMutator([(location, MathGlyph(glyph)) for location, glyph in masters], useCache=False)
+    return [glyphValues(mutator.makeInstance(location).extractGlyph(Glyph())) for kind, location in locations]
+
+def evaluateCompiled(masters, locations):
+    clearMutatorCache()
+    bias, mutator = buildMutator([(location, MathGlyph(glyph)) for location, glyph in masters])
+    return [glyphValues(mutator.makeInstance(location).extractGlyph(Glyph())) for kind, location in locations]
+
+def evaluateBatch(masters, locations):
+    clearMutatorCache()
+    bias, mutator = buildMutator([(location, makeMathGlyph(glyph)) for location, glyph in masters])
+    return [glyphValues(glyph) for glyph in makeGlyphInstances(mutator, [location for kind, location in locations], Glyph)]
+
+EVALUATIONS = [
+    ('reference', evaluateReference),
+    ('compiled', evaluateCompiled),
+    ('batch', evaluateBatch),
+    ]
+
+def timeEvaluation(evaluate, masters, locations, repeat=3):
+    best = None
+    for r in range(repeat):
+        start = time()
+        results = evaluate(masters, locations)
+        elapsed = time()-start
+        if best is None or elapsed < best:
+            best = elapsed
+    return results, best*1000
+
+def maxDeviation(values, referenceValues):
+    """
+    Return the largest difference between two lists of instance values, relative to values
+    larger than 1, or None if their layouts differ.
+    """
+    deviation = 0
+    if len(values) != len(referenceValues):
+        return None
+    for instanceValues, referenceInstanceValues in zip(values, referenceValues):
+        if len(instanceValues) != len(referenceInstanceValues):
+            return None
+        for value, referenceValue in zip(instanceValues, referenceInstanceValues):
+            deviation = max(deviation, abs(value-referenceValue) / max(1., abs(referenceValue)))
+    return round(deviation, 12)
+
+def locationName(location):
+    return ' '.join(['%s:%s' % (name, value) for name, value in sorted(location.items())])
+
+def readReference(path=REFERENCE_PATH):
+    f = open(path, 'r')
+    try:
+        reference = json.load(f)
+    finally:
+        f.close()
+    if reference.get('format') != REFERENCE_FORMAT or reference.get('version') != REFERENCE_VERSION:
+        raise ValueError('%s isn’t an interpolation regression reference file.' % (path))
+    return reference
+
+def writeReference(path=REFERENCE_PATH):
+    """
+    Pin the results of the reference path for every scenario.
+    """
+    scenarios = []
+    for name, axisCount, offAxis, seed in getScenarios():
+        masters, locations = makeDesignspace(axisCount, offAxis, seed)
+        instances = evaluateReference(masters, locations)
+        scenarios.append(dict(name=name, seed=seed, masters=len(masters),
+                              instances=[[kind, locationName(location), values] for (kind, location), values in zip(locations, instances)]))
+    reference = dict(format=REFERENCE_FORMAT, version=REFERENCE_VERSION, tolerance=TOLERANCE, scenarios=scenarios)
+    f = open(path, 'w')
+    try:
+        f.write(formatReference(reference))
+    finally:
+        f.close()
+    return reference
+
+def formatReference(reference):
+    # json with a line per instance, for changes of pinned values to read well in diffs
+    lines = ['{']
+    for key in ['format', 'version', 'tolerance']:
+        lines.append(' %s: %s,' % (json.dumps(key), json.dumps(reference[key])))
+    lines.append(' "scenarios": [')
+    for scenarioIndex, scenario in enumerate(reference['scenarios']):
+        lines.append('  {"name": %s, "seed": %s, "masters": %s, "instances": [' % (json.dumps(scenario['name']), scenario['seed'], scenario['masters']))
+        instances = scenario['instances']
+        for index, instance in enumerate(instances):
+            lines.append('   %s%s' % (json.dumps(instance), ',' if index < len(instances)-1 else ''))
+        lines.append('  ]}%s' % (',' if scenarioIndex < len(reference['scenarios'])-1 else ''))
+    lines.append(' ]')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+def runRegression(path=REFERENCE_PATH, repeat=3):
+    """
+    Compare every evaluation path with the pinned values, print deviations and timings
+    per scenario, return True if all results are within tolerance.
+    """
+    reference = readReference(path)
+    tolerance = reference['tolerance']
+    pinned = dict([(scenario['name'], scenario) for scenario in reference['scenarios']])
+    passed = True
+    for name, axisCount, offAxis, seed in getScenarios():
+        scenario = pinned.get(name)
+        if scenario is None or scenario['seed'] != seed:
+            print('%-20s not pinned, run with --update' % (name))
+            passed = False
+            continue
+        masters, locations = makeDesignspace(axisCount, offAxis, seed)
+        referenceValues = [values for kind, location, values in scenario['instances']]
+        report = []
+        for evaluationName, evaluate in EVALUATIONS:
+            values, elapsed = timeEvaluation(evaluate, masters, locations, repeat)
+            deviation = maxDeviation(values, referenceValues)
+            failed = deviation is None or deviation > tolerance
+            if failed:
+                passed = False
+                for (kind, location), instanceValues, referenceInstanceValues in zip(locations, values, referenceValues):
+                    instanceDeviation = maxDeviation([instanceValues], [referenceInstanceValues])
+                    if instanceDeviation is None or instanceDeviation > tolerance:
+                        print('    %s first differs at %s location %s' % (evaluationName, kind, locationName(location)))
+                        break
+            report.append('%s %0.1fms%s' % (evaluationName, elapsed, ' FAILED (%s)' % (deviation) if failed else ''))
+        print('%-20s %2s masters, %s instances: %s' % (name, len(masters), len(locations), ', '.join(report)))
+    return passed
+
+def instanceMaster(weight, width, anchorNames):
+    # a master with fractional metrics and coordinates, for instances to round halves,
+    # anchors in the given order, guidelines, notes and libs
+    font = Font()
+    font.info.familyName = 'Regression'
+    font.info.unitsPerEm = 1000
+    font.info.ascender = 750 + weight*.051 + width*.01
+    font.info.descender = -250 - width*.003
+    font.info.italicAngle = -width*.011
+    font.info.openTypeOS2WeightClass = 400 + weight*3 // 10
+    if weight:
+        font.info.postscriptSlantAngle = -12
+    glyph = font.newGlyph('A')
+    glyph.unicodes = [0x41]
+    glyph.width = 500.5 + weight*.101 + width*.051
+    pen = glyph.getPointPen()
+    pen.beginPath()
+    for x, y in [(10.5, 0), (250, 700.5), (490.5, 0), (330, -20.5), (170, -20.5)]:
+        pen.addPoint((x + weight*.011, y - width*.003), 'line')
+    pen.endPath()
+    pen.beginPath()
+    # off-curves on their on-curves, filtered out of every instance
+    for x, y, segmentType in [(100, 200, 'line'), (300, 200, 'line'), (300, 200, None), (100, 260, None), (100, 260, 'curve')]:
+        pen.addPoint((x + weight*.05, y), segmentType)
+    pen.endPath()
+    anchors = dict(top=(250 + weight*.011, 700.5), bottom=(250.5, -width*.001))
+    for name in anchorNames:
+        x, y = anchors[name]
+        glyph.appendAnchor(dict(name=name, x=x, y=y))
+    glyph.appendGuideline(dict(y=350.5 + weight*.01, name='bar'))
+    glyph.appendGuideline(dict(x=100.5, y=-weight*.001, angle=75, name='stem'))
+    glyph.note = 'master %s %s' % (weight, width)
+    glyph.lib['regression.master'] = [weight, width]
+    glyph = font.newGlyph('acute')
+    glyph.width = 300 + width*.05
+    pen = glyph.getPointPen()
+    pen.beginPath()
+    for x, y in [(100, 700.5), (200.5 + weight*.011, 800), (150, 700.5)]:
+        pen.addPoint((x, y), 'line')
+    pen.endPath()
+    glyph = font.newGlyph('Aacute')
+    glyph.width = 500.5 + weight*.101 + width*.051
+    pen = glyph.getPointPen()
+    pen.addComponent('A', (1, 0, 0, 1, 0, 0))
+    pen.addComponent('acute', (1 + weight*.0001, 0, 0, 1, 100.5 + weight*.011, -.5 - width*.003))
+    font.kerning[('A', 'acute')] = -20.5 - weight*.0151
+    font.kerning[('public.kern1.A', 'A')] = -width*.005
+    font.groups['public.kern1.A'] = ['A', 'Aacute']
+    font.glyphOrder = ['A', 'Aacute', 'acute']
+    return font
+
+def instanceMasters():
+    locations = [dict(weight=0, width=0), dict(weight=1000, width=0), dict(weight=0, width=1000), dict(weight=1000, width=1000)]
+    anchorOrders = [['top', 'bottom'], ['bottom', 'top'], ['top', 'bottom'], ['bottom', 'top']]
+    return [(Location(**location), instanceMaster(location['weight'], location['width'], anchorNames)) for location, anchorNames in zip(locations, anchorOrders)]
+
+def autoUnicodes(glyphName, unicodes):
+    # stands in for Robofont’s autoUnicodes(): unicodes from glyph names
+    unicode = toUnicode(glyphName)
+    if len(unicode) == 1:
+        return [ord(unicode)]
+    return unicodes
+
+def roundGlyph(glyph):
+    # what fontParts’ glyph.round() does to a glyph
+    for contour in glyph:
+        for point in contour:
+            point.x, point.y = otRound(point.x), otRound(point.y)
+    for component in glyph.components:
+        xx, xy, yx, yy, dx, dy = component.transformation
+        component.transformation = (xx, xy, yx, yy, otRound(dx), otRound(dy))
+    for anchor in glyph.anchors:
+        anchor.x, anchor.y = otRound(anchor.x), otRound(anchor.y)
+    for guideline in glyph.guidelines:
+        if guideline.x is not None:
+            guideline.x = otRound(guideline.x)
+        if guideline.y is not None:
+            guideline.y = otRound(guideline.y)
+    glyph.width = otRound(glyph.width)
+    glyph.height = otRound(glyph.height)
+
+def saveInMemoryInstance(masters, location, path):
+    """
+    Save the instance at location as the Interpolation Matrix does without numpy:
+    MathGlyph instances extracted to a font, unicodes set, glyphs rounded, then unrounded info set.
+    """
+    sourceFont = masters[0][1]
+    font = Font()
+    font.info.familyName = sourceFont.info.familyName
+    font.info.styleName = 'I'
+    font.glyphOrder = sourceFont.glyphOrder
+    instanceInfo = InfoInterpolator([(masterLocation, masterFont.info) for masterLocation, masterFont in masters]).makeInstance(location)
+    font.kerning.update(KerningInterpolator([(masterLocation, masterFont.kerning) for masterLocation, masterFont in masters]).makeInstance(location))
+    for key, value in sourceFont.groups.items():
+        font.groups[key] = value
+    for glyphName in sourceFont.keys():
+        bias, mutator = buildMutator([(masterLocation, MathGlyph(masterFont[glyphName])) for masterLocation, masterFont in masters], useCache=False)
+        font.insertGlyph(mutator.makeInstance(location).extractGlyph(Glyph()), glyphName)
+    for glyph in font:
+        glyph.unicodes = autoUnicodes(glyph.name, glyph.unicodes)
+        roundGlyph(glyph)
+    instanceInfo.extractInfo(font.info)
+    font.save(path, formatVersion=3)
+
+def ufoData(path):
+    # everything compared of a UFO, as json so that integers and floats differ
+    font = Font(path)
+    glyphs = {}
+    for glyph in font:
+        glyphs[glyph.name] = dict(width=glyph.width, height=glyph.height, unicodes=glyph.unicodes, note=glyph.note, lib=dict(glyph.lib),
+                                  contours=[[(point.x, point.y, point.segmentType, point.smooth, point.name) for point in contour] for contour in glyph],
+                                  components=[(component.baseGlyph, component.transformation) for component in glyph.components],
+                                  anchors=sorted([(anchor.name, anchor.x, anchor.y) for anchor in glyph.anchors]),
+                                  guidelines=[(guideline.x, guideline.y, guideline.angle, guideline.name) for guideline in glyph.guidelines])
+    info = dict([(attribute, getattr(font.info, attribute)) for attribute in font.info._properties if getattr(font.info, attribute) is not None])
+    data = dict(glyphs=glyphs, info=info, kerning=sorted(font.kerning.items()), groups=dict(font.groups), glyphOrder=font.glyphOrder)
+    return json.loads(json.dumps(data, sort_keys=True))
+
+def compareStreamedInstance():
+    """
+    Stream an instance to a UFO and save the same instance from memory, print what differs,
+    return True if both UFOs hold the same font.
+    """
+    masters = instanceMasters()
+    location = Location(weight=500, width=500)
+    folderPath = tempfile.mkdtemp()
+    try:
+        inMemoryPath = os.path.join(folderPath, 'in-memory.ufo')
+        saveInMemoryInstance(masters, location, inMemoryPath)
+        generator = FamilyGenerator(masters, processes=1, glyphUnicodes=autoUnicodes)
+        styleName, streamedPath, incompatibleGlyphs = generator.streamInstance('I', location, folderPath)
+        inMemory, streamed = ufoData(inMemoryPath), ufoData(streamedPath)
+    finally:
+        shutil.rmtree(folderPath)
+    passed = not incompatibleGlyphs
+    for key in sorted(inMemory):
+        if key == 'glyphs':
+            for glyphName in sorted(set(inMemory['glyphs']) | set(streamed['glyphs'])):
+                inMemoryGlyph, streamedGlyph = inMemory['glyphs'].get(glyphName), streamed['glyphs'].get(glyphName)
+                for attribute in sorted((inMemoryGlyph or streamedGlyph).keys()):
+                    if inMemoryGlyph is None or streamedGlyph is None or inMemoryGlyph[attribute] != streamedGlyph[attribute]:
+                        print('    glyph %s %s: in memory %s, streamed %s' % (glyphName, attribute, inMemoryGlyph and inMemoryGlyph[attribute], streamedGlyph and streamedGlyph[attribute]))
+                        passed = False
+        elif inMemory[key] != streamed.get(key):
+            print('    %s: in memory %s, streamed %s' % (key, inMemory[key], streamed.get(key)))
+            passed = False
+    return passed
+
+def main(args=None):
+    if args is None:
+        args = sys.argv[1:]
+    if '--update' in args:
+        reference = writeReference()
+        print('pinned %s scenarios to %s' % (len(reference['scenarios']), REFERENCE_PATH))
+        return 0
+    if not runRegression():
+        print('instances differ from the reference')
+        return 1
+    print('instances match the reference')
+    if not compareStreamedInstance():
+        print('streamed instance differs from the one saved from memory')
+        return 1
+    print('streamed instance matches the one saved from memory')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
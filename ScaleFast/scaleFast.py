@@ -22,6 +22,7 @@ from fontMath.mathGlyph import MathGlyph
 from defconAppKit.tools.textSplitter import splitText
 from AppKit import NSColor, NSBoxCustom, NSDragOperationNone
 from math import cos, sin, radians, pi
+from collections import OrderedDict
 import re
 
 def fontName(font):
@@ -99,7 +100,7 @@ def decomposeGlyph(glyph, fixedWidth=False):
             for component in components:
                 base = font[component.baseGlyph]
                 if len(base.components) > 0:
-                    base = decomposeGlyph(base)
+                    base = getDecomposedGlyph(base)
                 decomponent = RGlyph()
                 decomponent.appendGlyph(base)
                 decomponent.scale((component.scale[0], component.scale[1]))
@@ -117,6 +118,77 @@ def decomposeGlyph(glyph, fixedWidth=False):
         return decomposedGlyph
     return
 
+class FingerprintPen(object):
+    # point pen collecting everything a decomposed glyph is drawn from
+
+    def __init__(self):
+        self.values = []
+
+    def beginPath(self, identifier=None, **kwargs):
+        self.values.append('(')
+
+    def addPoint(self, pt, segmentType=None, smooth=False, name=None, identifier=None, **kwargs):
+        self.values.append((pt, segmentType))
+
+    def endPath(self):
+        self.values.append(')')
+
+    def addComponent(self, baseGlyphName, transformation, identifier=None, **kwargs):
+        self.values.append((baseGlyphName, tuple(transformation)))
+
+def glyphFingerprint(glyph, depth=0):
+    pen = FingerprintPen()
+    glyph.drawPoints(pen)
+    anchors = tuple([(anchor.name, anchor.x, anchor.y) for anchor in glyph.anchors])
+    baseFingerprints = ()
+    font = glyph.getParent()
+    if font is not None and depth < 10:
+        baseFingerprints = tuple([glyphFingerprint(font[component.baseGlyph], depth+1) for component in glyph.components if component.baseGlyph in font])
+    return hash((glyph.width, tuple(glyph.unicodes), tuple(pen.values), anchors, baseFingerprints))
+
+class DecomposedGlyphCache(object):
+    """
+    Bounded (LRU) cache of decomposed glyphs, keyed by font, glyph name and options,
+    and reused only while the glyph’s fingerprint (components’ base glyphs included) is unchanged.
+    Returns copies, as decomposed glyphs get transformed.
+    """
+
+    def __init__(self, decompose, maxSize=512):
+        self.decompose = decompose
+        self.maxSize = maxSize
+        self.entries = OrderedDict()
+        self.counters = dict.fromkeys(['hits', 'misses', 'evictions'], 0)
+
+    def get(self, glyph, *options):
+        fingerprint = glyphFingerprint(glyph)
+        key = (id(glyph.getParent()), glyph.name) + options
+        entry = self.entries.pop(key, None)
+        if entry is not None and entry[0] == fingerprint:
+            self.counters['hits'] += 1
+        else:
+            self.counters['misses'] += 1
+            entry = fingerprint, self.decompose(glyph, *options)
+        self.entries[key] = entry
+        if len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+            self.counters['evictions'] += 1
+        return entry[1].copy()
+
+    def clear(self):
+        self.entries.clear()
+
+    def getStats(self):
+        stats = dict(self.counters)
+        stats['size'] = len(self.entries)
+        return stats
+
+decomposedGlyphs = DecomposedGlyphCache(decomposeGlyph)
+
+def getDecomposedGlyph(glyph, fixedWidth=False):
+    if glyph is not None:
+        return decomposedGlyphs.get(glyph, fixedWidth)
+    return
+
 def mapValue(value, (minValue1, maxValue1), (minValue2, maxValue2)):
     d1 = maxValue1 - minValue1
     d2 = maxValue2 - minValue2
@@ -469,7 +541,7 @@ class ScaleController:
             refHeightName, refHeight = self.getScaleRefValue()
             baseMasterFont = masters[0]['font']
             baseItalicAngle = baseMasterFont.info.italicAngle
-            baseMasterGlyph = decomposeGlyph(baseMasterFont[glyphName])
+            baseMasterGlyph = getDecomposedGlyph(baseMasterFont[glyphName])
             baseMasterRefHeight = getattr(baseMasterFont.info, refHeightName)
             baseSc = height/baseMasterRefHeight
             requestedStemLocation = self.getInstanceLocation(masters[0], mode, wishedVStem, wishedHStem, baseSc)
@@ -489,7 +561,7 @@ class ScaleController:
                 italicAngle = masterFont.info.italicAngle
                 masterRefHeight = getattr(masterFont.info, refHeightName)
                 sc = height/masterRefHeight
-                baseGlyph = decomposeGlyph(masterFont[glyphName])
+                baseGlyph = getDecomposedGlyph(masterFont[glyphName])
                 if italicAngle:
                     baseGlyph.skew(italicAngle)
                 baseGlyph.scale((sc*width, sc))